@@ -59,3 +59,8 @@ def release(session):
 def test(session):
     pdm_install(session, "test")
     session.run("pytest", "tests/")
+
+
+@nox.session
+def bench(session):
+    session.run("./scripts/benchmark.py", *session.posargs, external=True)
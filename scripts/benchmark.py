@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""micro-benchmarks for viv hot paths
+
+usage: ./scripts/benchmark.py [benchmark ...]
+"""
+
+import contextlib
+import io
+import itertools
+import os
+import statistics
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, List
+
+SRC = Path(__file__).parent.parent / "src"
+BENCHMARKS: Dict[str, Callable[[Path], None]] = {}
+
+# keep the log file and cache away from the users
+os.environ.update(XDG_DATA_HOME=tempfile.mkdtemp(prefix="viv-bench-data-"))
+os.environ = {k: v for k, v in os.environ.items() if not k.startswith("VIV_")}
+sys.path.insert(0, str(SRC))
+
+import viv.viv as viv  # noqa
+
+
+def benchmark(func: Callable[[Path], None]) -> Callable[[Path], None]:
+    BENCHMARKS[func.__name__.replace("bench_", "").replace("_", "-")] = func
+    return func
+
+
+def timeit(func: Callable[[], object], repeat: int = 100) -> float:
+    """median wall time of func in milliseconds"""
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        times.append(perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def report(name: str, **columns: object) -> None:
+    sys.stdout.write(
+        f"{name:<24}" + "  ".join(f"{k}={v}" for k, v in columns.items()) + "\n"
+    )
+
+
+def make_vivenv(spec: List[str]) -> viv.ViVenv:
+    """create a synthetic vivenv, with metadata but no packages"""
+    vivenv = viv.ViVenv(spec)
+    site_packages = (
+        vivenv.path
+        / "lib"
+        / f"python{sys.version_info.major}.{sys.version_info.minor}"
+        / "site-packages"
+    )
+    site_packages.mkdir(parents=True)
+    vivenv.meta.created = vivenv.meta.accessed = str(datetime.today())
+    vivenv.meta.installed = {viv._normalize_req(req)[0]: "1.0" for req in spec}
+    vivenv.meta.write()
+    vivenv.write_record()
+    return vivenv
+
+
+def populate(n: int) -> None:
+    """grow the cache to n synthetic vivenvs"""
+    existing = sum(1 for _ in viv.Cfg().cache_venv.iterdir())
+    for i in range(existing, n):
+        make_vivenv([f"bench-pkg-{i}"])
+
+
+@benchmark
+def bench_use(cache: Path) -> None:
+    """`viv.use()` on an existing vivenv as the cache grows"""
+    vivenv = make_vivenv(["bench-target"])
+    record = vivenv.path / viv.ACTIVATION_RECORD
+    sys_path = sys.path.copy()
+
+    def warm() -> None:
+        viv.use("bench-target")
+        sys.path = sys_path.copy()
+
+    def full() -> None:
+        record.unlink()
+        viv.use("bench-target")
+        sys.path = sys_path.copy()
+
+    for n in (10, 100, 1000, 5000):
+        populate(n)
+        report(
+            f"use (n={n})", warm=f"{timeit(warm):.3f}ms", full=f"{timeit(full):.3f}ms"
+        )
+
+
+@benchmark
+def bench_cli(cache: Path) -> None:
+    """building the cli and parsing `argv`"""
+
+    def parse(*argv: str) -> Callable[[], None]:
+        def func() -> None:
+            with contextlib.suppress(SystemExit), contextlib.redirect_stdout(
+                io.StringIO()
+            ):
+                viv.Cli(viv.Viv()).parse_args(list(argv))
+
+        return func
+
+    for argv in (("--help",), ("run", "--help"), ("run", "x")):
+        report(f"viv {' '.join(argv)}", time=f"{timeit(parse(*argv)):.3f}ms")
+
+
+@benchmark
+def bench_list(cache: Path) -> None:
+    """`viv list` (plain, --json and filtered) and `viv env info` as the cache grows"""
+    quiet = contextlib.redirect_stdout(io.StringIO())
+
+    def list_(use_json: bool, *filter: str, **kwargs: Any) -> Callable[[], None]:
+        def func() -> None:
+            with quiet:
+                viv.Viv().cmd_list(
+                    quiet=False,
+                    verbose=False,
+                    use_json=use_json,
+                    ndjson=False,
+                    fields=None,
+                    filter=list(filter),
+                    sort=kwargs.get("sort", "name"),
+                    limit=kwargs.get("limit"),
+                    size=False,
+                )
+
+        return func
+
+    def info() -> None:
+        with quiet:
+            viv.Viv().cmd_env_info(
+                vivenv_id="bench-target", path=False, use_json=False, size=False
+            )
+
+    # two or'ed specs, a negation and a date narrowed to the 10 most recent
+    filtered = list_(
+        False,
+        "spec:bench-pkg-1|spec:bench_pkg_2",
+        "!spec:bench-pkg-3",
+        "created-after:2000-01-01",
+        sort="accessed",
+        limit=10,
+    )
+    make_vivenv(["bench-target"]).path.rename(viv.Cfg().cache_venv / "bench-target")
+    for n in (100, 1000, 10000):
+        populate(n)
+        report(
+            f"list (n={n})",
+            list=f"{timeit(list_(False), repeat=5):.1f}ms",
+            json=f"{timeit(list_(True), repeat=5):.1f}ms",
+            filter=f"{timeit(filtered, repeat=5):.1f}ms",
+            info=f"{timeit(info, repeat=5):.1f}ms",
+        )
+
+
+@benchmark
+def bench_ndjson(cache: Path) -> None:
+    """`viv list --json` vs streamed `viv list --ndjson`, time and peak memory"""
+    import tracemalloc
+
+    def list_(**kwargs: Any) -> Callable[[], None]:
+        def func() -> None:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                viv.Viv().cmd_list(
+                    quiet=False,
+                    verbose=False,
+                    filter=[],
+                    sort="name",
+                    limit=None,
+                    size=False,
+                    **kwargs,
+                )
+
+        return func
+
+    def peak(func: Callable[[], None]) -> str:
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return f"{peak / 1024**2:.1f}MB"
+
+    json_ = list_(use_json=True, ndjson=False, fields=None)
+    ndjson = list_(use_json=False, ndjson=True, fields=None)
+    for n in (1000, 10000):
+        populate(n)
+        report(
+            f"ndjson (n={n})",
+            json=f"{timeit(json_, repeat=5):.1f}ms",
+            ndjson=f"{timeit(ndjson, repeat=5):.1f}ms",
+            json_peak=peak(json_),
+            ndjson_peak=peak(ndjson),
+        )
+
+
+@benchmark
+def bench_create(cache: Path) -> None:
+    """the create step of a new vivenv, `venv.create` vs cloning the base template"""
+    count = itertools.count()
+
+    def create(no_store: bool, setuptools: bool) -> Callable[[], None]:
+        def func() -> None:
+            os.environ.update(VIV_NO_STORE="1" if no_store else "")
+            vivenv = viv.ViVenv([""], name=f"bench-{next(count)}")
+            vivenv.create()
+            if no_store and setuptools:
+                viv.subprocess_run([*vivenv.pip, "install", "setuptools"])
+
+        return func
+
+    viv.log.disabled = True
+    with contextlib.redirect_stderr(io.StringIO()):
+        # the template is created on first use
+        viv.Store().template(setuptools=True)
+        viv.Store().template(setuptools=False)
+        for setuptools in (False, True):
+            os.environ.update(VIV_NO_SETUPTOOLS="" if setuptools else "1")
+            report(
+                f"create{' +setuptools' if setuptools else ''}",
+                venv=f"{timeit(create(True, setuptools), repeat=5):.1f}ms",
+                template=f"{timeit(create(False, setuptools), repeat=5):.1f}ms",
+            )
+    os.environ.update(VIV_NO_STORE="", VIV_NO_SETUPTOOLS="")
+    viv.log.disabled = False
+
+
+@benchmark
+def bench_resolve(cache: Path) -> None:
+    """resolving every id in the cache, i.e. `viv env remove $(viv l -q)`"""
+
+    for n in (100, 1000, 10000):
+        populate(n)
+        ids = [vivenv.meta.id for vivenv in viv.Cache().vivenvs]
+
+        def one_by_one() -> None:
+            viv_ = viv.Viv()
+            for id in ids[:100]:
+                viv_._match_vivenv(id)
+
+        report(
+            f"resolve (n={n})",
+            batch=f"{timeit(lambda: viv.Viv()._match_vivenvs(ids), repeat=5):.1f}ms",
+            # extrapolated from the first 100 ids
+            single=f"{timeit(one_by_one, repeat=5) * len(ids) / 100:.1f}ms",
+        )
+
+
+@benchmark
+def bench_reuse(cache: Path) -> None:
+    """`VIV_REUSE=satisfying` lookups, indexed vs scanning the cache"""
+    spec = ["bench-pkg-1>=1", "bench-pkg-10"]
+
+    def lookup(indexed: bool) -> Callable[[], None]:
+        def func() -> None:
+            cache = viv.Cache()
+            if not indexed:
+                cache._synced = False
+            cache.satisfying(spec, "N/A")
+
+        return func
+
+    make_vivenv(spec)
+    for n in (100, 1000, 10000):
+        populate(n)
+        # `Index._sync` distrusts a venvs directory changed within the last second
+        sleep(1)
+        report(
+            f"reuse (n={n})",
+            indexed=f"{timeit(lookup(True), repeat=5):.1f}ms",
+            scan=f"{timeit(lookup(False), repeat=5):.1f}ms",
+        )
+
+
+@benchmark
+def bench_size(cache: Path) -> None:
+    """cache-wide disk usage, `rglob` + `stat` vs serial and threaded scandir"""
+
+    def rglob(paths: List[Path]) -> int:
+        # the walk previously used by ViVenv.get_size
+        return sum(
+            p.stat().st_size for path in paths for p in path.rglob("*") if p.is_file()
+        )
+
+    paths = []
+    for n in (10, 50, 200):
+        for i in range(len(paths), n):
+            vivenv = make_vivenv([f"bench-pkg-{i}"])
+            for pkg in range(20):
+                pkg_dir = Path(vivenv.site_packages) / f"pkg{pkg}"
+                pkg_dir.mkdir()
+                for f in range(25):
+                    (pkg_dir / f"mod{f}.py").write_text("x" * 1000)
+            paths.append(vivenv.path)
+
+        report(
+            f"size (n={n})",
+            rglob=f"{timeit(lambda: rglob(paths), repeat=3):.1f}ms",
+            serial=f"{timeit(lambda: viv.DiskUsage(paths).scan(1), repeat=3):.1f}ms",
+            threaded=f"{timeit(lambda: viv.DiskUsage(paths).scan(), repeat=3):.1f}ms",
+        )
+
+
+def main() -> None:
+    names = sys.argv[1:] or list(BENCHMARKS)
+    if unknown := set(names) - set(BENCHMARKS):
+        sys.exit(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    for name in names:
+        with tempfile.TemporaryDirectory(prefix="viv-bench-") as tmpdir:
+            os.environ["VIV_CACHE"] = tmpdir
+            sys.stdout.write(f"--- {name}: {BENCHMARKS[name].__doc__}\n")
+            BENCHMARKS[name](Path(tmpdir))
+
+
+if __name__ == "__main__":
+    main()
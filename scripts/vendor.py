@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 import ast
+import io
 import re
 import subprocess
 import textwrap
+import tokenize
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Set
 
 import astor
 
@@ -29,6 +31,46 @@ def remove_docs_and_comments(code):
     return formatted_code
 
 
+def add_noqa(code: str, suffix: str = "", line_length: int = 88) -> str:
+    """silence the lints vendored code isn't held to, line by line
+
+    Nested in functions, unused module level names become unused variables,
+    names the suffix returns are still used.
+    """
+    # the code is indented into a function body, so wrap it to parse it
+    wrapped = f"if True:\n{code}"
+    tree = ast.parse(wrapped).body[0]
+    referenced = {
+        node.id
+        for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+    } | set(re.findall(r"\w+", suffix))
+    codes: Dict[int, Set[str]] = {}
+    for node in tree.body:
+        if (
+            isinstance(node, ast.Assign)
+            and isinstance(node.targets[0], ast.Name)
+            and node.targets[0].id not in referenced
+        ):
+            codes.setdefault(node.lineno - 2, set()).add("F841")
+
+    # a noqa for a line in a multi-line string goes after the string
+    ends = {}
+    for token in tokenize.generate_tokens(io.StringIO(wrapped).readline):
+        if token.type == tokenize.STRING and token.start[0] != token.end[0]:
+            for row in range(token.start[0], token.end[0]):
+                ends[row - 2] = token.end[0] - 2
+    lines = code.splitlines()
+    for i, line in enumerate(lines):
+        if len(line) > line_length:
+            codes.setdefault(ends.get(i, i), set()).add("E501")
+
+    for i, found in codes.items():
+        if "# noqa" not in lines[i]:
+            lines[i] = f"{lines[i]}  # noqa: {','.join(sorted(found))}"
+    return "\n".join(lines)
+
+
 class Package:
     def __init__(
         self,
@@ -40,7 +82,7 @@ class Package:
         imports: str = "",
         prefix: str = "",
         suffix: str = "",
-        indent: bool = False,
+        indent: int = 0,
     ):
         self.name = name
         self.files = files
@@ -110,9 +152,12 @@ class Package:
     def insert(self, base_text: str) -> str:
         start, rest = re.split(self.start_delim, base_text)
         _, rest = re.split(self.end_delim, base_text)
-        src = textwrap.indent(
-            remove_docs_and_comments(self.src_text.strip()),
-            prefix=" " * (4 if self.indent else 0),
+        src = add_noqa(
+            textwrap.indent(
+                remove_docs_and_comments(self.src_text.strip()),
+                prefix=" " * 4 * self.indent,
+            ),
+            self.suffix,
         )
         return "\n".join(
             (
@@ -141,35 +186,38 @@ PACKAGES = [
         ),
         basepath=Path(__file__).parent / "packaging/src/packaging",
         prefix="""
-# MODIFIED FROM https://github.com/pypa/packaging
-# see repo for original licenses
-# This software is made available under the terms of *either* of the licenses
-# found in LICENSE.APACHE or LICENSE.BSD. Contributions to this software is made
-# under the terms of *both* these licenses.
+@lru_cache(maxsize=None)
+def _vendored_packaging() -> Tuple[Type[Any], Type[Any]]:
+    # MODIFIED FROM https://github.com/pypa/packaging
+    # see repo for original licenses
+    # This software is made available under the terms of *either* of the licenses
+    # found in LICENSE.APACHE or LICENSE.BSD. Contributions to this software is made
+    # under the terms of *both* these licenses.
 """,
         imports="""
-import abc  # noqa
-import itertools  # noqa
-import re  # noqa
-from typing import (  # noqa
-    Any,
-    Callable,
-    Iterable,
-    Iterator,
-    List,
-    NamedTuple,
-    Optional,
-    Set,
-    SupportsInt,
-    Tuple,
-    TypeVar,
-    Union,
-)
+    import abc  # noqa
+    import itertools  # noqa
+    import re  # noqa
+    from typing import (  # noqa
+        Any,
+        Callable,
+        Iterable,
+        Iterator,
+        List,
+        NamedTuple,
+        Optional,
+        Set,
+        SupportsInt,
+        Tuple,
+        TypeVar,
+        Union,
+    )
 """,
         suffix="""
-Version = v_packaging_Version
-SpecifierSet = v_packaging_SpecifierSet
+
+    return v_packaging_Version, v_packaging_SpecifierSet
 """,
+        indent=1,
     ),
     Package(
         name="tomli",
@@ -182,28 +230,33 @@ SpecifierSet = v_packaging_SpecifierSet
             ("_parser", [[20, 691]]),
         ),
         prefix="""
-if sys.version_info >= (3, 11):
-    from tomllib import loads as toml_loads
-else:
-    # MODIFIED FROM https://github.com/hukkin/tomli
-    # see below for original license
-    # SPDX-License-Identifier: MIT
-    # SPDX-FileCopyrightText: 2021 Taneli Hukkinen
-    # Licensed to PSF under a Contributor Agreement.
+@lru_cache(maxsize=None)
+def _vendored_tomli() -> Callable[[str], Dict[str, Any]]:
+    if sys.version_info >= (3, 11):
+        from tomllib import loads
+    else:
+        # MODIFIED FROM https://github.com/hukkin/tomli
+        # see below for original license
+        # SPDX-License-Identifier: MIT
+        # SPDX-FileCopyrightText: 2021 Taneli Hukkinen
+        # Licensed to PSF under a Contributor Agreement.
 """,
         imports="""
-    import string  # noqa
-    from collections.abc import Iterable  # noqa
-    from functools import lru_cache  # noqa
-    from datetime import date, datetime, time, timedelta, timezone, tzinfo  # noqa
-    from types import MappingProxyType  # noqa
-    from typing import IO, Any, Callable, NamedTuple  # noqa
+        import string  # noqa
+        from collections.abc import Iterable  # noqa
+        from functools import lru_cache  # noqa
+        from datetime import date, datetime, time, timedelta, timezone, tzinfo  # noqa
+        from types import MappingProxyType  # noqa
+        from typing import IO, Any, Callable, NamedTuple, Tuple  # noqa
 """,
         basepath=Path(__file__).parent / "tomli/src/tomli",
         suffix="""
-    toml_loads = v_tomli_loads
+
+        loads = v_tomli_loads
+
+    return loads
 """,
-        indent=True,
+        indent=2,
     ),
 ]
 
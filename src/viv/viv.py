@@ -8,1702 +8,1753 @@ __import__("viv").use("requests", "bs4")
 
 from __future__ import annotations
 
+import atexit
 import hashlib
 import itertools
 import json
 import logging
 import os
-import platform
 import re
-import shutil
 import site
-import subprocess
 import sys
-import tempfile
-import threading
-import venv
-from argparse import (
-    SUPPRESS,
-    Action,
-    HelpFormatter,
-    Namespace,
-    RawDescriptionHelpFormatter,
-    _SubParsersAction,
-)
-from argparse import ArgumentParser as StdArgParser
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timedelta
 from enum import Enum
-from logging.handlers import RotatingFileHandler
+from functools import lru_cache, wraps
 from pathlib import Path
 from textwrap import dedent, fill
-from time import sleep
+from time import perf_counter, sleep, time, time_ns
 from types import TracebackType
-from typing import (
-    Any,
-    Dict,
-    Generator,
-    List,
-    NoReturn,
-    Optional,
-    Sequence,
-    Set,
-    TextIO,
-    Tuple,
-    Type,
-    Union,
-)
+
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from argparse import Action, Namespace, _SubParsersAction
+    from argparse import ArgumentParser as StdArgParser
+    from queue import SimpleQueue
+    from sqlite3 import Connection
+    from typing import (
+        Any,
+        Callable,
+        Dict,
+        Generator,
+        Iterable,
+        Iterator,
+        List,
+        NoReturn,
+        Optional,
+        Sequence,
+        Set,
+        TextIO,
+        Tuple,
+        Type,
+        TypeVar,
+        Union,
+    )
+
+    F = TypeVar("F", bound=Callable[..., Any])
+    T = TypeVar("T")
+    # sql condition (None if only python can check it), its params and a predicate
+    FilterTerm = Tuple[Optional[str], Tuple[Any, ...], Callable[["ViVenv"], bool]]
+    # normalized name, version, store key and if it was requested
+    Dist = Tuple[str, str, str, bool]
 
 __version__ = "2024.1005-dev"
 
 
 #### START VENDORED TOMLI ####
 
-if sys.version_info >= (3, 11):
-    from tomllib import loads as toml_loads
-else:
-    # MODIFIED FROM https://github.com/hukkin/tomli
-    # see below for original license
-    # SPDX-License-Identifier: MIT
-    # SPDX-FileCopyrightText: 2021 Taneli Hukkinen
-    # Licensed to PSF under a Contributor Agreement.
-
-    import string  # noqa
-    from collections.abc import Iterable  # noqa
-    from functools import lru_cache  # noqa
-    from datetime import date, datetime, time, timedelta, timezone, tzinfo  # noqa
-    from types import MappingProxyType  # noqa
-    from typing import IO, Any, Callable, NamedTuple  # noqa
-
-    v_tomli_ParseFloat = Callable[[str], Any]
-    Key = Tuple[str, ...]
-    v_tomli_Pos = int
-    v_tomli__TIME_RE_STR = (
-        "([01][0-9]|2[0-3]):([0-5][0-9]):([0-5][0-9])(?:\\.([0-9]{1,6})[0-9]*)?"
-    )
-    v_tomli_RE_NUMBER = re.compile(
-        """
-    0
-    (?:
-        x[0-9A-Fa-f](?:_?[0-9A-Fa-f])*   # hex
-        |
-        b[01](?:_?[01])*                 # bin
+
+@lru_cache(maxsize=None)
+def _vendored_tomli() -> Callable[[str], Dict[str, Any]]:
+    if sys.version_info >= (3, 11):
+        from tomllib import loads
+    else:
+        # MODIFIED FROM https://github.com/hukkin/tomli
+        # see below for original license
+        # SPDX-License-Identifier: MIT
+        # SPDX-FileCopyrightText: 2021 Taneli Hukkinen
+        # Licensed to PSF under a Contributor Agreement.
+
+        import string  # noqa
+        from collections.abc import Iterable  # noqa
+        from functools import lru_cache  # noqa
+        from datetime import date, datetime, time, timedelta, timezone, tzinfo  # noqa
+        from types import MappingProxyType  # noqa
+        from typing import IO, Any, Callable, NamedTuple, Tuple  # noqa
+
+        v_tomli_ParseFloat = Callable[[str], Any]
+        Key = Tuple[str, ...]
+        v_tomli_Pos = int
+        v_tomli__TIME_RE_STR = (
+            "([01][0-9]|2[0-3]):([0-5][0-9]):([0-5][0-9])(?:\\.([0-9]{1,6})[0-9]*)?"
+        )
+        v_tomli_RE_NUMBER = re.compile(
+            """
+        0
+        (?:
+            x[0-9A-Fa-f](?:_?[0-9A-Fa-f])*   # hex
+            |
+            b[01](?:_?[01])*                 # bin
+            |
+            o[0-7](?:_?[0-7])*               # oct
+        )
         |
-        o[0-7](?:_?[0-7])*               # oct
-    )
-    |
-    [+-]?(?:0|[1-9](?:_?[0-9])*)         # dec, integer part
-    (?P<floatpart>
-        (?:\\.[0-9](?:_?[0-9])*)?         # optional fractional part
-        (?:[eE][+-]?[0-9](?:_?[0-9])*)?  # optional exponent part
-    )
-    """,
-        flags=re.VERBOSE,
-    )
-    v_tomli_RE_LOCALTIME = re.compile(v_tomli__TIME_RE_STR)
-    v_tomli_RE_DATETIME = re.compile(
-        f"""
-    ([0-9]{{4}})-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])  # date, e.g. 1988-10-27
-    (?:
-        [Tt ]
-        {v_tomli__TIME_RE_STR}
-        (?:([Zz])|([+-])([01][0-9]|2[0-3]):([0-5][0-9]))?  # optional time offset
-    )?
-    """,
-        flags=re.VERBOSE,
-    )
+        [+-]?(?:0|[1-9](?:_?[0-9])*)         # dec, integer part
+        (?P<floatpart>
+            (?:\\.[0-9](?:_?[0-9])*)?         # optional fractional part
+            (?:[eE][+-]?[0-9](?:_?[0-9])*)?  # optional exponent part
+        )
+        """,
+            flags=re.VERBOSE,
+        )
+        v_tomli_RE_LOCALTIME = re.compile(v_tomli__TIME_RE_STR)
+        v_tomli_RE_DATETIME = re.compile(
+            f"""
+        ([0-9]{{4}})-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])  # date, e.g. 1988-10-27
+        (?:
+            [Tt ]
+            {v_tomli__TIME_RE_STR}
+            (?:([Zz])|([+-])([01][0-9]|2[0-3]):([0-5][0-9]))?  # optional time offset
+        )?
+        """,
+            flags=re.VERBOSE,
+        )
 
-    def v_tomli_match_to_datetime(match: re.Match) -> datetime | date:
-        (
-            year_str,
-            month_str,
-            day_str,
-            hour_str,
-            minute_str,
-            sec_str,
-            micros_str,
-            zulu_time,
-            offset_sign_str,
-            offset_hour_str,
-            offset_minute_str,
-        ) = match.groups()
-        year, month, day = int(year_str), int(month_str), int(day_str)
-        if hour_str is None:
-            return date(year, month, day)
-        hour, minute, sec = int(hour_str), int(minute_str), int(sec_str)
-        micros = int(micros_str.ljust(6, "0")) if micros_str else 0
-        if offset_sign_str:
-            tz: tzinfo | None = v_tomli_cached_tz(
-                offset_hour_str, offset_minute_str, offset_sign_str
+        def v_tomli_match_to_datetime(match: re.Match) -> datetime | date:
+            (
+                year_str,
+                month_str,
+                day_str,
+                hour_str,
+                minute_str,
+                sec_str,
+                micros_str,
+                zulu_time,
+                offset_sign_str,
+                offset_hour_str,
+                offset_minute_str,
+            ) = match.groups()
+            year, month, day = int(year_str), int(month_str), int(day_str)
+            if hour_str is None:
+                return date(year, month, day)
+            hour, minute, sec = int(hour_str), int(minute_str), int(sec_str)
+            micros = int(micros_str.ljust(6, "0")) if micros_str else 0
+            if offset_sign_str:
+                tz: tzinfo | None = v_tomli_cached_tz(
+                    offset_hour_str, offset_minute_str, offset_sign_str
+                )
+            elif zulu_time:
+                tz = timezone.utc
+            else:
+                tz = None
+            return datetime(year, month, day, hour, minute, sec, micros, tzinfo=tz)
+
+        @lru_cache(maxsize=None)
+        def v_tomli_cached_tz(
+            hour_str: str, minute_str: str, sign_str: str
+        ) -> timezone:
+            sign = 1 if sign_str == "+" else -1
+            return timezone(
+                timedelta(hours=sign * int(hour_str), minutes=sign * int(minute_str))
             )
-        elif zulu_time:
-            tz = timezone.utc
-        else:
-            tz = None
-        return datetime(year, month, day, hour, minute, sec, micros, tzinfo=tz)
-
-    @lru_cache(maxsize=None)
-    def v_tomli_cached_tz(hour_str: str, minute_str: str, sign_str: str) -> timezone:
-        sign = 1 if sign_str == "+" else -1
-        return timezone(
-            timedelta(hours=sign * int(hour_str), minutes=sign * int(minute_str))
-        )
-
-    def v_tomli_match_to_localtime(match: re.Match) -> time:
-        hour_str, minute_str, sec_str, micros_str = match.groups()
-        micros = int(micros_str.ljust(6, "0")) if micros_str else 0
-        return time(int(hour_str), int(minute_str), int(sec_str), micros)
-
-    def v_tomli_match_to_number(
-        match: re.Match, parse_float: v_tomli_ParseFloat
-    ) -> Any:
-        if match.group("floatpart"):
-            return parse_float(match.group())
-        return int(match.group(), 0)
-
-    v_tomli_ASCII_CTRL = frozenset(chr(i) for i in range(32)) | frozenset(chr(127))
-    v_tomli_ILLEGAL_BASIC_STR_CHARS = v_tomli_ASCII_CTRL - frozenset("\t")
-    v_tomli_ILLEGAL_MULTILINE_BASIC_STR_CHARS = v_tomli_ASCII_CTRL - frozenset("\t\n")
-    v_tomli_ILLEGAL_LITERAL_STR_CHARS = v_tomli_ILLEGAL_BASIC_STR_CHARS
-    v_tomli_ILLEGAL_MULTILINE_LITERAL_STR_CHARS = (
-        v_tomli_ILLEGAL_MULTILINE_BASIC_STR_CHARS
-    )
-    v_tomli_ILLEGAL_COMMENT_CHARS = v_tomli_ILLEGAL_BASIC_STR_CHARS
-    v_tomli_TOML_WS = frozenset(" \t")
-    v_tomli_TOML_WS_AND_NEWLINE = v_tomli_TOML_WS | frozenset("\n")
-    v_tomli_BARE_KEY_CHARS = frozenset(string.ascii_letters + string.digits + "-_")
-    v_tomli_KEY_INITIAL_CHARS = v_tomli_BARE_KEY_CHARS | frozenset("\"'")
-    v_tomli_HEXDIGIT_CHARS = frozenset(string.hexdigits)
-    v_tomli_BASIC_STR_ESCAPE_REPLACEMENTS = MappingProxyType(
-        {
-            "\\b": "\x08",
-            "\\t": "\t",
-            "\\n": "\n",
-            "\\f": "\x0c",
-            "\\r": "\r",
-            '\\"': '"',
-            "\\\\": "\\",
-        }
-    )
 
-    class v_tomli_TOMLDecodeError(ValueError):
-        pass
+        def v_tomli_match_to_localtime(match: re.Match) -> time:
+            hour_str, minute_str, sec_str, micros_str = match.groups()
+            micros = int(micros_str.ljust(6, "0")) if micros_str else 0
+            return time(int(hour_str), int(minute_str), int(sec_str), micros)
+
+        def v_tomli_match_to_number(
+            match: re.Match, parse_float: v_tomli_ParseFloat
+        ) -> Any:
+            if match.group("floatpart"):
+                return parse_float(match.group())
+            return int(match.group(), 0)
+
+        v_tomli_ASCII_CTRL = frozenset(chr(i) for i in range(32)) | frozenset(chr(127))
+        v_tomli_ILLEGAL_BASIC_STR_CHARS = v_tomli_ASCII_CTRL - frozenset("\t")
+        v_tomli_ILLEGAL_MULTILINE_BASIC_STR_CHARS = v_tomli_ASCII_CTRL - frozenset(
+            "\t\n"
+        )
+        v_tomli_ILLEGAL_LITERAL_STR_CHARS = v_tomli_ILLEGAL_BASIC_STR_CHARS
+        v_tomli_ILLEGAL_MULTILINE_LITERAL_STR_CHARS = (
+            v_tomli_ILLEGAL_MULTILINE_BASIC_STR_CHARS
+        )
+        v_tomli_ILLEGAL_COMMENT_CHARS = v_tomli_ILLEGAL_BASIC_STR_CHARS
+        v_tomli_TOML_WS = frozenset(" \t")
+        v_tomli_TOML_WS_AND_NEWLINE = v_tomli_TOML_WS | frozenset("\n")
+        v_tomli_BARE_KEY_CHARS = frozenset(string.ascii_letters + string.digits + "-_")
+        v_tomli_KEY_INITIAL_CHARS = v_tomli_BARE_KEY_CHARS | frozenset("\"'")
+        v_tomli_HEXDIGIT_CHARS = frozenset(string.hexdigits)
+        v_tomli_BASIC_STR_ESCAPE_REPLACEMENTS = MappingProxyType(
+            {
+                "\\b": "\x08",
+                "\\t": "\t",
+                "\\n": "\n",
+                "\\f": "\x0c",
+                "\\r": "\r",
+                '\\"': '"',
+                "\\\\": "\\",
+            }
+        )
 
-    def v_tomli_load(
-        __fp: IO[bytes], *, parse_float: v_tomli_ParseFloat = float
-    ) -> dict[str, Any]:
-        b = __fp.read()
-        try:
-            s = b.decode()
-        except AttributeError:
-            raise TypeError(
-                "File must be opened in binary mode, e.g. use `open('foo.toml', 'rb')`"
-            ) from None
-        return v_tomli_loads(s, parse_float=parse_float)
-
-    def v_tomli_loads(
-        __s: str, *, parse_float: v_tomli_ParseFloat = float
-    ) -> dict[str, Any]:
-        src = __s.replace("\r\n", "\n")
-        pos = 0
-        out = v_tomli_Output(v_tomli_NestedDict(), v_tomli_Flags())
-        header: Key = ()
-        parse_float = v_tomli_make_safe_parse_float(parse_float)
-        while True:
-            pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+        class v_tomli_TOMLDecodeError(ValueError):
+            pass
+
+        def v_tomli_load(
+            __fp: IO[bytes], *, parse_float: v_tomli_ParseFloat = float
+        ) -> dict[str, Any]:
+            b = __fp.read()
             try:
-                char = src[pos]
-            except IndexError:
-                break
-            if char == "\n":
-                pos += 1
-                continue
-            if char in v_tomli_KEY_INITIAL_CHARS:
-                pos = v_tomli_key_value_rule(src, pos, out, header, parse_float)
+                s = b.decode()
+            except AttributeError:
+                raise TypeError(
+                    "File must be opened in binary mode, e.g. use `open('foo.toml', 'rb')`"  # noqa: E501
+                ) from None
+            return v_tomli_loads(s, parse_float=parse_float)
+
+        def v_tomli_loads(
+            __s: str, *, parse_float: v_tomli_ParseFloat = float
+        ) -> dict[str, Any]:
+            src = __s.replace("\r\n", "\n")
+            pos = 0
+            out = v_tomli_Output(v_tomli_NestedDict(), v_tomli_Flags())
+            header: Key = ()
+            parse_float = v_tomli_make_safe_parse_float(parse_float)
+            while True:
                 pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-            elif char == "[":
                 try:
-                    second_char: str | None = src[pos + 1]
+                    char = src[pos]
                 except IndexError:
-                    second_char = None
-                out.flags.finalize_pending()
-                if second_char == "[":
-                    pos, header = v_tomli_create_list_rule(src, pos, out)
-                else:
-                    pos, header = v_tomli_create_dict_rule(src, pos, out)
-                pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-            elif char != "#":
-                raise v_tomli_suffixed_err(src, pos, "Invalid statement")
-            pos = v_tomli_skip_comment(src, pos)
-            try:
-                char = src[pos]
-            except IndexError:
-                break
-            if char != "\n":
-                raise v_tomli_suffixed_err(
-                    src, pos, "Expected newline or end of document after a statement"
-                )
-            pos += 1
-        return out.data.dict
-
-    class v_tomli_Flags:
-        FROZEN = 0
-        EXPLICIT_NEST = 1
-
-        def __init__(self) -> None:
-            self._flags: dict[str, dict] = {}
-            self._pending_flags: set[tuple[Key, int]] = set()
-
-        def add_pending(self, key: Key, flag: int) -> None:
-            self._pending_flags.add((key, flag))
-
-        def finalize_pending(self) -> None:
-            for key, flag in self._pending_flags:
-                self.set(key, flag, recursive=False)
-            self._pending_flags.clear()
-
-        def unset_all(self, key: Key) -> None:
-            cont = self._flags
-            for k in key[:-1]:
-                if k not in cont:
-                    return
-                cont = cont[k]["nested"]
-            cont.pop(key[-1], None)
-
-        def set(self, key: Key, flag: int, *, recursive: bool) -> None:
-            cont = self._flags
-            key_parent, key_stem = key[:-1], key[-1]
-            for k in key_parent:
-                if k not in cont:
-                    cont[k] = {"flags": set(), "recursive_flags": set(), "nested": {}}
-                cont = cont[k]["nested"]
-            if key_stem not in cont:
-                cont[key_stem] = {
-                    "flags": set(),
-                    "recursive_flags": set(),
-                    "nested": {},
-                }
-            cont[key_stem]["recursive_flags" if recursive else "flags"].add(flag)
+                    break
+                if char == "\n":
+                    pos += 1
+                    continue
+                if char in v_tomli_KEY_INITIAL_CHARS:
+                    pos = v_tomli_key_value_rule(src, pos, out, header, parse_float)
+                    pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+                elif char == "[":
+                    try:
+                        second_char: str | None = src[pos + 1]
+                    except IndexError:
+                        second_char = None
+                    out.flags.finalize_pending()
+                    if second_char == "[":
+                        pos, header = v_tomli_create_list_rule(src, pos, out)
+                    else:
+                        pos, header = v_tomli_create_dict_rule(src, pos, out)
+                    pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+                elif char != "#":
+                    raise v_tomli_suffixed_err(src, pos, "Invalid statement")
+                pos = v_tomli_skip_comment(src, pos)
+                try:
+                    char = src[pos]
+                except IndexError:
+                    break
+                if char != "\n":
+                    raise v_tomli_suffixed_err(
+                        src,
+                        pos,
+                        "Expected newline or end of document after a statement",
+                    )
+                pos += 1
+            return out.data.dict
+
+        class v_tomli_Flags:
+            FROZEN = 0
+            EXPLICIT_NEST = 1
+
+            def __init__(self) -> None:
+                self._flags: dict[str, dict] = {}
+                self._pending_flags: set[tuple[Key, int]] = set()
+
+            def add_pending(self, key: Key, flag: int) -> None:
+                self._pending_flags.add((key, flag))
+
+            def finalize_pending(self) -> None:
+                for key, flag in self._pending_flags:
+                    self.set(key, flag, recursive=False)
+                self._pending_flags.clear()
+
+            def unset_all(self, key: Key) -> None:
+                cont = self._flags
+                for k in key[:-1]:
+                    if k not in cont:
+                        return
+                    cont = cont[k]["nested"]
+                cont.pop(key[-1], None)
+
+            def set(self, key: Key, flag: int, *, recursive: bool) -> None:
+                cont = self._flags
+                key_parent, key_stem = key[:-1], key[-1]
+                for k in key_parent:
+                    if k not in cont:
+                        cont[k] = {
+                            "flags": set(),
+                            "recursive_flags": set(),
+                            "nested": {},
+                        }
+                    cont = cont[k]["nested"]
+                if key_stem not in cont:
+                    cont[key_stem] = {
+                        "flags": set(),
+                        "recursive_flags": set(),
+                        "nested": {},
+                    }
+                cont[key_stem]["recursive_flags" if recursive else "flags"].add(flag)
 
-        def is_(self, key: Key, flag: int) -> bool:
-            if not key:
-                return False
-            cont = self._flags
-            for k in key[:-1]:
-                if k not in cont:
+            def is_(self, key: Key, flag: int) -> bool:
+                if not key:
                     return False
-                inner_cont = cont[k]
-                if flag in inner_cont["recursive_flags"]:
-                    return True
-                cont = inner_cont["nested"]
-            key_stem = key[-1]
-            if key_stem in cont:
-                cont = cont[key_stem]
-                return flag in cont["flags"] or flag in cont["recursive_flags"]
-            return False
-
-    class v_tomli_NestedDict:
-        def __init__(self) -> None:
-            self.dict: dict[str, Any] = {}
-
-        def get_or_create_nest(self, key: Key, *, access_lists: bool = True) -> dict:
-            cont: Any = self.dict
-            for k in key:
-                if k not in cont:
-                    cont[k] = {}
-                cont = cont[k]
-                if access_lists and isinstance(cont, list):
-                    cont = cont[-1]
-                if not isinstance(cont, dict):
-                    raise KeyError("There is no nest behind this key")
-            return cont
-
-        def append_nest_to_list(self, key: Key) -> None:
-            cont = self.get_or_create_nest(key[:-1])
-            last_key = key[-1]
-            if last_key in cont:
-                list_ = cont[last_key]
-                if not isinstance(list_, list):
-                    raise KeyError("An object other than list found behind this key")
-                list_.append({})
-            else:
-                cont[last_key] = [{}]
+                cont = self._flags
+                for k in key[:-1]:
+                    if k not in cont:
+                        return False
+                    inner_cont = cont[k]
+                    if flag in inner_cont["recursive_flags"]:
+                        return True
+                    cont = inner_cont["nested"]
+                key_stem = key[-1]
+                if key_stem in cont:
+                    cont = cont[key_stem]
+                    return flag in cont["flags"] or flag in cont["recursive_flags"]
+                return False
 
-    class v_tomli_Output(NamedTuple):
-        data: v_tomli_NestedDict
-        flags: v_tomli_Flags
+        class v_tomli_NestedDict:
+            def __init__(self) -> None:
+                self.dict: dict[str, Any] = {}
+
+            def get_or_create_nest(
+                self, key: Key, *, access_lists: bool = True
+            ) -> dict:
+                cont: Any = self.dict
+                for k in key:
+                    if k not in cont:
+                        cont[k] = {}
+                    cont = cont[k]
+                    if access_lists and isinstance(cont, list):
+                        cont = cont[-1]
+                    if not isinstance(cont, dict):
+                        raise KeyError("There is no nest behind this key")
+                return cont
+
+            def append_nest_to_list(self, key: Key) -> None:
+                cont = self.get_or_create_nest(key[:-1])
+                last_key = key[-1]
+                if last_key in cont:
+                    list_ = cont[last_key]
+                    if not isinstance(list_, list):
+                        raise KeyError(
+                            "An object other than list found behind this key"
+                        )
+                    list_.append({})
+                else:
+                    cont[last_key] = [{}]
 
-    def v_tomli_skip_chars(
-        src: str, pos: v_tomli_Pos, chars: Iterable[str]
-    ) -> v_tomli_Pos:
-        try:
-            while src[pos] in chars:
-                pos += 1
-        except IndexError:
-            pass
-        return pos
-
-    def v_tomli_skip_until(
-        src: str,
-        pos: v_tomli_Pos,
-        expect: str,
-        *,
-        error_on: frozenset[str],
-        error_on_eof: bool,
-    ) -> v_tomli_Pos:
-        try:
-            new_pos = src.index(expect, pos)
-        except ValueError:
-            new_pos = len(src)
-            if error_on_eof:
-                raise v_tomli_suffixed_err(
-                    src, new_pos, f"Expected {expect!r}"
-                ) from None
-        if not error_on.isdisjoint(src[pos:new_pos]):
-            while src[pos] not in error_on:
-                pos += 1
-            raise v_tomli_suffixed_err(
-                src, pos, f"Found invalid character {src[pos]!r}"
-            )
-        return new_pos
+        class v_tomli_Output(NamedTuple):
+            data: v_tomli_NestedDict
+            flags: v_tomli_Flags
 
-    def v_tomli_skip_comment(src: str, pos: v_tomli_Pos) -> v_tomli_Pos:
-        try:
-            char: str | None = src[pos]
-        except IndexError:
-            char = None
-        if char == "#":
-            return v_tomli_skip_until(
-                src,
-                pos + 1,
-                "\n",
-                error_on=v_tomli_ILLEGAL_COMMENT_CHARS,
-                error_on_eof=False,
-            )
-        return pos
-
-    def v_tomli_skip_comments_and_array_ws(src: str, pos: v_tomli_Pos) -> v_tomli_Pos:
-        while True:
-            pos_before_skip = pos
-            pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS_AND_NEWLINE)
-            pos = v_tomli_skip_comment(src, pos)
-            if pos == pos_before_skip:
-                return pos
-
-    def v_tomli_create_dict_rule(
-        src: str, pos: v_tomli_Pos, out: v_tomli_Output
-    ) -> tuple[v_tomli_Pos, Key]:
-        pos += 1
-        pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-        pos, key = v_tomli_parse_key(src, pos)
-        if out.flags.is_(key, v_tomli_Flags.EXPLICIT_NEST) or out.flags.is_(
-            key, v_tomli_Flags.FROZEN
-        ):
-            raise v_tomli_suffixed_err(src, pos, f"Cannot declare {key} twice")
-        out.flags.set(key, v_tomli_Flags.EXPLICIT_NEST, recursive=False)
-        try:
-            out.data.get_or_create_nest(key)
-        except KeyError:
-            raise v_tomli_suffixed_err(src, pos, "Cannot overwrite a value") from None
-        if not src.startswith("]", pos):
-            raise v_tomli_suffixed_err(
-                src, pos, "Expected ']' at the end of a table declaration"
-            )
-        return pos + 1, key
-
-    def v_tomli_create_list_rule(
-        src: str, pos: v_tomli_Pos, out: v_tomli_Output
-    ) -> tuple[v_tomli_Pos, Key]:
-        pos += 2
-        pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-        pos, key = v_tomli_parse_key(src, pos)
-        if out.flags.is_(key, v_tomli_Flags.FROZEN):
-            raise v_tomli_suffixed_err(
-                src, pos, f"Cannot mutate immutable namespace {key}"
-            )
-        out.flags.unset_all(key)
-        out.flags.set(key, v_tomli_Flags.EXPLICIT_NEST, recursive=False)
-        try:
-            out.data.append_nest_to_list(key)
-        except KeyError:
-            raise v_tomli_suffixed_err(src, pos, "Cannot overwrite a value") from None
-        if not src.startswith("]]", pos):
-            raise v_tomli_suffixed_err(
-                src, pos, "Expected ']]' at the end of an array declaration"
-            )
-        return pos + 2, key
-
-    def v_tomli_key_value_rule(
-        src: str,
-        pos: v_tomli_Pos,
-        out: v_tomli_Output,
-        header: Key,
-        parse_float: v_tomli_ParseFloat,
-    ) -> v_tomli_Pos:
-        pos, key, value = v_tomli_parse_key_value_pair(src, pos, parse_float)
-        key_parent, key_stem = key[:-1], key[-1]
-        abs_key_parent = header + key_parent
-        relative_path_cont_keys = (header + key[:i] for i in range(1, len(key)))
-        for cont_key in relative_path_cont_keys:
-            if out.flags.is_(cont_key, v_tomli_Flags.EXPLICIT_NEST):
+        def v_tomli_skip_chars(
+            src: str, pos: v_tomli_Pos, chars: Iterable[str]
+        ) -> v_tomli_Pos:
+            try:
+                while src[pos] in chars:
+                    pos += 1
+            except IndexError:
+                pass
+            return pos
+
+        def v_tomli_skip_until(
+            src: str,
+            pos: v_tomli_Pos,
+            expect: str,
+            *,
+            error_on: frozenset[str],
+            error_on_eof: bool,
+        ) -> v_tomli_Pos:
+            try:
+                new_pos = src.index(expect, pos)
+            except ValueError:
+                new_pos = len(src)
+                if error_on_eof:
+                    raise v_tomli_suffixed_err(
+                        src, new_pos, f"Expected {expect!r}"
+                    ) from None
+            if not error_on.isdisjoint(src[pos:new_pos]):
+                while src[pos] not in error_on:
+                    pos += 1
                 raise v_tomli_suffixed_err(
-                    src, pos, f"Cannot redefine namespace {cont_key}"
+                    src, pos, f"Found invalid character {src[pos]!r}"
                 )
-            out.flags.add_pending(cont_key, v_tomli_Flags.EXPLICIT_NEST)
-        if out.flags.is_(abs_key_parent, v_tomli_Flags.FROZEN):
-            raise v_tomli_suffixed_err(
-                src, pos, f"Cannot mutate immutable namespace {abs_key_parent}"
-            )
-        try:
-            nest = out.data.get_or_create_nest(abs_key_parent)
-        except KeyError:
-            raise v_tomli_suffixed_err(src, pos, "Cannot overwrite a value") from None
-        if key_stem in nest:
-            raise v_tomli_suffixed_err(src, pos, "Cannot overwrite a value")
-        if isinstance(value, (dict, list)):
-            out.flags.set(header + key, v_tomli_Flags.FROZEN, recursive=True)
-        nest[key_stem] = value
-        return pos
-
-    def v_tomli_parse_key_value_pair(
-        src: str, pos: v_tomli_Pos, parse_float: v_tomli_ParseFloat
-    ) -> tuple[v_tomli_Pos, Key, Any]:
-        pos, key = v_tomli_parse_key(src, pos)
-        try:
-            char: str | None = src[pos]
-        except IndexError:
-            char = None
-        if char != "=":
-            raise v_tomli_suffixed_err(
-                src, pos, "Expected '=' after a key in a key/value pair"
-            )
-        pos += 1
-        pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-        pos, value = v_tomli_parse_value(src, pos, parse_float)
-        return pos, key, value
-
-    def v_tomli_parse_key(src: str, pos: v_tomli_Pos) -> tuple[v_tomli_Pos, Key]:
-        pos, key_part = v_tomli_parse_key_part(src, pos)
-        key: Key = (key_part,)
-        pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-        while True:
+            return new_pos
+
+        def v_tomli_skip_comment(src: str, pos: v_tomli_Pos) -> v_tomli_Pos:
             try:
                 char: str | None = src[pos]
             except IndexError:
                 char = None
-            if char != ".":
-                return pos, key
+            if char == "#":
+                return v_tomli_skip_until(
+                    src,
+                    pos + 1,
+                    "\n",
+                    error_on=v_tomli_ILLEGAL_COMMENT_CHARS,
+                    error_on_eof=False,
+                )
+            return pos
+
+        def v_tomli_skip_comments_and_array_ws(
+            src: str, pos: v_tomli_Pos
+        ) -> v_tomli_Pos:
+            while True:
+                pos_before_skip = pos
+                pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS_AND_NEWLINE)
+                pos = v_tomli_skip_comment(src, pos)
+                if pos == pos_before_skip:
+                    return pos
+
+        def v_tomli_create_dict_rule(
+            src: str, pos: v_tomli_Pos, out: v_tomli_Output
+        ) -> tuple[v_tomli_Pos, Key]:
             pos += 1
             pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-            pos, key_part = v_tomli_parse_key_part(src, pos)
-            key += (key_part,)
-            pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-
-    def v_tomli_parse_key_part(src: str, pos: v_tomli_Pos) -> tuple[v_tomli_Pos, str]:
-        try:
-            char: str | None = src[pos]
-        except IndexError:
-            char = None
-        if char in v_tomli_BARE_KEY_CHARS:
-            start_pos = pos
-            pos = v_tomli_skip_chars(src, pos, v_tomli_BARE_KEY_CHARS)
-            return pos, src[start_pos:pos]
-        if char == "'":
-            return v_tomli_parse_literal_str(src, pos)
-        if char == '"':
-            return v_tomli_parse_one_line_basic_str(src, pos)
-        raise v_tomli_suffixed_err(src, pos, "Invalid initial character for a key part")
-
-    def v_tomli_parse_one_line_basic_str(
-        src: str, pos: v_tomli_Pos
-    ) -> tuple[v_tomli_Pos, str]:
-        pos += 1
-        return v_tomli_parse_basic_str(src, pos, multiline=False)
-
-    def v_tomli_parse_array(
-        src: str, pos: v_tomli_Pos, parse_float: v_tomli_ParseFloat
-    ) -> tuple[v_tomli_Pos, list]:
-        pos += 1
-        array: list = []
-        pos = v_tomli_skip_comments_and_array_ws(src, pos)
-        if src.startswith("]", pos):
-            return pos + 1, array
-        while True:
-            pos, val = v_tomli_parse_value(src, pos, parse_float)
-            array.append(val)
-            pos = v_tomli_skip_comments_and_array_ws(src, pos)
-            c = src[pos : pos + 1]
-            if c == "]":
-                return pos + 1, array
-            if c != ",":
-                raise v_tomli_suffixed_err(src, pos, "Unclosed array")
-            pos += 1
-            pos = v_tomli_skip_comments_and_array_ws(src, pos)
-            if src.startswith("]", pos):
-                return pos + 1, array
+            pos, key = v_tomli_parse_key(src, pos)
+            if out.flags.is_(key, v_tomli_Flags.EXPLICIT_NEST) or out.flags.is_(
+                key, v_tomli_Flags.FROZEN
+            ):
+                raise v_tomli_suffixed_err(src, pos, f"Cannot declare {key} twice")
+            out.flags.set(key, v_tomli_Flags.EXPLICIT_NEST, recursive=False)
+            try:
+                out.data.get_or_create_nest(key)
+            except KeyError:
+                raise v_tomli_suffixed_err(
+                    src, pos, "Cannot overwrite a value"
+                ) from None
+            if not src.startswith("]", pos):
+                raise v_tomli_suffixed_err(
+                    src, pos, "Expected ']' at the end of a table declaration"
+                )
+            return pos + 1, key
 
-    def v_tomli_parse_inline_table(
-        src: str, pos: v_tomli_Pos, parse_float: v_tomli_ParseFloat
-    ) -> tuple[v_tomli_Pos, dict]:
-        pos += 1
-        nested_dict = v_tomli_NestedDict()
-        flags = v_tomli_Flags()
-        pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-        if src.startswith("}", pos):
-            return pos + 1, nested_dict.dict
-        while True:
+        def v_tomli_create_list_rule(
+            src: str, pos: v_tomli_Pos, out: v_tomli_Output
+        ) -> tuple[v_tomli_Pos, Key]:
+            pos += 2
+            pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+            pos, key = v_tomli_parse_key(src, pos)
+            if out.flags.is_(key, v_tomli_Flags.FROZEN):
+                raise v_tomli_suffixed_err(
+                    src, pos, f"Cannot mutate immutable namespace {key}"
+                )
+            out.flags.unset_all(key)
+            out.flags.set(key, v_tomli_Flags.EXPLICIT_NEST, recursive=False)
+            try:
+                out.data.append_nest_to_list(key)
+            except KeyError:
+                raise v_tomli_suffixed_err(
+                    src, pos, "Cannot overwrite a value"
+                ) from None
+            if not src.startswith("]]", pos):
+                raise v_tomli_suffixed_err(
+                    src, pos, "Expected ']]' at the end of an array declaration"
+                )
+            return pos + 2, key
+
+        def v_tomli_key_value_rule(
+            src: str,
+            pos: v_tomli_Pos,
+            out: v_tomli_Output,
+            header: Key,
+            parse_float: v_tomli_ParseFloat,
+        ) -> v_tomli_Pos:
             pos, key, value = v_tomli_parse_key_value_pair(src, pos, parse_float)
             key_parent, key_stem = key[:-1], key[-1]
-            if flags.is_(key, v_tomli_Flags.FROZEN):
+            abs_key_parent = header + key_parent
+            relative_path_cont_keys = (header + key[:i] for i in range(1, len(key)))
+            for cont_key in relative_path_cont_keys:
+                if out.flags.is_(cont_key, v_tomli_Flags.EXPLICIT_NEST):
+                    raise v_tomli_suffixed_err(
+                        src, pos, f"Cannot redefine namespace {cont_key}"
+                    )
+                out.flags.add_pending(cont_key, v_tomli_Flags.EXPLICIT_NEST)
+            if out.flags.is_(abs_key_parent, v_tomli_Flags.FROZEN):
                 raise v_tomli_suffixed_err(
-                    src, pos, f"Cannot mutate immutable namespace {key}"
+                    src, pos, f"Cannot mutate immutable namespace {abs_key_parent}"
                 )
             try:
-                nest = nested_dict.get_or_create_nest(key_parent, access_lists=False)
+                nest = out.data.get_or_create_nest(abs_key_parent)
             except KeyError:
                 raise v_tomli_suffixed_err(
                     src, pos, "Cannot overwrite a value"
                 ) from None
             if key_stem in nest:
+                raise v_tomli_suffixed_err(src, pos, "Cannot overwrite a value")
+            if isinstance(value, (dict, list)):
+                out.flags.set(header + key, v_tomli_Flags.FROZEN, recursive=True)
+            nest[key_stem] = value
+            return pos
+
+        def v_tomli_parse_key_value_pair(
+            src: str, pos: v_tomli_Pos, parse_float: v_tomli_ParseFloat
+        ) -> tuple[v_tomli_Pos, Key, Any]:
+            pos, key = v_tomli_parse_key(src, pos)
+            try:
+                char: str | None = src[pos]
+            except IndexError:
+                char = None
+            if char != "=":
                 raise v_tomli_suffixed_err(
-                    src, pos, f"Duplicate inline table key {key_stem!r}"
+                    src, pos, "Expected '=' after a key in a key/value pair"
                 )
-            nest[key_stem] = value
-            pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
-            c = src[pos : pos + 1]
-            if c == "}":
-                return pos + 1, nested_dict.dict
-            if c != ",":
-                raise v_tomli_suffixed_err(src, pos, "Unclosed inline table")
-            if isinstance(value, (dict, list)):
-                flags.set(key, v_tomli_Flags.FROZEN, recursive=True)
             pos += 1
             pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+            pos, value = v_tomli_parse_value(src, pos, parse_float)
+            return pos, key, value
 
-    def v_tomli_parse_basic_str_escape(
-        src: str, pos: v_tomli_Pos, *, multiline: bool = False
-    ) -> tuple[v_tomli_Pos, str]:
-        escape_id = src[pos : pos + 2]
-        pos += 2
-        if multiline and escape_id in {"\\ ", "\\\t", "\\\n"}:
-            if escape_id != "\\\n":
-                pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+        def v_tomli_parse_key(src: str, pos: v_tomli_Pos) -> tuple[v_tomli_Pos, Key]:
+            pos, key_part = v_tomli_parse_key_part(src, pos)
+            key: Key = (key_part,)
+            pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+            while True:
                 try:
-                    char = src[pos]
+                    char: str | None = src[pos]
                 except IndexError:
-                    return pos, ""
-                if char != "\n":
-                    raise v_tomli_suffixed_err(src, pos, "Unescaped '\\' in a string")
+                    char = None
+                if char != ".":
+                    return pos, key
                 pos += 1
-            pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS_AND_NEWLINE)
-            return pos, ""
-        if escape_id == "\\u":
-            return v_tomli_parse_hex_char(src, pos, 4)
-        if escape_id == "\\U":
-            return v_tomli_parse_hex_char(src, pos, 8)
-        try:
-            return pos, v_tomli_BASIC_STR_ESCAPE_REPLACEMENTS[escape_id]
-        except KeyError:
-            raise v_tomli_suffixed_err(src, pos, "Unescaped '\\' in a string") from None
-
-    def v_tomli_parse_basic_str_escape_multiline(
-        src: str, pos: v_tomli_Pos
-    ) -> tuple[v_tomli_Pos, str]:
-        return v_tomli_parse_basic_str_escape(src, pos, multiline=True)
-
-    def v_tomli_parse_hex_char(
-        src: str, pos: v_tomli_Pos, hex_len: int
-    ) -> tuple[v_tomli_Pos, str]:
-        hex_str = src[pos : pos + hex_len]
-        if len(hex_str) != hex_len or not v_tomli_HEXDIGIT_CHARS.issuperset(hex_str):
-            raise v_tomli_suffixed_err(src, pos, "Invalid hex value")
-        pos += hex_len
-        hex_int = int(hex_str, 16)
-        if not v_tomli_is_unicode_scalar_value(hex_int):
+                pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+                pos, key_part = v_tomli_parse_key_part(src, pos)
+                key += (key_part,)
+                pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+
+        def v_tomli_parse_key_part(
+            src: str, pos: v_tomli_Pos
+        ) -> tuple[v_tomli_Pos, str]:
+            try:
+                char: str | None = src[pos]
+            except IndexError:
+                char = None
+            if char in v_tomli_BARE_KEY_CHARS:
+                start_pos = pos
+                pos = v_tomli_skip_chars(src, pos, v_tomli_BARE_KEY_CHARS)
+                return pos, src[start_pos:pos]
+            if char == "'":
+                return v_tomli_parse_literal_str(src, pos)
+            if char == '"':
+                return v_tomli_parse_one_line_basic_str(src, pos)
             raise v_tomli_suffixed_err(
-                src, pos, "Escaped character is not a Unicode scalar value"
+                src, pos, "Invalid initial character for a key part"
             )
-        return pos, chr(hex_int)
-
-    def v_tomli_parse_literal_str(
-        src: str, pos: v_tomli_Pos
-    ) -> tuple[v_tomli_Pos, str]:
-        pos += 1
-        start_pos = pos
-        pos = v_tomli_skip_until(
-            src, pos, "'", error_on=v_tomli_ILLEGAL_LITERAL_STR_CHARS, error_on_eof=True
-        )
-        return pos + 1, src[start_pos:pos]
-
-    def v_tomli_parse_multiline_str(
-        src: str, pos: v_tomli_Pos, *, literal: bool
-    ) -> tuple[v_tomli_Pos, str]:
-        pos += 3
-        if src.startswith("\n", pos):
+
+        def v_tomli_parse_one_line_basic_str(
+            src: str, pos: v_tomli_Pos
+        ) -> tuple[v_tomli_Pos, str]:
+            pos += 1
+            return v_tomli_parse_basic_str(src, pos, multiline=False)
+
+        def v_tomli_parse_array(
+            src: str, pos: v_tomli_Pos, parse_float: v_tomli_ParseFloat
+        ) -> tuple[v_tomli_Pos, list]:
+            pos += 1
+            array: list = []
+            pos = v_tomli_skip_comments_and_array_ws(src, pos)
+            if src.startswith("]", pos):
+                return pos + 1, array
+            while True:
+                pos, val = v_tomli_parse_value(src, pos, parse_float)
+                array.append(val)
+                pos = v_tomli_skip_comments_and_array_ws(src, pos)
+                c = src[pos : pos + 1]
+                if c == "]":
+                    return pos + 1, array
+                if c != ",":
+                    raise v_tomli_suffixed_err(src, pos, "Unclosed array")
+                pos += 1
+                pos = v_tomli_skip_comments_and_array_ws(src, pos)
+                if src.startswith("]", pos):
+                    return pos + 1, array
+
+        def v_tomli_parse_inline_table(
+            src: str, pos: v_tomli_Pos, parse_float: v_tomli_ParseFloat
+        ) -> tuple[v_tomli_Pos, dict]:
+            pos += 1
+            nested_dict = v_tomli_NestedDict()
+            flags = v_tomli_Flags()
+            pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+            if src.startswith("}", pos):
+                return pos + 1, nested_dict.dict
+            while True:
+                pos, key, value = v_tomli_parse_key_value_pair(src, pos, parse_float)
+                key_parent, key_stem = key[:-1], key[-1]
+                if flags.is_(key, v_tomli_Flags.FROZEN):
+                    raise v_tomli_suffixed_err(
+                        src, pos, f"Cannot mutate immutable namespace {key}"
+                    )
+                try:
+                    nest = nested_dict.get_or_create_nest(
+                        key_parent, access_lists=False
+                    )
+                except KeyError:
+                    raise v_tomli_suffixed_err(
+                        src, pos, "Cannot overwrite a value"
+                    ) from None
+                if key_stem in nest:
+                    raise v_tomli_suffixed_err(
+                        src, pos, f"Duplicate inline table key {key_stem!r}"
+                    )
+                nest[key_stem] = value
+                pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+                c = src[pos : pos + 1]
+                if c == "}":
+                    return pos + 1, nested_dict.dict
+                if c != ",":
+                    raise v_tomli_suffixed_err(src, pos, "Unclosed inline table")
+                if isinstance(value, (dict, list)):
+                    flags.set(key, v_tomli_Flags.FROZEN, recursive=True)
+                pos += 1
+                pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+
+        def v_tomli_parse_basic_str_escape(
+            src: str, pos: v_tomli_Pos, *, multiline: bool = False
+        ) -> tuple[v_tomli_Pos, str]:
+            escape_id = src[pos : pos + 2]
+            pos += 2
+            if multiline and escape_id in {"\\ ", "\\\t", "\\\n"}:
+                if escape_id != "\\\n":
+                    pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS)
+                    try:
+                        char = src[pos]
+                    except IndexError:
+                        return pos, ""
+                    if char != "\n":
+                        raise v_tomli_suffixed_err(
+                            src, pos, "Unescaped '\\' in a string"
+                        )
+                    pos += 1
+                pos = v_tomli_skip_chars(src, pos, v_tomli_TOML_WS_AND_NEWLINE)
+                return pos, ""
+            if escape_id == "\\u":
+                return v_tomli_parse_hex_char(src, pos, 4)
+            if escape_id == "\\U":
+                return v_tomli_parse_hex_char(src, pos, 8)
+            try:
+                return pos, v_tomli_BASIC_STR_ESCAPE_REPLACEMENTS[escape_id]
+            except KeyError:
+                raise v_tomli_suffixed_err(
+                    src, pos, "Unescaped '\\' in a string"
+                ) from None
+
+        def v_tomli_parse_basic_str_escape_multiline(
+            src: str, pos: v_tomli_Pos
+        ) -> tuple[v_tomli_Pos, str]:
+            return v_tomli_parse_basic_str_escape(src, pos, multiline=True)
+
+        def v_tomli_parse_hex_char(
+            src: str, pos: v_tomli_Pos, hex_len: int
+        ) -> tuple[v_tomli_Pos, str]:
+            hex_str = src[pos : pos + hex_len]
+            if len(hex_str) != hex_len or not v_tomli_HEXDIGIT_CHARS.issuperset(
+                hex_str
+            ):
+                raise v_tomli_suffixed_err(src, pos, "Invalid hex value")
+            pos += hex_len
+            hex_int = int(hex_str, 16)
+            if not v_tomli_is_unicode_scalar_value(hex_int):
+                raise v_tomli_suffixed_err(
+                    src, pos, "Escaped character is not a Unicode scalar value"
+                )
+            return pos, chr(hex_int)
+
+        def v_tomli_parse_literal_str(
+            src: str, pos: v_tomli_Pos
+        ) -> tuple[v_tomli_Pos, str]:
             pos += 1
-        if literal:
-            delim = "'"
-            end_pos = v_tomli_skip_until(
+            start_pos = pos
+            pos = v_tomli_skip_until(
                 src,
                 pos,
-                "'''",
-                error_on=v_tomli_ILLEGAL_MULTILINE_LITERAL_STR_CHARS,
+                "'",
+                error_on=v_tomli_ILLEGAL_LITERAL_STR_CHARS,
                 error_on_eof=True,
             )
-            result = src[pos:end_pos]
-            pos = end_pos + 3
-        else:
-            delim = '"'
-            pos, result = v_tomli_parse_basic_str(src, pos, multiline=True)
-        if not src.startswith(delim, pos):
-            return pos, result
-        pos += 1
-        if not src.startswith(delim, pos):
-            return pos, result + delim
-        pos += 1
-        return pos, result + delim * 2
-
-    def v_tomli_parse_basic_str(
-        src: str, pos: v_tomli_Pos, *, multiline: bool
-    ) -> tuple[v_tomli_Pos, str]:
-        if multiline:
-            error_on = v_tomli_ILLEGAL_MULTILINE_BASIC_STR_CHARS
-            parse_escapes = v_tomli_parse_basic_str_escape_multiline
-        else:
-            error_on = v_tomli_ILLEGAL_BASIC_STR_CHARS
-            parse_escapes = v_tomli_parse_basic_str_escape
-        result = ""
-        start_pos = pos
-        while True:
+            return pos + 1, src[start_pos:pos]
+
+        def v_tomli_parse_multiline_str(
+            src: str, pos: v_tomli_Pos, *, literal: bool
+        ) -> tuple[v_tomli_Pos, str]:
+            pos += 3
+            if src.startswith("\n", pos):
+                pos += 1
+            if literal:
+                delim = "'"
+                end_pos = v_tomli_skip_until(
+                    src,
+                    pos,
+                    "'''",
+                    error_on=v_tomli_ILLEGAL_MULTILINE_LITERAL_STR_CHARS,
+                    error_on_eof=True,
+                )
+                result = src[pos:end_pos]
+                pos = end_pos + 3
+            else:
+                delim = '"'
+                pos, result = v_tomli_parse_basic_str(src, pos, multiline=True)
+            if not src.startswith(delim, pos):
+                return pos, result
+            pos += 1
+            if not src.startswith(delim, pos):
+                return pos, result + delim
+            pos += 1
+            return pos, result + delim * 2
+
+        def v_tomli_parse_basic_str(
+            src: str, pos: v_tomli_Pos, *, multiline: bool
+        ) -> tuple[v_tomli_Pos, str]:
+            if multiline:
+                error_on = v_tomli_ILLEGAL_MULTILINE_BASIC_STR_CHARS
+                parse_escapes = v_tomli_parse_basic_str_escape_multiline
+            else:
+                error_on = v_tomli_ILLEGAL_BASIC_STR_CHARS
+                parse_escapes = v_tomli_parse_basic_str_escape
+            result = ""
+            start_pos = pos
+            while True:
+                try:
+                    char = src[pos]
+                except IndexError:
+                    raise v_tomli_suffixed_err(
+                        src, pos, "Unterminated string"
+                    ) from None
+                if char == '"':
+                    if not multiline:
+                        return pos + 1, result + src[start_pos:pos]
+                    if src.startswith('"""', pos):
+                        return pos + 3, result + src[start_pos:pos]
+                    pos += 1
+                    continue
+                if char == "\\":
+                    result += src[start_pos:pos]
+                    pos, parsed_escape = parse_escapes(src, pos)
+                    result += parsed_escape
+                    start_pos = pos
+                    continue
+                if char in error_on:
+                    raise v_tomli_suffixed_err(src, pos, f"Illegal character {char!r}")
+                pos += 1
+
+        def v_tomli_parse_value(
+            src: str, pos: v_tomli_Pos, parse_float: v_tomli_ParseFloat
+        ) -> tuple[v_tomli_Pos, Any]:
             try:
-                char = src[pos]
+                char: str | None = src[pos]
             except IndexError:
-                raise v_tomli_suffixed_err(src, pos, "Unterminated string") from None
+                char = None
             if char == '"':
-                if not multiline:
-                    return pos + 1, result + src[start_pos:pos]
                 if src.startswith('"""', pos):
-                    return pos + 3, result + src[start_pos:pos]
-                pos += 1
-                continue
-            if char == "\\":
-                result += src[start_pos:pos]
-                pos, parsed_escape = parse_escapes(src, pos)
-                result += parsed_escape
-                start_pos = pos
-                continue
-            if char in error_on:
-                raise v_tomli_suffixed_err(src, pos, f"Illegal character {char!r}")
-            pos += 1
+                    return v_tomli_parse_multiline_str(src, pos, literal=False)
+                return v_tomli_parse_one_line_basic_str(src, pos)
+            if char == "'":
+                if src.startswith("'''", pos):
+                    return v_tomli_parse_multiline_str(src, pos, literal=True)
+                return v_tomli_parse_literal_str(src, pos)
+            if char == "t":
+                if src.startswith("true", pos):
+                    return pos + 4, True
+            if char == "f":
+                if src.startswith("false", pos):
+                    return pos + 5, False
+            if char == "[":
+                return v_tomli_parse_array(src, pos, parse_float)
+            if char == "{":
+                return v_tomli_parse_inline_table(src, pos, parse_float)
+            datetime_match = v_tomli_RE_DATETIME.match(src, pos)
+            if datetime_match:
+                try:
+                    datetime_obj = v_tomli_match_to_datetime(datetime_match)
+                except ValueError as e:
+                    raise v_tomli_suffixed_err(
+                        src, pos, "Invalid date or datetime"
+                    ) from e
+                return datetime_match.end(), datetime_obj
+            localtime_match = v_tomli_RE_LOCALTIME.match(src, pos)
+            if localtime_match:
+                return localtime_match.end(), v_tomli_match_to_localtime(
+                    localtime_match
+                )
+            number_match = v_tomli_RE_NUMBER.match(src, pos)
+            if number_match:
+                return number_match.end(), v_tomli_match_to_number(
+                    number_match, parse_float
+                )
+            first_three = src[pos : pos + 3]
+            if first_three in {"inf", "nan"}:
+                return pos + 3, parse_float(first_three)
+            first_four = src[pos : pos + 4]
+            if first_four in {"-inf", "+inf", "-nan", "+nan"}:
+                return pos + 4, parse_float(first_four)
+            raise v_tomli_suffixed_err(src, pos, "Invalid value")
+
+        def v_tomli_suffixed_err(
+            src: str, pos: v_tomli_Pos, msg: str
+        ) -> v_tomli_TOMLDecodeError:
+            def coord_repr(src: str, pos: v_tomli_Pos) -> str:
+                if pos >= len(src):
+                    return "end of document"
+                line = src.count("\n", 0, pos) + 1
+                if line == 1:
+                    column = pos + 1
+                else:
+                    column = pos - src.rindex("\n", 0, pos)
+                return f"line {line}, column {column}"
 
-    def v_tomli_parse_value(
-        src: str, pos: v_tomli_Pos, parse_float: v_tomli_ParseFloat
-    ) -> tuple[v_tomli_Pos, Any]:
-        try:
-            char: str | None = src[pos]
-        except IndexError:
-            char = None
-        if char == '"':
-            if src.startswith('"""', pos):
-                return v_tomli_parse_multiline_str(src, pos, literal=False)
-            return v_tomli_parse_one_line_basic_str(src, pos)
-        if char == "'":
-            if src.startswith("'''", pos):
-                return v_tomli_parse_multiline_str(src, pos, literal=True)
-            return v_tomli_parse_literal_str(src, pos)
-        if char == "t":
-            if src.startswith("true", pos):
-                return pos + 4, True
-        if char == "f":
-            if src.startswith("false", pos):
-                return pos + 5, False
-        if char == "[":
-            return v_tomli_parse_array(src, pos, parse_float)
-        if char == "{":
-            return v_tomli_parse_inline_table(src, pos, parse_float)
-        datetime_match = v_tomli_RE_DATETIME.match(src, pos)
-        if datetime_match:
-            try:
-                datetime_obj = v_tomli_match_to_datetime(datetime_match)
-            except ValueError as e:
-                raise v_tomli_suffixed_err(src, pos, "Invalid date or datetime") from e
-            return datetime_match.end(), datetime_obj
-        localtime_match = v_tomli_RE_LOCALTIME.match(src, pos)
-        if localtime_match:
-            return localtime_match.end(), v_tomli_match_to_localtime(localtime_match)
-        number_match = v_tomli_RE_NUMBER.match(src, pos)
-        if number_match:
-            return number_match.end(), v_tomli_match_to_number(
-                number_match, parse_float
-            )
-        first_three = src[pos : pos + 3]
-        if first_three in {"inf", "nan"}:
-            return pos + 3, parse_float(first_three)
-        first_four = src[pos : pos + 4]
-        if first_four in {"-inf", "+inf", "-nan", "+nan"}:
-            return pos + 4, parse_float(first_four)
-        raise v_tomli_suffixed_err(src, pos, "Invalid value")
-
-    def v_tomli_suffixed_err(
-        src: str, pos: v_tomli_Pos, msg: str
-    ) -> v_tomli_TOMLDecodeError:
-        def coord_repr(src: str, pos: v_tomli_Pos) -> str:
-            if pos >= len(src):
-                return "end of document"
-            line = src.count("\n", 0, pos) + 1
-            if line == 1:
-                column = pos + 1
-            else:
-                column = pos - src.rindex("\n", 0, pos)
-            return f"line {line}, column {column}"
+            return v_tomli_TOMLDecodeError(f"{msg} (at {coord_repr(src, pos)})")
+
+        def v_tomli_is_unicode_scalar_value(codepoint: int) -> bool:
+            return 0 <= codepoint <= 55295 or 57344 <= codepoint <= 1114111
 
-        return v_tomli_TOMLDecodeError(f"{msg} (at {coord_repr(src, pos)})")
+        def v_tomli_make_safe_parse_float(
+            parse_float: v_tomli_ParseFloat,
+        ) -> v_tomli_ParseFloat:
+            if parse_float is float:
+                return float
 
-    def v_tomli_is_unicode_scalar_value(codepoint: int) -> bool:
-        return 0 <= codepoint <= 55295 or 57344 <= codepoint <= 1114111
+            def safe_parse_float(float_str: str) -> Any:
+                float_value = parse_float(float_str)
+                if isinstance(float_value, (dict, list)):
+                    raise ValueError("parse_float must not return dicts or lists")
+                return float_value
 
-    def v_tomli_make_safe_parse_float(
-        parse_float: v_tomli_ParseFloat,
-    ) -> v_tomli_ParseFloat:
-        if parse_float is float:
-            return float
+            return safe_parse_float
 
-        def safe_parse_float(float_str: str) -> Any:
-            float_value = parse_float(float_str)
-            if isinstance(float_value, (dict, list)):
-                raise ValueError("parse_float must not return dicts or lists")
-            return float_value
+        loads = v_tomli_loads
 
-        return safe_parse_float
+    return loads
 
-    toml_loads = v_tomli_loads
 
 #### END VENDORED TOMLI ####
 
 
 #### START VENDORED PACKAGING ####
 
-# MODIFIED FROM https://github.com/pypa/packaging
-# see repo for original licenses
-# This software is made available under the terms of *either* of the licenses
-# found in LICENSE.APACHE or LICENSE.BSD. Contributions to this software is made
-# under the terms of *both* these licenses.
-
-import abc  # noqa
-import itertools  # noqa
-import re  # noqa
-from typing import (  # noqa
-    Any,
-    Callable,
-    Iterable,
-    Iterator,
-    List,
-    NamedTuple,
-    Optional,
-    Set,
-    SupportsInt,
-    Tuple,
-    TypeVar,
-    Union,
-)
 
+@lru_cache(maxsize=None)
+def _vendored_packaging() -> Tuple[Type[Any], Type[Any]]:
+    # MODIFIED FROM https://github.com/pypa/packaging
+    # see repo for original licenses
+    # This software is made available under the terms of *either* of the licenses
+    # found in LICENSE.APACHE or LICENSE.BSD. Contributions to this software is made
+    # under the terms of *both* these licenses.
+
+    import abc  # noqa
+    import itertools  # noqa
+    import re  # noqa
+    from typing import (  # noqa
+        Any,
+        Callable,
+        Iterable,
+        Iterator,
+        List,
+        NamedTuple,
+        Optional,
+        Set,
+        SupportsInt,
+        Tuple,
+        TypeVar,
+        Union,
+    )
 
-class v_packaging_InfinityType:
-    def __repr__(self) -> str:
-        return "v_packaging_Infinity"
+    class v_packaging_InfinityType:
+        def __repr__(self) -> str:
+            return "v_packaging_Infinity"
 
-    def __hash__(self) -> int:
-        return hash(repr(self))
+        def __hash__(self) -> int:
+            return hash(repr(self))
 
-    def __lt__(self, other: object) -> bool:
-        return False
+        def __lt__(self, other: object) -> bool:
+            return False
 
-    def __le__(self, other: object) -> bool:
-        return False
+        def __le__(self, other: object) -> bool:
+            return False
 
-    def __eq__(self, other: object) -> bool:
-        return isinstance(other, self.__class__)
+        def __eq__(self, other: object) -> bool:
+            return isinstance(other, self.__class__)
 
-    def __gt__(self, other: object) -> bool:
-        return True
+        def __gt__(self, other: object) -> bool:
+            return True
 
-    def __ge__(self, other: object) -> bool:
-        return True
+        def __ge__(self, other: object) -> bool:
+            return True
 
-    def __neg__(self: object) -> "v_packaging_NegativeInfinityType":
-        return v_packaging_NegativeInfinity
+        def __neg__(self: object) -> "v_packaging_NegativeInfinityType":
+            return v_packaging_NegativeInfinity
 
+    v_packaging_Infinity = v_packaging_InfinityType()
 
-v_packaging_Infinity = v_packaging_InfinityType()
+    class v_packaging_NegativeInfinityType:
+        def __repr__(self) -> str:
+            return "-Infinity"
 
+        def __hash__(self) -> int:
+            return hash(repr(self))
 
-class v_packaging_NegativeInfinityType:
-    def __repr__(self) -> str:
-        return "-Infinity"
+        def __lt__(self, other: object) -> bool:
+            return True
 
-    def __hash__(self) -> int:
-        return hash(repr(self))
+        def __le__(self, other: object) -> bool:
+            return True
 
-    def __lt__(self, other: object) -> bool:
-        return True
+        def __eq__(self, other: object) -> bool:
+            return isinstance(other, self.__class__)
 
-    def __le__(self, other: object) -> bool:
-        return True
+        def __gt__(self, other: object) -> bool:
+            return False
 
-    def __eq__(self, other: object) -> bool:
-        return isinstance(other, self.__class__)
+        def __ge__(self, other: object) -> bool:
+            return False
 
-    def __gt__(self, other: object) -> bool:
-        return False
+        def __neg__(self: object) -> v_packaging_InfinityType:
+            return v_packaging_Infinity
 
-    def __ge__(self, other: object) -> bool:
-        return False
+    v_packaging_NegativeInfinity = v_packaging_NegativeInfinityType()
+    v_packaging_LocalType = Tuple[Union[int, str], ...]
+    v_packaging_CmpPrePostDevType = Union[
+        v_packaging_InfinityType, v_packaging_NegativeInfinityType, Tuple[str, int]
+    ]
+    v_packaging_CmpLocalType = Union[
+        v_packaging_NegativeInfinityType,
+        Tuple[
+            Union[
+                Tuple[int, str],
+                Tuple[v_packaging_NegativeInfinityType, Union[int, str]],
+            ],
+            ...,
+        ],
+    ]
+    v_packaging_CmpKey = Tuple[
+        int,
+        Tuple[int, ...],
+        v_packaging_CmpPrePostDevType,
+        v_packaging_CmpPrePostDevType,
+        v_packaging_CmpPrePostDevType,
+        v_packaging_CmpLocalType,
+    ]
+    v_packaging_VersionComparisonMethod = Callable[  # noqa: F841
+        [v_packaging_CmpKey, v_packaging_CmpKey], bool
+    ]
 
-    def __neg__(self: object) -> v_packaging_InfinityType:
-        return v_packaging_Infinity
+    class v_packaging__Version(NamedTuple):
+        epoch: int
+        release: Tuple[int, ...]
+        dev: Optional[Tuple[str, int]]
+        pre: Optional[Tuple[str, int]]
+        post: Optional[Tuple[str, int]]
+        local: Optional[v_packaging_LocalType]
 
+    def v_packaging_parse(version: str) -> "v_packaging_Version":
+        return v_packaging_Version(version)
 
-v_packaging_NegativeInfinity = v_packaging_NegativeInfinityType()
-v_packaging_LocalType = Tuple[Union[int, str], ...]
-v_packaging_CmpPrePostDevType = Union[
-    v_packaging_InfinityType, v_packaging_NegativeInfinityType, Tuple[str, int]
-]
-v_packaging_CmpLocalType = Union[
-    v_packaging_NegativeInfinityType,
-    Tuple[
-        Union[
-            Tuple[int, str], Tuple[v_packaging_NegativeInfinityType, Union[int, str]]
-        ],
-        ...,
-    ],
-]
-v_packaging_CmpKey = Tuple[
-    int,
-    Tuple[int, ...],
-    v_packaging_CmpPrePostDevType,
-    v_packaging_CmpPrePostDevType,
-    v_packaging_CmpPrePostDevType,
-    v_packaging_CmpLocalType,
-]
-v_packaging_VersionComparisonMethod = Callable[
-    [v_packaging_CmpKey, v_packaging_CmpKey], bool
-]
-
-
-class v_packaging__Version(NamedTuple):
-    epoch: int
-    release: Tuple[int, ...]
-    dev: Optional[Tuple[str, int]]
-    pre: Optional[Tuple[str, int]]
-    post: Optional[Tuple[str, int]]
-    local: Optional[v_packaging_LocalType]
-
-
-def v_packaging_parse(version: str) -> "v_packaging_Version":
-    return v_packaging_Version(version)
-
-
-class v_packaging_InvalidVersion(ValueError):
-    pass
+    class v_packaging_InvalidVersion(ValueError):
+        pass
 
+    class v_packaging__BaseVersion:
+        _key: Tuple[Any, ...]
 
-class v_packaging__BaseVersion:
-    _key: Tuple[Any, ...]
-
-    def __hash__(self) -> int:
-        return hash(self._key)
-
-    def __lt__(self, other: "v_packaging__BaseVersion") -> bool:
-        if not isinstance(other, v_packaging__BaseVersion):
-            return NotImplemented
-        return self._key < other._key
-
-    def __le__(self, other: "v_packaging__BaseVersion") -> bool:
-        if not isinstance(other, v_packaging__BaseVersion):
-            return NotImplemented
-        return self._key <= other._key
-
-    def __eq__(self, other: object) -> bool:
-        if not isinstance(other, v_packaging__BaseVersion):
-            return NotImplemented
-        return self._key == other._key
-
-    def __ge__(self, other: "v_packaging__BaseVersion") -> bool:
-        if not isinstance(other, v_packaging__BaseVersion):
-            return NotImplemented
-        return self._key >= other._key
-
-    def __gt__(self, other: "v_packaging__BaseVersion") -> bool:
-        if not isinstance(other, v_packaging__BaseVersion):
-            return NotImplemented
-        return self._key > other._key
-
-    def __ne__(self, other: object) -> bool:
-        if not isinstance(other, v_packaging__BaseVersion):
-            return NotImplemented
-        return self._key != other._key
-
-
-v_packaging__VERSION_PATTERN = """
-    v?
-    (?:
-        (?:(?P<epoch>[0-9]+)!)?                           # epoch
-        (?P<release>[0-9]+(?:\\.[0-9]+)*)                  # release segment
-        (?P<pre>                                          # pre-release
-            [-_\\.]?
-            (?P<pre_l>alpha|a|beta|b|preview|pre|c|rc)
-            [-_\\.]?
-            (?P<pre_n>[0-9]+)?
-        )?
-        (?P<post>                                         # post release
-            (?:-(?P<post_n1>[0-9]+))
-            |
-            (?:
-                [-_\\.]?
-                (?P<post_l>post|rev|r)
-                [-_\\.]?
-                (?P<post_n2>[0-9]+)?
-            )
-        )?
-        (?P<dev>                                          # dev release
-            [-_\\.]?
-            (?P<dev_l>dev)
-            [-_\\.]?
-            (?P<dev_n>[0-9]+)?
-        )?
-    )
-    (?:\\+(?P<local>[a-z0-9]+(?:[-_\\.][a-z0-9]+)*))?       # local version
-"""
-v_packaging_VERSION_PATTERN = v_packaging__VERSION_PATTERN
-
-
-class v_packaging_Version(v_packaging__BaseVersion):
-    _regex = re.compile(
-        "^\\s*" + v_packaging_VERSION_PATTERN + "\\s*$", re.VERBOSE | re.IGNORECASE
-    )
-    _key: v_packaging_CmpKey
-
-    def __init__(self, version: str) -> None:
-        match = self._regex.search(version)
-        if not match:
-            raise v_packaging_InvalidVersion(f"Invalid version: '{version}'")
-        self._version = v_packaging__Version(
-            epoch=int(match.group("epoch")) if match.group("epoch") else 0,
-            release=tuple(int(i) for i in match.group("release").split(".")),
-            pre=v_packaging__parse_letter_version(
-                match.group("pre_l"), match.group("pre_n")
-            ),
-            post=v_packaging__parse_letter_version(
-                match.group("post_l"), match.group("post_n1") or match.group("post_n2")
-            ),
-            dev=v_packaging__parse_letter_version(
-                match.group("dev_l"), match.group("dev_n")
-            ),
-            local=v_packaging__parse_local_version(match.group("local")),
-        )
-        self._key = v_packaging__cmpkey(
-            self._version.epoch,
-            self._version.release,
-            self._version.pre,
-            self._version.post,
-            self._version.dev,
-            self._version.local,
-        )
-
-    def __repr__(self) -> str:
-        return f"<Version('{self}')>"
-
-    def __str__(self) -> str:
-        parts = []
-        if self.epoch != 0:
-            parts.append(f"{self.epoch}!")
-        parts.append(".".join(str(x) for x in self.release))
-        if self.pre is not None:
-            parts.append("".join(str(x) for x in self.pre))
-        if self.post is not None:
-            parts.append(f".post{self.post}")
-        if self.dev is not None:
-            parts.append(f".dev{self.dev}")
-        if self.local is not None:
-            parts.append(f"+{self.local}")
-        return "".join(parts)
-
-    @property
-    def epoch(self) -> int:
-        return self._version.epoch
-
-    @property
-    def release(self) -> Tuple[int, ...]:
-        return self._version.release
-
-    @property
-    def pre(self) -> Optional[Tuple[str, int]]:
-        return self._version.pre
+        def __hash__(self) -> int:
+            return hash(self._key)
 
-    @property
-    def post(self) -> Optional[int]:
-        return self._version.post[1] if self._version.post else None
+        def __lt__(self, other: "v_packaging__BaseVersion") -> bool:
+            if not isinstance(other, v_packaging__BaseVersion):
+                return NotImplemented
+            return self._key < other._key
 
-    @property
-    def dev(self) -> Optional[int]:
-        return self._version.dev[1] if self._version.dev else None
+        def __le__(self, other: "v_packaging__BaseVersion") -> bool:
+            if not isinstance(other, v_packaging__BaseVersion):
+                return NotImplemented
+            return self._key <= other._key
 
-    @property
-    def local(self) -> Optional[str]:
-        if self._version.local:
-            return ".".join(str(x) for x in self._version.local)
-        else:
-            return None
+        def __eq__(self, other: object) -> bool:
+            if not isinstance(other, v_packaging__BaseVersion):
+                return NotImplemented
+            return self._key == other._key
 
-    @property
-    def public(self) -> str:
-        return str(self).split("+", 1)[0]
+        def __ge__(self, other: "v_packaging__BaseVersion") -> bool:
+            if not isinstance(other, v_packaging__BaseVersion):
+                return NotImplemented
+            return self._key >= other._key
 
-    @property
-    def base_version(self) -> str:
-        parts = []
-        if self.epoch != 0:
-            parts.append(f"{self.epoch}!")
-        parts.append(".".join(str(x) for x in self.release))
-        return "".join(parts)
+        def __gt__(self, other: "v_packaging__BaseVersion") -> bool:
+            if not isinstance(other, v_packaging__BaseVersion):
+                return NotImplemented
+            return self._key > other._key
 
-    @property
-    def is_prerelease(self) -> bool:
-        return self.dev is not None or self.pre is not None
+        def __ne__(self, other: object) -> bool:
+            if not isinstance(other, v_packaging__BaseVersion):
+                return NotImplemented
+            return self._key != other._key
+
+    v_packaging__VERSION_PATTERN = """
+        v?
+        (?:
+            (?:(?P<epoch>[0-9]+)!)?                           # epoch
+            (?P<release>[0-9]+(?:\\.[0-9]+)*)                  # release segment
+            (?P<pre>                                          # pre-release
+                [-_\\.]?
+                (?P<pre_l>alpha|a|beta|b|preview|pre|c|rc)
+                [-_\\.]?
+                (?P<pre_n>[0-9]+)?
+            )?
+            (?P<post>                                         # post release
+                (?:-(?P<post_n1>[0-9]+))
+                |
+                (?:
+                    [-_\\.]?
+                    (?P<post_l>post|rev|r)
+                    [-_\\.]?
+                    (?P<post_n2>[0-9]+)?
+                )
+            )?
+            (?P<dev>                                          # dev release
+                [-_\\.]?
+                (?P<dev_l>dev)
+                [-_\\.]?
+                (?P<dev_n>[0-9]+)?
+            )?
+        )
+        (?:\\+(?P<local>[a-z0-9]+(?:[-_\\.][a-z0-9]+)*))?       # local version
+    """
+    v_packaging_VERSION_PATTERN = v_packaging__VERSION_PATTERN
 
-    @property
-    def is_postrelease(self) -> bool:
-        return self.post is not None
+    class v_packaging_Version(v_packaging__BaseVersion):
+        _regex = re.compile(
+            "^\\s*" + v_packaging_VERSION_PATTERN + "\\s*$", re.VERBOSE | re.IGNORECASE
+        )
+        _key: v_packaging_CmpKey
+
+        def __init__(self, version: str) -> None:
+            match = self._regex.search(version)
+            if not match:
+                raise v_packaging_InvalidVersion(f"Invalid version: '{version}'")
+            self._version = v_packaging__Version(
+                epoch=int(match.group("epoch")) if match.group("epoch") else 0,
+                release=tuple(int(i) for i in match.group("release").split(".")),
+                pre=v_packaging__parse_letter_version(
+                    match.group("pre_l"), match.group("pre_n")
+                ),
+                post=v_packaging__parse_letter_version(
+                    match.group("post_l"),
+                    match.group("post_n1") or match.group("post_n2"),
+                ),
+                dev=v_packaging__parse_letter_version(
+                    match.group("dev_l"), match.group("dev_n")
+                ),
+                local=v_packaging__parse_local_version(match.group("local")),
+            )
+            self._key = v_packaging__cmpkey(
+                self._version.epoch,
+                self._version.release,
+                self._version.pre,
+                self._version.post,
+                self._version.dev,
+                self._version.local,
+            )
 
-    @property
-    def is_devrelease(self) -> bool:
-        return self.dev is not None
+        def __repr__(self) -> str:
+            return f"<Version('{self}')>"
 
-    @property
-    def major(self) -> int:
-        return self.release[0] if len(self.release) >= 1 else 0
+        def __str__(self) -> str:
+            parts = []
+            if self.epoch != 0:
+                parts.append(f"{self.epoch}!")
+            parts.append(".".join(str(x) for x in self.release))
+            if self.pre is not None:
+                parts.append("".join(str(x) for x in self.pre))
+            if self.post is not None:
+                parts.append(f".post{self.post}")
+            if self.dev is not None:
+                parts.append(f".dev{self.dev}")
+            if self.local is not None:
+                parts.append(f"+{self.local}")
+            return "".join(parts)
+
+        @property
+        def epoch(self) -> int:
+            return self._version.epoch
+
+        @property
+        def release(self) -> Tuple[int, ...]:
+            return self._version.release
+
+        @property
+        def pre(self) -> Optional[Tuple[str, int]]:
+            return self._version.pre
+
+        @property
+        def post(self) -> Optional[int]:
+            return self._version.post[1] if self._version.post else None
+
+        @property
+        def dev(self) -> Optional[int]:
+            return self._version.dev[1] if self._version.dev else None
+
+        @property
+        def local(self) -> Optional[str]:
+            if self._version.local:
+                return ".".join(str(x) for x in self._version.local)
+            else:
+                return None
 
-    @property
-    def minor(self) -> int:
-        return self.release[1] if len(self.release) >= 2 else 0
+        @property
+        def public(self) -> str:
+            return str(self).split("+", 1)[0]
 
-    @property
-    def micro(self) -> int:
-        return self.release[2] if len(self.release) >= 3 else 0
-
-
-def v_packaging__parse_letter_version(
-    letter: Optional[str], number: Union[str, bytes, SupportsInt, None]
-) -> Optional[Tuple[str, int]]:
-    if letter:
-        if number is None:
-            number = 0
-        letter = letter.lower()
-        if letter == "alpha":
-            letter = "a"
-        elif letter == "beta":
-            letter = "b"
-        elif letter in ["c", "pre", "preview"]:
-            letter = "rc"
-        elif letter in ["rev", "r"]:
+        @property
+        def base_version(self) -> str:
+            parts = []
+            if self.epoch != 0:
+                parts.append(f"{self.epoch}!")
+            parts.append(".".join(str(x) for x in self.release))
+            return "".join(parts)
+
+        @property
+        def is_prerelease(self) -> bool:
+            return self.dev is not None or self.pre is not None
+
+        @property
+        def is_postrelease(self) -> bool:
+            return self.post is not None
+
+        @property
+        def is_devrelease(self) -> bool:
+            return self.dev is not None
+
+        @property
+        def major(self) -> int:
+            return self.release[0] if len(self.release) >= 1 else 0
+
+        @property
+        def minor(self) -> int:
+            return self.release[1] if len(self.release) >= 2 else 0
+
+        @property
+        def micro(self) -> int:
+            return self.release[2] if len(self.release) >= 3 else 0
+
+    def v_packaging__parse_letter_version(
+        letter: Optional[str], number: Union[str, bytes, SupportsInt, None]
+    ) -> Optional[Tuple[str, int]]:
+        if letter:
+            if number is None:
+                number = 0
+            letter = letter.lower()
+            if letter == "alpha":
+                letter = "a"
+            elif letter == "beta":
+                letter = "b"
+            elif letter in ["c", "pre", "preview"]:
+                letter = "rc"
+            elif letter in ["rev", "r"]:
+                letter = "post"
+            return letter, int(number)
+        if not letter and number:
             letter = "post"
-        return letter, int(number)
-    if not letter and number:
-        letter = "post"
-        return letter, int(number)
-    return None
-
-
-v_packaging__local_version_separators = re.compile("[\\._-]")
-
-
-def v_packaging__parse_local_version(
-    local: Optional[str],
-) -> Optional[v_packaging_LocalType]:
-    if local is not None:
-        return tuple(
-            part.lower() if not part.isdigit() else int(part)
-            for part in v_packaging__local_version_separators.split(local)
+            return letter, int(number)
+        return None
+
+    v_packaging__local_version_separators = re.compile("[\\._-]")
+
+    def v_packaging__parse_local_version(
+        local: Optional[str],
+    ) -> Optional[v_packaging_LocalType]:
+        if local is not None:
+            return tuple(
+                part.lower() if not part.isdigit() else int(part)
+                for part in v_packaging__local_version_separators.split(local)
+            )
+        return None
+
+    def v_packaging__cmpkey(
+        epoch: int,
+        release: Tuple[int, ...],
+        pre: Optional[Tuple[str, int]],
+        post: Optional[Tuple[str, int]],
+        dev: Optional[Tuple[str, int]],
+        local: Optional[v_packaging_LocalType],
+    ) -> v_packaging_CmpKey:
+        _release = tuple(
+            reversed(list(itertools.dropwhile(lambda x: x == 0, reversed(release))))
         )
-    return None
+        if pre is None and post is None and dev is not None:
+            _pre: v_packaging_CmpPrePostDevType = v_packaging_NegativeInfinity
+        elif pre is None:
+            _pre = v_packaging_Infinity
+        else:
+            _pre = pre
+        if post is None:
+            _post: v_packaging_CmpPrePostDevType = v_packaging_NegativeInfinity
+        else:
+            _post = post
+        if dev is None:
+            _dev: v_packaging_CmpPrePostDevType = v_packaging_Infinity
+        else:
+            _dev = dev
+        if local is None:
+            _local: v_packaging_CmpLocalType = v_packaging_NegativeInfinity
+        else:
+            _local = tuple(
+                (i, "") if isinstance(i, int) else (v_packaging_NegativeInfinity, i)
+                for i in local
+            )
+        return epoch, _release, _pre, _post, _dev, _local
 
+    def v_packaging_canonicalize_version(
+        version: Union[v_packaging_Version, str], *, strip_trailing_zero: bool = True
+    ) -> str:
+        if isinstance(version, str):
+            try:
+                v_packaging_parsed = v_packaging_Version(version)
+            except v_packaging_InvalidVersion:
+                return version
+        else:
+            v_packaging_parsed = version
+        parts = []
+        if v_packaging_parsed.epoch != 0:
+            parts.append(f"{v_packaging_parsed.epoch}!")
+        release_segment = ".".join(str(x) for x in v_packaging_parsed.release)
+        if strip_trailing_zero:
+            release_segment = re.sub("(\\.0)+$", "", release_segment)
+        parts.append(release_segment)
+        if v_packaging_parsed.pre is not None:
+            parts.append("".join(str(x) for x in v_packaging_parsed.pre))
+        if v_packaging_parsed.post is not None:
+            parts.append(f".post{v_packaging_parsed.post}")
+        if v_packaging_parsed.dev is not None:
+            parts.append(f".dev{v_packaging_parsed.dev}")
+        if v_packaging_parsed.local is not None:
+            parts.append(f"+{v_packaging_parsed.local}")
+        return "".join(parts)
 
-def v_packaging__cmpkey(
-    epoch: int,
-    release: Tuple[int, ...],
-    pre: Optional[Tuple[str, int]],
-    post: Optional[Tuple[str, int]],
-    dev: Optional[Tuple[str, int]],
-    local: Optional[v_packaging_LocalType],
-) -> v_packaging_CmpKey:
-    _release = tuple(
-        reversed(list(itertools.dropwhile(lambda x: x == 0, reversed(release))))
+    v_packaging_UnparsedVersion = Union[v_packaging_Version, str]
+    v_packaging_UnparsedVersionVar = TypeVar(
+        "v_packaging_UnparsedVersionVar", bound=v_packaging_UnparsedVersion
     )
-    if pre is None and post is None and dev is not None:
-        _pre: v_packaging_CmpPrePostDevType = v_packaging_NegativeInfinity
-    elif pre is None:
-        _pre = v_packaging_Infinity
-    else:
-        _pre = pre
-    if post is None:
-        _post: v_packaging_CmpPrePostDevType = v_packaging_NegativeInfinity
-    else:
-        _post = post
-    if dev is None:
-        _dev: v_packaging_CmpPrePostDevType = v_packaging_Infinity
-    else:
-        _dev = dev
-    if local is None:
-        _local: v_packaging_CmpLocalType = v_packaging_NegativeInfinity
-    else:
-        _local = tuple(
-            (i, "") if isinstance(i, int) else (v_packaging_NegativeInfinity, i)
-            for i in local
-        )
-    return epoch, _release, _pre, _post, _dev, _local
-
-
-def v_packaging_canonicalize_version(
-    version: Union[v_packaging_Version, str], *, strip_trailing_zero: bool = True
-) -> str:
-    if isinstance(version, str):
-        try:
-            v_packaging_parsed = v_packaging_Version(version)
-        except v_packaging_InvalidVersion:
-            return version
-    else:
-        v_packaging_parsed = version
-    parts = []
-    if v_packaging_parsed.epoch != 0:
-        parts.append(f"{v_packaging_parsed.epoch}!")
-    release_segment = ".".join(str(x) for x in v_packaging_parsed.release)
-    if strip_trailing_zero:
-        release_segment = re.sub("(\\.0)+$", "", release_segment)
-    parts.append(release_segment)
-    if v_packaging_parsed.pre is not None:
-        parts.append("".join(str(x) for x in v_packaging_parsed.pre))
-    if v_packaging_parsed.post is not None:
-        parts.append(f".post{v_packaging_parsed.post}")
-    if v_packaging_parsed.dev is not None:
-        parts.append(f".dev{v_packaging_parsed.dev}")
-    if v_packaging_parsed.local is not None:
-        parts.append(f"+{v_packaging_parsed.local}")
-    return "".join(parts)
-
-
-v_packaging_UnparsedVersion = Union[v_packaging_Version, str]
-v_packaging_UnparsedVersionVar = TypeVar(
-    "v_packaging_UnparsedVersionVar", bound=v_packaging_UnparsedVersion
-)
-v_packaging_CallableOperator = Callable[[v_packaging_Version, str], bool]
-
+    v_packaging_CallableOperator = Callable[[v_packaging_Version, str], bool]
 
-def v_packaging__coerce_version(
-    version: v_packaging_UnparsedVersion,
-) -> v_packaging_Version:
-    if not isinstance(version, v_packaging_Version):
-        version = v_packaging_Version(version)
-    return version
+    def v_packaging__coerce_version(
+        version: v_packaging_UnparsedVersion,
+    ) -> v_packaging_Version:
+        if not isinstance(version, v_packaging_Version):
+            version = v_packaging_Version(version)
+        return version
 
-
-class v_packaging_InvalidSpecifier(ValueError):
-    pass
-
-
-class v_packaging_BaseSpecifier(metaclass=abc.ABCMeta):
-    @abc.abstractmethod
-    def __str__(self) -> str:
+    class v_packaging_InvalidSpecifier(ValueError):
         pass
 
-    @abc.abstractmethod
-    def __hash__(self) -> int:
-        pass
+    class v_packaging_BaseSpecifier(metaclass=abc.ABCMeta):
+        @abc.abstractmethod
+        def __str__(self) -> str:
+            pass
 
-    @abc.abstractmethod
-    def __eq__(self, other: object) -> bool:
-        pass
+        @abc.abstractmethod
+        def __hash__(self) -> int:
+            pass
 
-    @property
-    @abc.abstractmethod
-    def prereleases(self) -> Optional[bool]:
-        pass
+        @abc.abstractmethod
+        def __eq__(self, other: object) -> bool:
+            pass
 
-    @prereleases.setter
-    def prereleases(self, value: bool) -> None:
-        pass
+        @property
+        @abc.abstractmethod
+        def prereleases(self) -> Optional[bool]:
+            pass
 
-    @abc.abstractmethod
-    def contains(self, item: str, prereleases: Optional[bool] = None) -> bool:
-        pass
+        @prereleases.setter
+        def prereleases(self, value: bool) -> None:
+            pass
 
-    @abc.abstractmethod
-    def filter(
-        self,
-        iterable: Iterable[v_packaging_UnparsedVersionVar],
-        prereleases: Optional[bool] = None,
-    ) -> Iterator[v_packaging_UnparsedVersionVar]:
-        pass
+        @abc.abstractmethod
+        def contains(self, item: str, prereleases: Optional[bool] = None) -> bool:
+            pass
 
+        @abc.abstractmethod
+        def filter(
+            self,
+            iterable: Iterable[v_packaging_UnparsedVersionVar],
+            prereleases: Optional[bool] = None,
+        ) -> Iterator[v_packaging_UnparsedVersionVar]:
+            pass
 
-class v_packaging_Specifier(v_packaging_BaseSpecifier):
-    _operator_regex_str = """
-        (?P<operator>(~=|==|!=|<=|>=|<|>|===))
-        """
-    _version_regex_str = """
-        (?P<version>
-            (?:
-                # The identity operators allow for an escape hatch that will
-                # do an exact string match of the version you wish to install.
-                # This will not be v_packaging_parsed by PEP 440 and we cannot determine
-                # any semantic meaning from it. This operator is discouraged
-                # but included entirely as an escape hatch.
-                (?<====)  # Only match for the identity operator
-                \\s*
-                [^\\s;)]*  # The arbitrary version can be just about anything,
-                          # we match everything except for whitespace, a
-                          # semi-colon for marker support, and a closing paren
-                          # since versions can be enclosed in them.
-            )
-            |
-            (?:
-                # The (non)equality operators allow for wild card and local
-                # versions to be specified so we have to define these two
-                # operators separately to enable that.
-                (?<===|!=)            # Only match for equals and not equals
-                \\s*
-                v?
-                (?:[0-9]+!)?          # epoch
-                [0-9]+(?:\\.[0-9]+)*   # release
-                # You cannot use a wild card and a pre-release, post-release, a dev or
-                # local version together so group them with a | and make them optional.
+    class v_packaging_Specifier(v_packaging_BaseSpecifier):
+        _operator_regex_str = """
+            (?P<operator>(~=|==|!=|<=|>=|<|>|===))
+            """
+        _version_regex_str = """
+            (?P<version>
+                (?:
+                    # The identity operators allow for an escape hatch that will
+                    # do an exact string match of the version you wish to install.
+                    # This will not be v_packaging_parsed by PEP 440 and we cannot determine
+                    # any semantic meaning from it. This operator is discouraged
+                    # but included entirely as an escape hatch.
+                    (?<====)  # Only match for the identity operator
+                    \\s*
+                    [^\\s;)]*  # The arbitrary version can be just about anything,
+                              # we match everything except for whitespace, a
+                              # semi-colon for marker support, and a closing paren
+                              # since versions can be enclosed in them.
+                )
+                |
+                (?:
+                    # The (non)equality operators allow for wild card and local
+                    # versions to be specified so we have to define these two
+                    # operators separately to enable that.
+                    (?<===|!=)            # Only match for equals and not equals
+                    \\s*
+                    v?
+                    (?:[0-9]+!)?          # epoch
+                    [0-9]+(?:\\.[0-9]+)*   # release
+                    # You cannot use a wild card and a pre-release, post-release, a dev or
+                    # local version together so group them with a | and make them optional.
+                    (?:
+                        \\.\\*  # Wild card syntax of .*
+                        |
+                        (?:                                  # pre release
+                            [-_\\.]?
+                            (alpha|beta|preview|pre|a|b|c|rc)
+                            [-_\\.]?
+                            [0-9]*
+                        )?
+                        (?:                                  # post release
+                            (?:-[0-9]+)|(?:[-_\\.]?(post|rev|r)[-_\\.]?[0-9]*)
+                        )?
+                        (?:[-_\\.]?dev[-_\\.]?[0-9]*)?         # dev release
+                        (?:\\+[a-z0-9]+(?:[-_\\.][a-z0-9]+)*)? # local
+                    )?
+                )
+                |
                 (?:
-                    \\.\\*  # Wild card syntax of .*
-                    |
-                    (?:                                  # pre release
+                    # The compatible operator requires at least two digits in the
+                    # release segment.
+                    (?<=~=)               # Only match for the compatible operator
+                    \\s*
+                    v?
+                    (?:[0-9]+!)?          # epoch
+                    [0-9]+(?:\\.[0-9]+)+   # release  (We have a + instead of a *)
+                    (?:                   # pre release
                         [-_\\.]?
                         (alpha|beta|preview|pre|a|b|c|rc)
                         [-_\\.]?
                         [0-9]*
                     )?
-                    (?:                                  # post release
+                    (?:                                   # post release
                         (?:-[0-9]+)|(?:[-_\\.]?(post|rev|r)[-_\\.]?[0-9]*)
                     )?
-                    (?:[-_\\.]?dev[-_\\.]?[0-9]*)?         # dev release
-                    (?:\\+[a-z0-9]+(?:[-_\\.][a-z0-9]+)*)? # local
-                )?
-            )
-            |
-            (?:
-                # The compatible operator requires at least two digits in the
-                # release segment.
-                (?<=~=)               # Only match for the compatible operator
-                \\s*
-                v?
-                (?:[0-9]+!)?          # epoch
-                [0-9]+(?:\\.[0-9]+)+   # release  (We have a + instead of a *)
-                (?:                   # pre release
-                    [-_\\.]?
-                    (alpha|beta|preview|pre|a|b|c|rc)
-                    [-_\\.]?
-                    [0-9]*
-                )?
-                (?:                                   # post release
-                    (?:-[0-9]+)|(?:[-_\\.]?(post|rev|r)[-_\\.]?[0-9]*)
-                )?
-                (?:[-_\\.]?dev[-_\\.]?[0-9]*)?          # dev release
-            )
-            |
-            (?:
-                # All other operators only allow a sub set of what the
-                # (non)equality operators do. Specifically they do not allow
-                # local versions to be specified nor do they allow the prefix
-                # matching wild cards.
-                (?<!==|!=|~=)         # We have special cases for these
-                                      # operators so we want to make sure they
-                                      # don't match here.
-                \\s*
-                v?
-                (?:[0-9]+!)?          # epoch
-                [0-9]+(?:\\.[0-9]+)*   # release
-                (?:                   # pre release
-                    [-_\\.]?
-                    (alpha|beta|preview|pre|a|b|c|rc)
-                    [-_\\.]?
-                    [0-9]*
-                )?
-                (?:                                   # post release
-                    (?:-[0-9]+)|(?:[-_\\.]?(post|rev|r)[-_\\.]?[0-9]*)
-                )?
-                (?:[-_\\.]?dev[-_\\.]?[0-9]*)?          # dev release
+                    (?:[-_\\.]?dev[-_\\.]?[0-9]*)?          # dev release
+                )
+                |
+                (?:
+                    # All other operators only allow a sub set of what the
+                    # (non)equality operators do. Specifically they do not allow
+                    # local versions to be specified nor do they allow the prefix
+                    # matching wild cards.
+                    (?<!==|!=|~=)         # We have special cases for these
+                                          # operators so we want to make sure they
+                                          # don't match here.
+                    \\s*
+                    v?
+                    (?:[0-9]+!)?          # epoch
+                    [0-9]+(?:\\.[0-9]+)*   # release
+                    (?:                   # pre release
+                        [-_\\.]?
+                        (alpha|beta|preview|pre|a|b|c|rc)
+                        [-_\\.]?
+                        [0-9]*
+                    )?
+                    (?:                                   # post release
+                        (?:-[0-9]+)|(?:[-_\\.]?(post|rev|r)[-_\\.]?[0-9]*)
+                    )?
+                    (?:[-_\\.]?dev[-_\\.]?[0-9]*)?          # dev release
+                )
             )
+            """  # noqa: E501
+        _regex = re.compile(
+            "^\\s*" + _operator_regex_str + _version_regex_str + "\\s*$",
+            re.VERBOSE | re.IGNORECASE,
         )
-        """
-    _regex = re.compile(
-        "^\\s*" + _operator_regex_str + _version_regex_str + "\\s*$",
-        re.VERBOSE | re.IGNORECASE,
-    )
-    _operators = {
-        "~=": "compatible",
-        "==": "equal",
-        "!=": "not_equal",
-        "<=": "less_than_equal",
-        ">=": "greater_than_equal",
-        "<": "less_than",
-        ">": "greater_than",
-        "===": "arbitrary",
-    }
-
-    def __init__(self, spec: str = "", prereleases: Optional[bool] = None) -> None:
-        match = self._regex.search(spec)
-        if not match:
-            raise v_packaging_InvalidSpecifier(f"Invalid specifier: '{spec}'")
-        self._spec: Tuple[str, str] = (
-            match.group("operator").strip(),
-            match.group("version").strip(),
-        )
-        self._prereleases = prereleases
+        _operators = {
+            "~=": "compatible",
+            "==": "equal",
+            "!=": "not_equal",
+            "<=": "less_than_equal",
+            ">=": "greater_than_equal",
+            "<": "less_than",
+            ">": "greater_than",
+            "===": "arbitrary",
+        }
 
-    @property
-    def prereleases(self) -> bool:
-        if self._prereleases is not None:
-            return self._prereleases
-        operator, version = self._spec
-        if operator in ["==", ">=", "<=", "~=", "==="]:
-            if operator == "==" and version.endswith(".*"):
-                version = version[:-2]
-            if v_packaging_Version(version).is_prerelease:
-                return True
-        return False
+        def __init__(self, spec: str = "", prereleases: Optional[bool] = None) -> None:
+            match = self._regex.search(spec)
+            if not match:
+                raise v_packaging_InvalidSpecifier(f"Invalid specifier: '{spec}'")
+            self._spec: Tuple[str, str] = (
+                match.group("operator").strip(),
+                match.group("version").strip(),
+            )
+            self._prereleases = prereleases
+
+        @property
+        def prereleases(self) -> bool:
+            if self._prereleases is not None:
+                return self._prereleases
+            operator, version = self._spec
+            if operator in ["==", ">=", "<=", "~=", "==="]:
+                if operator == "==" and version.endswith(".*"):
+                    version = version[:-2]
+                if v_packaging_Version(version).is_prerelease:
+                    return True
+            return False
 
-    @prereleases.setter
-    def prereleases(self, value: bool) -> None:
-        self._prereleases = value
+        @prereleases.setter
+        def prereleases(self, value: bool) -> None:
+            self._prereleases = value
 
-    @property
-    def operator(self) -> str:
-        return self._spec[0]
+        @property
+        def operator(self) -> str:
+            return self._spec[0]
 
-    @property
-    def version(self) -> str:
-        return self._spec[1]
+        @property
+        def version(self) -> str:
+            return self._spec[1]
 
-    def __repr__(self) -> str:
-        pre = (
-            f", prereleases={self.prereleases!r}"
-            if self._prereleases is not None
-            else ""
-        )
-        return f"<{self.__class__.__name__}({str(self)!r}{pre})>"
+        def __repr__(self) -> str:
+            pre = (
+                f", prereleases={self.prereleases!r}"
+                if self._prereleases is not None
+                else ""
+            )
+            return f"<{self.__class__.__name__}({str(self)!r}{pre})>"
 
-    def __str__(self) -> str:
-        return "{}{}".format(*self._spec)
+        def __str__(self) -> str:
+            return "{}{}".format(*self._spec)
 
-    @property
-    def _canonical_spec(self) -> Tuple[str, str]:
-        canonical_version = v_packaging_canonicalize_version(
-            self._spec[1], strip_trailing_zero=self._spec[0] != "~="
-        )
-        return self._spec[0], canonical_version
+        @property
+        def _canonical_spec(self) -> Tuple[str, str]:
+            canonical_version = v_packaging_canonicalize_version(
+                self._spec[1], strip_trailing_zero=self._spec[0] != "~="
+            )
+            return self._spec[0], canonical_version
 
-    def __hash__(self) -> int:
-        return hash(self._canonical_spec)
+        def __hash__(self) -> int:
+            return hash(self._canonical_spec)
 
-    def __eq__(self, other: object) -> bool:
-        if isinstance(other, str):
-            try:
-                other = self.__class__(str(other))
-            except v_packaging_InvalidSpecifier:
+        def __eq__(self, other: object) -> bool:
+            if isinstance(other, str):
+                try:
+                    other = self.__class__(str(other))
+                except v_packaging_InvalidSpecifier:
+                    return NotImplemented
+            elif not isinstance(other, self.__class__):
                 return NotImplemented
-        elif not isinstance(other, self.__class__):
-            return NotImplemented
-        return self._canonical_spec == other._canonical_spec
-
-    def _get_operator(self, op: str) -> v_packaging_CallableOperator:
-        operator_callable: v_packaging_CallableOperator = getattr(
-            self, f"_compare_{self._operators[op]}"
-        )
-        return operator_callable
-
-    def _compare_compatible(self, prospective: v_packaging_Version, spec: str) -> bool:
-        prefix = v_packaging__version_join(
-            list(
-                itertools.takewhile(
-                    v_packaging__is_not_suffix, v_packaging__version_split(spec)
-                )
-            )[:-1]
-        )
-        prefix += ".*"
-        return self._get_operator(">=")(prospective, spec) and self._get_operator("==")(
-            prospective, prefix
-        )
+            return self._canonical_spec == other._canonical_spec
 
-    def _compare_equal(self, prospective: v_packaging_Version, spec: str) -> bool:
-        if spec.endswith(".*"):
-            normalized_prospective = v_packaging_canonicalize_version(
-                prospective.public, strip_trailing_zero=False
+        def _get_operator(self, op: str) -> v_packaging_CallableOperator:
+            operator_callable: v_packaging_CallableOperator = getattr(
+                self, f"_compare_{self._operators[op]}"
             )
-            normalized_spec = v_packaging_canonicalize_version(
-                spec[:-2], strip_trailing_zero=False
-            )
-            split_spec = v_packaging__version_split(normalized_spec)
-            split_prospective = v_packaging__version_split(normalized_prospective)
-            padded_prospective, _ = v_packaging__pad_version(
-                split_prospective, split_spec
+            return operator_callable
+
+        def _compare_compatible(
+            self, prospective: v_packaging_Version, spec: str
+        ) -> bool:
+            prefix = v_packaging__version_join(
+                list(
+                    itertools.takewhile(
+                        v_packaging__is_not_suffix, v_packaging__version_split(spec)
+                    )
+                )[:-1]
             )
-            shortened_prospective = padded_prospective[: len(split_spec)]
-            return shortened_prospective == split_spec
-        else:
-            spec_version = v_packaging_Version(spec)
-            if not spec_version.local:
-                prospective = v_packaging_Version(prospective.public)
-            return prospective == spec_version
-
-    def _compare_not_equal(self, prospective: v_packaging_Version, spec: str) -> bool:
-        return not self._compare_equal(prospective, spec)
-
-    def _compare_less_than_equal(
-        self, prospective: v_packaging_Version, spec: str
-    ) -> bool:
-        return v_packaging_Version(prospective.public) <= v_packaging_Version(spec)
-
-    def _compare_greater_than_equal(
-        self, prospective: v_packaging_Version, spec: str
-    ) -> bool:
-        return v_packaging_Version(prospective.public) >= v_packaging_Version(spec)
-
-    def _compare_less_than(
-        self, prospective: v_packaging_Version, spec_str: str
-    ) -> bool:
-        spec = v_packaging_Version(spec_str)
-        if not prospective < spec:
-            return False
-        if not spec.is_prerelease and prospective.is_prerelease:
-            if v_packaging_Version(prospective.base_version) == v_packaging_Version(
-                spec.base_version
-            ):
+            prefix += ".*"
+            return self._get_operator(">=")(prospective, spec) and self._get_operator(
+                "=="
+            )(prospective, prefix)
+
+        def _compare_equal(self, prospective: v_packaging_Version, spec: str) -> bool:
+            if spec.endswith(".*"):
+                normalized_prospective = v_packaging_canonicalize_version(
+                    prospective.public, strip_trailing_zero=False
+                )
+                normalized_spec = v_packaging_canonicalize_version(
+                    spec[:-2], strip_trailing_zero=False
+                )
+                split_spec = v_packaging__version_split(normalized_spec)
+                split_prospective = v_packaging__version_split(normalized_prospective)
+                padded_prospective, _ = v_packaging__pad_version(
+                    split_prospective, split_spec
+                )
+                shortened_prospective = padded_prospective[: len(split_spec)]
+                return shortened_prospective == split_spec
+            else:
+                spec_version = v_packaging_Version(spec)
+                if not spec_version.local:
+                    prospective = v_packaging_Version(prospective.public)
+                return prospective == spec_version
+
+        def _compare_not_equal(
+            self, prospective: v_packaging_Version, spec: str
+        ) -> bool:
+            return not self._compare_equal(prospective, spec)
+
+        def _compare_less_than_equal(
+            self, prospective: v_packaging_Version, spec: str
+        ) -> bool:
+            return v_packaging_Version(prospective.public) <= v_packaging_Version(spec)
+
+        def _compare_greater_than_equal(
+            self, prospective: v_packaging_Version, spec: str
+        ) -> bool:
+            return v_packaging_Version(prospective.public) >= v_packaging_Version(spec)
+
+        def _compare_less_than(
+            self, prospective: v_packaging_Version, spec_str: str
+        ) -> bool:
+            spec = v_packaging_Version(spec_str)
+            if not prospective < spec:
                 return False
-        return True
+            if not spec.is_prerelease and prospective.is_prerelease:
+                if v_packaging_Version(prospective.base_version) == v_packaging_Version(
+                    spec.base_version
+                ):
+                    return False
+            return True
 
-    def _compare_greater_than(
-        self, prospective: v_packaging_Version, spec_str: str
-    ) -> bool:
-        spec = v_packaging_Version(spec_str)
-        if not prospective > spec:
-            return False
-        if not spec.is_postrelease and prospective.is_postrelease:
-            if v_packaging_Version(prospective.base_version) == v_packaging_Version(
-                spec.base_version
-            ):
-                return False
-        if prospective.local is not None:
-            if v_packaging_Version(prospective.base_version) == v_packaging_Version(
-                spec.base_version
-            ):
+        def _compare_greater_than(
+            self, prospective: v_packaging_Version, spec_str: str
+        ) -> bool:
+            spec = v_packaging_Version(spec_str)
+            if not prospective > spec:
                 return False
-        return True
-
-    def _compare_arbitrary(self, prospective: v_packaging_Version, spec: str) -> bool:
-        return str(prospective).lower() == str(spec).lower()
-
-    def __contains__(self, item: Union[str, v_packaging_Version]) -> bool:
-        return self.contains(item)
-
-    def contains(
-        self, item: v_packaging_UnparsedVersion, prereleases: Optional[bool] = None
-    ) -> bool:
-        if prereleases is None:
-            prereleases = self.prereleases
-        normalized_item = v_packaging__coerce_version(item)
-        if normalized_item.is_prerelease and not prereleases:
-            return False
-        operator_callable: v_packaging_CallableOperator = self._get_operator(
-            self.operator
-        )
-        return operator_callable(normalized_item, self.version)
-
-    def filter(
-        self,
-        iterable: Iterable[v_packaging_UnparsedVersionVar],
-        prereleases: Optional[bool] = None,
-    ) -> Iterator[v_packaging_UnparsedVersionVar]:
-        yielded = False
-        found_prereleases = []
-        kw = {"prereleases": prereleases if prereleases is not None else True}
-        for version in iterable:
-            v_packaging_parsed_version = v_packaging__coerce_version(version)
-            if self.contains(v_packaging_parsed_version, **kw):
-                if v_packaging_parsed_version.is_prerelease and not (
-                    prereleases or self.prereleases
+            if not spec.is_postrelease and prospective.is_postrelease:
+                if v_packaging_Version(prospective.base_version) == v_packaging_Version(
+                    spec.base_version
                 ):
-                    found_prereleases.append(version)
-                else:
-                    yielded = True
-                    yield version
-        if not yielded and found_prereleases:
-            for version in found_prereleases:
-                yield version
-
-
-v_packaging__prefix_regex = re.compile("^([0-9]+)((?:a|b|c|rc)[0-9]+)$")
-
-
-def v_packaging__version_split(version: str) -> List[str]:
-    result: List[str] = []
-    epoch, _, rest = version.rpartition("!")
-    result.append(epoch or "0")
-    for item in rest.split("."):
-        match = v_packaging__prefix_regex.search(item)
-        if match:
-            result.extend(match.groups())
-        else:
-            result.append(item)
-    return result
-
-
-def v_packaging__version_join(components: List[str]) -> str:
-    epoch, *rest = components
-    return f"{epoch}!{'.'.join(rest)}"
+                    return False
+            if prospective.local is not None:
+                if v_packaging_Version(prospective.base_version) == v_packaging_Version(
+                    spec.base_version
+                ):
+                    return False
+            return True
 
+        def _compare_arbitrary(
+            self, prospective: v_packaging_Version, spec: str
+        ) -> bool:
+            return str(prospective).lower() == str(spec).lower()
+
+        def __contains__(self, item: Union[str, v_packaging_Version]) -> bool:
+            return self.contains(item)
+
+        def contains(
+            self, item: v_packaging_UnparsedVersion, prereleases: Optional[bool] = None
+        ) -> bool:
+            if prereleases is None:
+                prereleases = self.prereleases
+            normalized_item = v_packaging__coerce_version(item)
+            if normalized_item.is_prerelease and not prereleases:
+                return False
+            operator_callable: v_packaging_CallableOperator = self._get_operator(
+                self.operator
+            )
+            return operator_callable(normalized_item, self.version)
+
+        def filter(
+            self,
+            iterable: Iterable[v_packaging_UnparsedVersionVar],
+            prereleases: Optional[bool] = None,
+        ) -> Iterator[v_packaging_UnparsedVersionVar]:
+            yielded = False
+            found_prereleases = []
+            kw = {"prereleases": prereleases if prereleases is not None else True}
+            for version in iterable:
+                v_packaging_parsed_version = v_packaging__coerce_version(version)
+                if self.contains(v_packaging_parsed_version, **kw):
+                    if v_packaging_parsed_version.is_prerelease and not (
+                        prereleases or self.prereleases
+                    ):
+                        found_prereleases.append(version)
+                    else:
+                        yielded = True
+                        yield version
+            if not yielded and found_prereleases:
+                for version in found_prereleases:
+                    yield version
 
-def v_packaging__is_not_suffix(segment: str) -> bool:
-    return not any(
-        segment.startswith(prefix) for prefix in ("dev", "a", "b", "rc", "post")
-    )
+    v_packaging__prefix_regex = re.compile("^([0-9]+)((?:a|b|c|rc)[0-9]+)$")
 
+    def v_packaging__version_split(version: str) -> List[str]:
+        result: List[str] = []
+        epoch, _, rest = version.rpartition("!")
+        result.append(epoch or "0")
+        for item in rest.split("."):
+            match = v_packaging__prefix_regex.search(item)
+            if match:
+                result.extend(match.groups())
+            else:
+                result.append(item)
+        return result
 
-def v_packaging__pad_version(
-    left: List[str], right: List[str]
-) -> Tuple[List[str], List[str]]:
-    left_split, right_split = [], []
-    left_split.append(list(itertools.takewhile(lambda x: x.isdigit(), left)))
-    right_split.append(list(itertools.takewhile(lambda x: x.isdigit(), right)))
-    left_split.append(left[len(left_split[0]) :])
-    right_split.append(right[len(right_split[0]) :])
-    left_split.insert(1, ["0"] * max(0, len(right_split[0]) - len(left_split[0])))
-    right_split.insert(1, ["0"] * max(0, len(left_split[0]) - len(right_split[0])))
-    return list(itertools.chain.from_iterable(left_split)), list(
-        itertools.chain.from_iterable(right_split)
-    )
+    def v_packaging__version_join(components: List[str]) -> str:
+        epoch, *rest = components
+        return f"{epoch}!{'.'.join(rest)}"
 
+    def v_packaging__is_not_suffix(segment: str) -> bool:
+        return not any(
+            segment.startswith(prefix) for prefix in ("dev", "a", "b", "rc", "post")
+        )
 
-class v_packaging_SpecifierSet(v_packaging_BaseSpecifier):
-    def __init__(
-        self, specifiers: str = "", prereleases: Optional[bool] = None
-    ) -> None:
-        split_specifiers = [s.strip() for s in specifiers.split(",") if s.strip()]
-        self._specs = frozenset(map(v_packaging_Specifier, split_specifiers))
-        self._prereleases = prereleases
+    def v_packaging__pad_version(
+        left: List[str], right: List[str]
+    ) -> Tuple[List[str], List[str]]:
+        left_split, right_split = [], []
+        left_split.append(list(itertools.takewhile(lambda x: x.isdigit(), left)))
+        right_split.append(list(itertools.takewhile(lambda x: x.isdigit(), right)))
+        left_split.append(left[len(left_split[0]) :])
+        right_split.append(right[len(right_split[0]) :])
+        left_split.insert(1, ["0"] * max(0, len(right_split[0]) - len(left_split[0])))
+        right_split.insert(1, ["0"] * max(0, len(left_split[0]) - len(right_split[0])))
+        return list(itertools.chain.from_iterable(left_split)), list(
+            itertools.chain.from_iterable(right_split)
+        )
 
-    @property
-    def prereleases(self) -> Optional[bool]:
-        if self._prereleases is not None:
-            return self._prereleases
-        if not self._specs:
-            return None
-        return any(s.prereleases for s in self._specs)
-
-    @prereleases.setter
-    def prereleases(self, value: bool) -> None:
-        self._prereleases = value
-
-    def __repr__(self) -> str:
-        pre = (
-            f", prereleases={self.prereleases!r}"
-            if self._prereleases is not None
-            else ""
-        )
-        return f"<SpecifierSet({str(self)!r}{pre})>"
-
-    def __str__(self) -> str:
-        return ",".join(sorted(str(s) for s in self._specs))
-
-    def __hash__(self) -> int:
-        return hash(self._specs)
-
-    def __and__(
-        self, other: Union["v_packaging_SpecifierSet", str]
-    ) -> "v_packaging_SpecifierSet":
-        if isinstance(other, str):
-            other = v_packaging_SpecifierSet(other)
-        elif not isinstance(other, v_packaging_SpecifierSet):
-            return NotImplemented
-        specifier = v_packaging_SpecifierSet()
-        specifier._specs = frozenset(self._specs | other._specs)
-        if self._prereleases is None and other._prereleases is not None:
-            specifier._prereleases = other._prereleases
-        elif self._prereleases is not None and other._prereleases is None:
-            specifier._prereleases = self._prereleases
-        elif self._prereleases == other._prereleases:
-            specifier._prereleases = self._prereleases
-        else:
-            raise ValueError(
-                "Cannot combine v_packaging_SpecifierSets"
-                "with True and False prerelease overrides."
+    class v_packaging_SpecifierSet(v_packaging_BaseSpecifier):
+        def __init__(
+            self, specifiers: str = "", prereleases: Optional[bool] = None
+        ) -> None:
+            split_specifiers = [s.strip() for s in specifiers.split(",") if s.strip()]
+            self._specs = frozenset(map(v_packaging_Specifier, split_specifiers))
+            self._prereleases = prereleases
+
+        @property
+        def prereleases(self) -> Optional[bool]:
+            if self._prereleases is not None:
+                return self._prereleases
+            if not self._specs:
+                return None
+            return any(s.prereleases for s in self._specs)
+
+        @prereleases.setter
+        def prereleases(self, value: bool) -> None:
+            self._prereleases = value
+
+        def __repr__(self) -> str:
+            pre = (
+                f", prereleases={self.prereleases!r}"
+                if self._prereleases is not None
+                else ""
             )
-        return specifier
+            return f"<SpecifierSet({str(self)!r}{pre})>"
 
-    def __eq__(self, other: object) -> bool:
-        if isinstance(other, (str, v_packaging_Specifier)):
-            other = v_packaging_SpecifierSet(str(other))
-        elif not isinstance(other, v_packaging_SpecifierSet):
-            return NotImplemented
-        return self._specs == other._specs
+        def __str__(self) -> str:
+            return ",".join(sorted(str(s) for s in self._specs))
 
-    def __len__(self) -> int:
-        return len(self._specs)
+        def __hash__(self) -> int:
+            return hash(self._specs)
 
-    def __iter__(self) -> Iterator[v_packaging_Specifier]:
-        return iter(self._specs)
+        def __and__(
+            self, other: Union["v_packaging_SpecifierSet", str]
+        ) -> "v_packaging_SpecifierSet":
+            if isinstance(other, str):
+                other = v_packaging_SpecifierSet(other)
+            elif not isinstance(other, v_packaging_SpecifierSet):
+                return NotImplemented
+            specifier = v_packaging_SpecifierSet()
+            specifier._specs = frozenset(self._specs | other._specs)
+            if self._prereleases is None and other._prereleases is not None:
+                specifier._prereleases = other._prereleases
+            elif self._prereleases is not None and other._prereleases is None:
+                specifier._prereleases = self._prereleases
+            elif self._prereleases == other._prereleases:
+                specifier._prereleases = self._prereleases
+            else:
+                raise ValueError(
+                    "Cannot combine v_packaging_SpecifierSets"
+                    "with True and False prerelease overrides."
+                )
+            return specifier
 
-    def __contains__(self, item: v_packaging_UnparsedVersion) -> bool:
-        return self.contains(item)
+        def __eq__(self, other: object) -> bool:
+            if isinstance(other, (str, v_packaging_Specifier)):
+                other = v_packaging_SpecifierSet(str(other))
+            elif not isinstance(other, v_packaging_SpecifierSet):
+                return NotImplemented
+            return self._specs == other._specs
+
+        def __len__(self) -> int:
+            return len(self._specs)
+
+        def __iter__(self) -> Iterator[v_packaging_Specifier]:
+            return iter(self._specs)
+
+        def __contains__(self, item: v_packaging_UnparsedVersion) -> bool:
+            return self.contains(item)
+
+        def contains(
+            self,
+            item: v_packaging_UnparsedVersion,
+            prereleases: Optional[bool] = None,
+            installed: Optional[bool] = None,
+        ) -> bool:
+            if not isinstance(item, v_packaging_Version):
+                item = v_packaging_Version(item)
+            if prereleases is None:
+                prereleases = self.prereleases
+            if not prereleases and item.is_prerelease:
+                return False
+            if installed and item.is_prerelease:
+                item = v_packaging_Version(item.base_version)
+            return all(s.contains(item, prereleases=prereleases) for s in self._specs)
+
+        def filter(
+            self,
+            iterable: Iterable[v_packaging_UnparsedVersionVar],
+            prereleases: Optional[bool] = None,
+        ) -> Iterator[v_packaging_UnparsedVersionVar]:
+            if prereleases is None:
+                prereleases = self.prereleases
+            if self._specs:
+                for spec in self._specs:
+                    iterable = spec.filter(iterable, prereleases=bool(prereleases))
+                return iter(iterable)
+            else:
+                filtered: List[v_packaging_UnparsedVersionVar] = []
+                found_prereleases: List[v_packaging_UnparsedVersionVar] = []
+                for item in iterable:
+                    v_packaging_parsed_version = v_packaging__coerce_version(item)
+                    if v_packaging_parsed_version.is_prerelease and not prereleases:
+                        if not filtered:
+                            found_prereleases.append(item)
+                    else:
+                        filtered.append(item)
+                if not filtered and found_prereleases and prereleases is None:
+                    return iter(found_prereleases)
+                return iter(filtered)
+
+    return v_packaging_Version, v_packaging_SpecifierSet
 
-    def contains(
-        self,
-        item: v_packaging_UnparsedVersion,
-        prereleases: Optional[bool] = None,
-        installed: Optional[bool] = None,
-    ) -> bool:
-        if not isinstance(item, v_packaging_Version):
-            item = v_packaging_Version(item)
-        if prereleases is None:
-            prereleases = self.prereleases
-        if not prereleases and item.is_prerelease:
-            return False
-        if installed and item.is_prerelease:
-            item = v_packaging_Version(item.base_version)
-        return all(s.contains(item, prereleases=prereleases) for s in self._specs)
 
-    def filter(
-        self,
-        iterable: Iterable[v_packaging_UnparsedVersionVar],
-        prereleases: Optional[bool] = None,
-    ) -> Iterator[v_packaging_UnparsedVersionVar]:
-        if prereleases is None:
-            prereleases = self.prereleases
-        if self._specs:
-            for spec in self._specs:
-                iterable = spec.filter(iterable, prereleases=bool(prereleases))
-            return iter(iterable)
-        else:
-            filtered: List[v_packaging_UnparsedVersionVar] = []
-            found_prereleases: List[v_packaging_UnparsedVersionVar] = []
-            for item in iterable:
-                v_packaging_parsed_version = v_packaging__coerce_version(item)
-                if v_packaging_parsed_version.is_prerelease and not prereleases:
-                    if not filtered:
-                        found_prereleases.append(item)
-                else:
-                    filtered.append(item)
-            if not filtered and found_prereleases and prereleases is None:
-                return iter(found_prereleases)
-            return iter(filtered)
+#### END VENDORED PACKAGING ####
 
 
-Version = v_packaging_Version
-SpecifierSet = v_packaging_SpecifierSet
+def toml_loads(txt: str) -> Dict[str, Any]:
+    return _vendored_tomli()(txt)
 
-#### END VENDORED PACKAGING ####
+
+def __getattr__(name: str) -> Any:
+    # vendored packaging is only loaded on first use
+    if name == "Version":
+        return _vendored_packaging()[0]
+    elif name == "SpecifierSet":
+        return _vendored_packaging()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class Spinner:
@@ -1743,6 +1794,8 @@ class Spinner:
             self.remove_spinner()
 
     def __enter__(self) -> None:
+        import threading  # noqa
+
         if sys.stderr.isatty():
             self._screen_lock = threading.Lock()
             self.busy = True
@@ -1763,7 +1816,8 @@ class Spinner:
 
 
 def _path_ok(p: Path) -> Path:
-    p.mkdir(exist_ok=True, parents=True)
+    if not p.is_dir():
+        p.mkdir(exist_ok=True, parents=True)
     return p
 
 
@@ -1793,7 +1847,7 @@ class Env:
 
     @property
     def _viv_log_path(self) -> Path:
-        return _path_ok(Path(self.xdg_data_home) / "viv") / "viv.log"
+        return Path(self.xdg_data_home) / "viv" / "viv.log"
 
     @property
     def _viv_run_mode(self) -> str:
@@ -1808,10 +1862,23 @@ class Env:
             )
         return run_mode
 
+    @property
+    def _viv_reuse(self) -> str:
+        choices = {"exact", "satisfying"}
+        reuse = os.getenv("VIV_REUSE", "exact")
+        if reuse not in choices:
+            err_quit(
+                f"unsupported VIV_REUSE: {reuse} \noptions: "
+                + ", ".join(
+                    (f"{a.bold}{a.yellow}{choice}{a.end}" for choice in choices)
+                )
+            )
+        return reuse
+
 
 class System:
     def __init__(self) -> None:
-        self.is_win = platform.system() == "Windows"
+        self.is_win = os.name == "nt"
         (self.bin_dir, *_) = ("Scripts",) if self.is_win else ("bin",)
 
     def bin(self, exe: str) -> str:
@@ -1824,9 +1891,7 @@ system = System()
 class Cfg:
     @property
     def src(self) -> Path:
-        p = Path(Env().xdg_data_home) / "viv" / "viv.py"
-        p.parent.mkdir(exist_ok=True, parents=True)
-        return p
+        return Path(Env().xdg_data_home) / "viv" / "viv.py"
 
     @property
     def cache_base(self) -> Path:
@@ -1840,11 +1905,24 @@ class Cfg:
     def cache_venv(self) -> Path:
         return _path_ok(self.cache_base / "venvs")
 
+    @property
+    def store(self) -> Path:
+        return Path(Env().viv_store) if Env().viv_store else self.cache_base / "store"
+
 
 class Ansi:
-    """control ouptut of ansi(VT100) control codes"""
+    """control ouptut of ansi(VT100) control codes
 
-    def __init__(self) -> None:
+    codes are resolved on first access rather than at import
+    """
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("__") or "prefix" in self.__dict__:
+            raise AttributeError(attr)
+        self._setup()
+        return getattr(self, attr)
+
+    def _setup(self) -> None:
         self.bold = "\033[1m"
         self.dim = "\033[2m"
         self.underline = "\033[4m"
@@ -1941,9 +2019,9 @@ class MutlilineFormatter(logging.Formatter):
 
 
 class CustomFormatter(logging.Formatter):
-    def __init__(self) -> None:
-        super().__init__()
-        self.FORMATS = {
+    @property
+    def FORMATS(self) -> Dict[int, str]:
+        return {
             **{
                 level: " ".join(
                     (
@@ -1968,25 +2046,97 @@ class CustomFormatter(logging.Formatter):
         return formatter.format(record)
 
 
-class CustomFileHandler(RotatingFileHandler):
-    """Custom logging handler to strip ansi before logging to file"""
+class CustomFileHandler(logging.Handler):
+    """Custom logging handler to strip ansi before logging to file
 
-    def emit(self, record: logging.LogRecord) -> None:
-        record.msg = a.escape(record.msg)
-        super().emit(record)
+    The rotating log file (and its directory) is only opened once
+    the first record is emitted. With `queued=True` records are handed
+    off to a background thread which escapes, writes and rotates the
+    log file, the queue is drained at exit and any later records are
+    written synchronously.
+    """
 
+    def __init__(self, path: Path, queued: bool = False, **kwargs: Any) -> None:
+        super().__init__()
+        self.path = path
+        self.kwargs = kwargs
+        self.handler: Optional[logging.Handler] = None
+        self.queue: Optional[SimpleQueue[Optional[logging.LogRecord]]] = None
+        self.queued = queued
 
-def gen_logger() -> logging.Logger:
-    logger = logging.getLogger("viv")
-    if not logger.handlers:
-        logger.setLevel(logging.DEBUG)
+    def _open(self) -> logging.Handler:
+        from logging.handlers import RotatingFileHandler  # noqa
+
+        self.path.parent.mkdir(exist_ok=True, parents=True)
+        handler = RotatingFileHandler(self.path, **self.kwargs)
+        handler.setFormatter(self.formatter)
+        return handler
+
+    def _write(self, record: logging.LogRecord) -> None:
+        if self.handler is None:
+            self.handler = self._open()
+        record.msg = a.escape(record.msg)
+        self.handler.emit(record)
+
+    def _start(self) -> SimpleQueue[Optional[logging.LogRecord]]:
+        import threading  # noqa
+        from queue import SimpleQueue  # noqa
+
+        q: SimpleQueue[Optional[logging.LogRecord]] = SimpleQueue()
+
+        def worker() -> None:
+            while (record := q.get()) is not None:
+                self._write(record)
+
+        self.thread = threading.Thread(target=worker, name="viv-log", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush_queue)
+        return q
+
+    def flush_queue(self) -> None:
+        """write any pending records and stop the background thread"""
+        if self.queue is not None:
+            self.queue.put(None)
+            self.thread.join()
+            self.queue = None
+        # nothing would drain a queue restarted by a later atexit callback
+        self.queued = False
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not self.queued:
+            self._write(record)
+            return
+        if self.queue is None:
+            self.queue = self._start()
+        # the record may reference state which changes before it's written
+        record.msg = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.args = None
+        record.exc_info = None
+        self.queue.put(record)
+
+    def close(self) -> None:
+        self.flush_queue()
+        if self.handler:
+            self.handler.close()
+        super().close()
+
+
+def gen_logger() -> logging.Logger:
+    logger = logging.getLogger("viv")
+    if not logger.handlers:
+        logger.setLevel(logging.DEBUG)
 
         ch = logging.StreamHandler()
         ch.setLevel(logging.INFO if not Env().viv_debug else logging.DEBUG)
         ch.setFormatter(CustomFormatter())
 
         fh = CustomFileHandler(
-            Env().viv_log_path, maxBytes=10 * 1024 * 1024, backupCount=5
+            Env().viv_log_path,
+            queued=bool(Env().viv_log_queue),
+            maxBytes=10 * 1024 * 1024,
+            backupCount=5,
         )
         fh.setLevel(logging.DEBUG)
         fh.setFormatter(
@@ -2001,6 +2151,85 @@ def gen_logger() -> logging.Logger:
 log = gen_logger()
 
 
+class Profile:
+    """opt-in phase timing, enabled with `VIV_PROFILE=path/to/trace.json`
+
+    Spans are written as chrome trace events (see chrome://tracing or
+    https://ui.perfetto.dev) with a one-line summary to stderr at exit.
+    """
+
+    def __init__(self, path: Optional[str] = None) -> None:
+        self.path = Path(path) if path else None
+        self.events: List[Dict[str, Any]] = []
+        self.start = perf_counter()
+        if self.path:
+            atexit.register(self.write)
+
+    @contextmanager
+    def span(self, name: str) -> Generator[None, None, None]:
+        if not self.path:
+            yield
+            return
+
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append(
+                dict(
+                    name=name,
+                    cat="viv",
+                    ph="X",
+                    pid=os.getpid(),
+                    tid=0,
+                    ts=round((start - self.start) * 1e6),
+                    dur=round((perf_counter() - start) * 1e6),
+                )
+            )
+
+    def summary(self) -> str:
+        totals: Dict[str, float] = {}
+        for event in self.events:
+            totals[event["name"]] = totals.get(event["name"], 0) + event["dur"]
+        return (
+            f"viv profile: {(perf_counter() - self.start) * 1e3:.1f}ms total | "
+            + ", ".join(
+                f"{name} {dur / 1e3:.1f}ms"
+                for name, dur in sorted(totals.items(), key=lambda x: -x[1])
+            )
+            + f" -> {self.path}"
+        )
+
+    def write(self) -> None:
+        if not self.path:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(dict(traceEvents=self.events)))
+        except OSError as e:
+            log.debug(f"failed to write profile: {e}")
+        sys.stderr.write(self.summary() + "\n")
+
+
+profile = Profile(Env().viv_profile)
+# children (i.e. of `viv run`) would otherwise overwrite the trace
+os.environ.pop("VIV_PROFILE", None)
+
+
+def span(func: F) -> F:
+    """record calls to func as a span when profiling"""
+    name = func.__qualname__
+
+    @wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not profile.path:
+            return func(*args, **kwargs)
+        with profile.span(name):
+            return func(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
 def err_quit(*msg: str, code: int = 1) -> NoReturn:
     log.error("\n".join(msg))
     sys.exit(code)
@@ -2032,10 +2261,14 @@ class Template:
         add_meta(id=_id, spec=spec, exe=exe, name=name)
     else:
         meta = i("json").loads((env / "vivmeta.json").read_text())
+    ok = lambda p: p.startswith(str(env)) and i("os").path.isdir(p)  # noqa
+    sp = meta.get("site_packages", "")
+    sp = sp if ok(sp) else str(*(env / "lib").glob("py*/si*"))
     add_meta(accessed=now, files=sorted({*meta.get("files", []), p_str(__file__)}))
-    (env / "vivmeta.json").write_text(i("json").dumps(meta))
-    i("site").addsitedir(sitepkgs := str(*(env / "lib").glob("py*/si*")))
-    sys.path = [sitepkgs, *filter(nopkgs, sys.path)]
+    (env / "vivmeta.json").write_text(i("json").dumps({**meta, "site_packages": sp}))
+    i("os").utime(cache)  # for viv to reindex
+    i("site").addsitedir(sp)
+    sys.path = [sp, *filter(nopkgs, sys.path)]
     return env
 """
 
@@ -2200,180 +2433,153 @@ def confirm(question: str, context: str = "", yes: bool = False) -> bool:
     sys.stderr.write("\n")
 
 
-class CustomHelpFormatter(RawDescriptionHelpFormatter, HelpFormatter):
-    """formatter to remove extra metavar on short opts"""
+@lru_cache(maxsize=None)
+def _argument_parser() -> Type[StdArgParser]:
+    """argparse machinery, only loaded when running the cli"""
+    from argparse import (  # noqa
+        SUPPRESS,
+        Action,
+        HelpFormatter,
+        RawDescriptionHelpFormatter,
+    )
+    from argparse import ArgumentParser as StdArgParser  # noqa
 
-    def _get_invocation_length(self, invocation: str) -> int:
-        return len(a.escape(invocation))
+    class CustomHelpFormatter(RawDescriptionHelpFormatter, HelpFormatter):
+        """formatter to remove extra metavar on short opts"""
 
-    def _format_action_invocation(self, action: Action) -> str:
-        if not action.option_strings:
-            (metavar,) = self._metavar_formatter(action, action.dest)(1)
-            return a.style(metavar, style="option")
-        else:
-            parts = []
-            # if the Optional doesn't take a value, format is:
-            #    -s, --long
-            if action.nargs == 0:
-                parts.extend(
-                    [
-                        a.style(option, style="option")
-                        for option in action.option_strings
-                    ]
-                )
+        def _get_invocation_length(self, invocation: str) -> int:
+            return len(a.escape(invocation))
 
-            # if the Optional takes a value, format is:
-            #    -s ARGS, --long ARGS
-            # change to
-            #    -s, --long ARGS
+        def _format_action_invocation(self, action: Action) -> str:
+            if not action.option_strings:
+                (metavar,) = self._metavar_formatter(action, action.dest)(1)
+                return a.style(metavar, style="option")
             else:
-                default = action.dest.upper()
-                args_string = self._format_args(action, default)
-                parts.extend(
-                    [
-                        a.style(option, style="option")
-                        for option in action.option_strings
-                    ]
-                )
-                # add metavar to last string
-                parts[-1] += a.style(f" {args_string}", style="metavar")
-            return (", ").join(parts)
-
-    def _format_usage(self, *args: Any, **kwargs: Any) -> str:
-        formatted_usage = super()._format_usage(*args, **kwargs)
-        # patch usage with color formatting
-        formatted_usage = (
-            formatted_usage
-            if f"{a.header}usage{a.end}:" in formatted_usage
-            else formatted_usage.replace("usage:", f"{a.header}usage{a.end}:")
-        )
-        return formatted_usage
-
-    def _format_action(self, action: Action) -> str:
-        # determine the required width and the entry label
-        help_position = min(self._action_max_length + 2, self._max_help_position)
-        help_width = max(self._width - help_position, 11)
-        action_width = help_position - self._current_indent
-        action_header = self._format_action_invocation(action)
-        action_header_len = len(a.escape(action_header))
-
-        # no help; start on same line and add a final newline
-        if not action.help:
-            action_header = "%*s%s\n" % (self._current_indent, "", action_header)
-        # short action name; start on the same line and pad two spaces
-        elif action_header_len <= action_width:
-            # tup = self._current_indent, "", action_width, action_header
-            action_header = (
-                f"{' '*self._current_indent}{action_header}"
-                f"{' '*(action_width+2 - action_header_len)}"
-            )
-            indent_first = 0
-
-        # long action name; start on the next line
-        else:
-            action_header = "%*s%s\n" % (self._current_indent, "", action_header)
-            indent_first = help_position
-
-        # collect the pieces of the action help
-        parts = [action_header]
-
-        # if there was help for the action, add lines of help text
-        if action.help and action.help.strip():
-            help_text = self._expand_help(action)
-            if help_text:
-                help_lines = self._split_lines(help_text, help_width)
-                parts.append("%*s%s\n" % (indent_first, "", help_lines[0]))
-                for line in help_lines[1:]:
-                    parts.append("%*s%s\n" % (help_position, "", line))
-
-        # or add a newline if the description doesn't end with one
-        elif not action_header.endswith("\n"):
-            parts.append("\n")
-
-        # if there are any sub-actions, add their help as well
-        for subaction in self._iter_indented_subactions(action):
-            parts.append(self._format_action(subaction))
-
-        # return a single string
-        return self._join_parts(parts)
-
-    def start_section(self, heading: Optional[str]) -> None:
-        if heading:
-            super().start_section(a.style(heading, style="header"))
-        else:
-            super()
-
-    def add_argument(self, action: Action) -> None:
-        if action.help is not SUPPRESS:
-            # find all invocations
-            get_invocation = self._format_action_invocation
-            invocations = [get_invocation(action)]
-            for subaction in self._iter_indented_subactions(action):
-                invocations.append(get_invocation(subaction))
-
-            # update the maximum item length accounting for ansi codes
-            invocation_length = max(map(self._get_invocation_length, invocations))
-            action_length = invocation_length + self._current_indent
-            self._action_max_length = max(self._action_max_length, action_length)
-
-            # add the item to the list
-            self._add_item(self._format_action, [action])
-
-
-class KVAppendAction(Action):
-    def __init__(self, *args: Any, keys: List[str], **kwargs: Any) -> None:
-        self._keys = keys
-        super(KVAppendAction, self).__init__(*args, **kwargs)
+                parts = []
+                # if the Optional doesn't take a value, format is:
+                #    -s, --long
+                if action.nargs == 0:
+                    parts.extend(
+                        [
+                            a.style(option, style="option")
+                            for option in action.option_strings
+                        ]
+                    )
 
-    def __call__(
-        self,
-        parser: StdArgParser,
-        namespace: Namespace,
-        values: Union[str, Sequence[Any], None],
-        option_string: str | None = None,
-    ) -> None:
-        if not isinstance(values, str):
-            raise TypeError("expected string for `values`")
-        try:
-            (k, v) = values.split(":")
-            if k not in self._keys:
-                err_quit(
-                    "".join(
-                        (
-                            f"unexpected key: {a.yellow}{k}{a.end} for {self.dest},",
-                            " must be one of: ",
-                            ", ".join((a.style(k, "bold") for k in self._keys)),
-                        )
+                # if the Optional takes a value, format is:
+                #    -s ARGS, --long ARGS
+                # change to
+                #    -s, --long ARGS
+                else:
+                    default = action.dest.upper()
+                    args_string = self._format_args(action, default)
+                    parts.extend(
+                        [
+                            a.style(option, style="option")
+                            for option in action.option_strings
+                        ]
                     )
-                )
-            d = {k: v}
-        except ValueError:
-            err_quit(
-                f"failed to parse key-value for {self.dest} "
-                f'"{a.bold}{values}{a.end}" as k:v'
+                    # add metavar to last string
+                    parts[-1] += a.style(f" {args_string}", style="metavar")
+                return (", ").join(parts)
+
+        def _format_usage(self, *args: Any, **kwargs: Any) -> str:
+            formatted_usage = super()._format_usage(*args, **kwargs)
+            # patch usage with color formatting
+            formatted_usage = (
+                formatted_usage
+                if f"{a.header}usage{a.end}:" in formatted_usage
+                else formatted_usage.replace("usage:", f"{a.header}usage{a.end}:")
             )
-        items = getattr(namespace, self.dest)
-        if not items:
-            items = {}
+            return formatted_usage
+
+        def _format_action(self, action: Action) -> str:
+            # determine the required width and the entry label
+            help_position = min(self._action_max_length + 2, self._max_help_position)
+            help_width = max(self._width - help_position, 11)
+            action_width = help_position - self._current_indent
+            action_header = self._format_action_invocation(action)
+            action_header_len = len(a.escape(action_header))
+
+            # no help; start on same line and add a final newline
+            if not action.help:
+                action_header = "%*s%s\n" % (self._current_indent, "", action_header)
+            # short action name; start on the same line and pad two spaces
+            elif action_header_len <= action_width:
+                # tup = self._current_indent, "", action_width, action_header
+                action_header = (
+                    f"{' '*self._current_indent}{action_header}"
+                    f"{' '*(action_width+2 - action_header_len)}"
+                )
+                indent_first = 0
 
-        items.update(d)
-        setattr(namespace, self.dest, items)
+            # long action name; start on the next line
+            else:
+                action_header = "%*s%s\n" % (self._current_indent, "", action_header)
+                indent_first = help_position
+
+            # collect the pieces of the action help
+            parts = [action_header]
+
+            # if there was help for the action, add lines of help text
+            if action.help and action.help.strip():
+                help_text = self._expand_help(action)
+                if help_text:
+                    help_lines = self._split_lines(help_text, help_width)
+                    parts.append("%*s%s\n" % (indent_first, "", help_lines[0]))
+                    for line in help_lines[1:]:
+                        parts.append("%*s%s\n" % (help_position, "", line))
+
+            # or add a newline if the description doesn't end with one
+            elif not action_header.endswith("\n"):
+                parts.append("\n")
+
+            # if there are any sub-actions, add their help as well
+            for subaction in self._iter_indented_subactions(action):
+                parts.append(self._format_action(subaction))
 
+            # return a single string
+            return self._join_parts(parts)
 
-class ArgumentParser(StdArgParser):
-    def __init__(self, *args: Any, **kwargs: Any) -> None:
-        super().__init__(*args, **kwargs)
+        def start_section(self, heading: Optional[str]) -> None:
+            if heading:
+                super().start_section(a.style(heading, style="header"))
+            else:
+                super()
+
+        def add_argument(self, action: Action) -> None:
+            if action.help is not SUPPRESS:
+                # find all invocations
+                get_invocation = self._format_action_invocation
+                invocations = [get_invocation(action)]
+                for subaction in self._iter_indented_subactions(action):
+                    invocations.append(get_invocation(subaction))
+
+                # update the maximum item length accounting for ansi codes
+                invocation_length = max(map(self._get_invocation_length, invocations))
+                action_length = invocation_length + self._current_indent
+                self._action_max_length = max(self._action_max_length, action_length)
+
+                # add the item to the list
+                self._add_item(self._format_action, [action])
+
+    class ArgumentParser(StdArgParser):
+        def __init__(self, *args: Any, **kwargs: Any) -> None:
+            super().__init__(*args, **kwargs)
+
+            self.formatter_class = lambda prog: CustomHelpFormatter(
+                prog,
+                max_help_position=35,
+            )
 
-        self.formatter_class = lambda prog: CustomHelpFormatter(
-            prog,
-            max_help_position=35,
-        )
+        def error(self, message: str) -> NoReturn:
+            error(message, f"see `{a.bold}{self.prog} --help{a.end}` for more info")
+            sys.exit(2)
 
-    def error(self, message: str) -> NoReturn:
-        error(message, f"see `{a.bold}{self.prog} --help{a.end}` for more info")
-        sys.exit(2)
+    return ArgumentParser
 
 
+@span
 def subprocess_run(
     command: List[str],
     spinmsg: str = "",
@@ -2388,6 +2594,7 @@ def subprocess_run(
         command: Subcommand to be run in subprocess.
         verbose: If true, print subcommand output.
     """
+    import subprocess  # noqa
 
     log.debug("executing subcmd:\n  " + " ".join(command))
 
@@ -2411,6 +2618,8 @@ def subprocess_run(
         a.subprocess(command, p.stdout)
 
         if clean_up_path and clean_up_path.is_dir():
+            import shutil  # noqa
+
             shutil.rmtree(str(clean_up_path))
 
         sys.exit(p.returncode)
@@ -2427,7 +2636,10 @@ def subprocess_run(
         return ""
 
 
+@span
 def subprocess_run_quit(command: List[str | Path], **kwargs: Any) -> None:
+    import subprocess  # noqa
+
     log.debug("executing subcmd:\n  " + " ".join(map(str, command)))
     sys.exit(subprocess.run(command, **kwargs).returncode)
 
@@ -2449,6 +2661,12 @@ def get_hash(spec: Tuple[str, ...] | List[str], track_exe: bool = False) -> str:
     ).hexdigest()
 
 
+# per-vivenv record read by `use()` to skip loading vivmeta.json
+ACTIVATION_RECORD = "vivrecord.json"
+# seconds before a warm `use()` refreshes the accessed time
+ACCESS_RESOLUTION = 60
+
+
 def _get_user() -> str:
     """good-faith attempt to ascertain user name for viv cache"""
     from getpass import getuser, GetPassWarning  # noqa
@@ -2472,6 +2690,11 @@ class Meta:
         exe: str,
         created: str = "",
         accessed: str = "",
+        python_version: str = "",
+        site_packages: str = "",
+        sys_path: List[str] | None = None,
+        size: Dict[str, int] | None = None,
+        installed: Dict[str, str] | None = None,
     ):
         self.name = name
         self.id = id
@@ -2480,23 +2703,39 @@ class Meta:
         self.exe = exe
         self.created = created
         self.accessed = accessed
+        # activation data recorded at build time
+        self.python_version = python_version
+        self.site_packages = site_packages
+        self.sys_path = sys_path if sys_path else []
+        # apparent/unique bytes and the site-packages mtime they were measured at
+        self.size = size if size else {}
+        # normalized name and version of each installed distribution
+        self.installed = installed if installed else {}
 
     @classmethod
-    def load(cls, name: str) -> "Meta":
-        if not (Cfg().cache_venv / name / "vivmeta.json").exists():
+    @span
+    def load(cls, name: str, path: Path | None = None) -> "Meta":
+        try:
+            meta = json.loads(
+                (
+                    (path if path else Cfg().cache_venv / name) / "vivmeta.json"
+                ).read_text()
+            )
+        except FileNotFoundError:
             log.warning(f"possibly corrupted vivenv: {name}")
             # add empty values for corrupted vivenvs so it will still load
             return cls(name=name, spec=[""], files=[""], exe="", id="")
-        else:
-            meta = json.loads((Cfg().cache_venv / name / "vivmeta.json").read_text())
 
         return cls(**meta)
 
+    @span
     def write(self, p: Path | None = None) -> None:
         if not p:
             p = (Cfg().cache_venv) / self.name / "vivmeta.json"
 
         p.write_text(json.dumps(self.__dict__))
+        if p.parent.parent.name == "venvs":
+            Index(p.parent.parent.parent).upsert(p.parent.name, self)
 
     def addfile(self, f: Path) -> None:
         log.debug(f"associating {f} with {self.name}")
@@ -2517,17 +2756,20 @@ class ViVenv:
         skip_validation: bool = False,
     ) -> None:
         self.loaded = False
+        self.templated = False
         if not skip_validation:
             spec = self._validate_spec(spec)
         id = id if id else get_hash(spec, track_exe)
+        # as requested, a loaded vivenv's metadata may differ until `ViVenv.ensure`
+        self.spec, self.id = spec, id
 
         self.name = name if name else id[:8]
         self.set_path(path)
 
         if not metadata:
-            if self.name in (d.name for d in Cfg().cache_venv.iterdir()):
+            if self.path.exists():
                 self.loaded = True
-                self.meta = Meta.load(self.name)
+                self.meta: Meta = Meta.load(self.name)
             else:
                 self.meta = Meta(
                     spec=spec,
@@ -2540,17 +2782,29 @@ class ViVenv:
             self.meta = metadata
 
     @classmethod
-    def load(cls, name: str) -> "ViVenv":
+    def load(
+        cls, name: str, path: Path | None = None, meta: Meta | None = None
+    ) -> "ViVenv":
         """generate a vivenv from a vivmeta.json
         Args:
             name: used as lookup in the vivenv cache
+            path: location of the vivenv, if already known
+            meta: metadata for the vivenv, if already loaded
         """
-        vivenv = cls(name=name, metadata=Meta.load(name))
+        meta = meta if meta else Meta.load(name, path)
+        vivenv = cls(
+            spec=meta.spec,
+            id=meta.id,
+            name=name,
+            path=path,
+            metadata=meta,
+            skip_validation=True,
+        )
 
         return vivenv
 
     def exists(self) -> None:
-        if self.name in (d.name for d in Cfg().cache_venv.iterdir()):
+        if self.path.exists():
             self.loaded = True
 
     def set_path(self, path: Path | None = None) -> None:
@@ -2587,186 +2841,1252 @@ class ViVenv:
             )
             err_quit(message)
 
+    @span
     def create(self, quiet: bool = False) -> None:
         log.info(f"new unique vivenv: {a.bold}{self.name}{a.end}")
         log.debug(f"creating new venv at {self.path}")
+        store = Store() if Store.enabled() else None
+        template = store.template(not Env().viv_no_setuptools) if store else None
         with Spinner("creating vivenv"):
-            venv.create(
-                self.path,
-                prompt=f"viv-{self.name}",
-                clear=True,
-                symlinks=not system.is_win,
-            )
+            if store and template:
+                store.clone(template, self)
+            else:
+                import venv  # noqa
+
+                venv.create(
+                    self.path,
+                    prompt=f"viv-{self.name}",
+                    clear=True,
+                    symlinks=not system.is_win,
+                )
+        self.templated = template is not None
 
         self.meta.created = str(datetime.today())
+        self.meta.python_version = ".".join(map(str, sys.version_info[:3]))
 
-    def install_pkgs(self) -> None:
-        cmd: List[str] = [
-            *self.pip,
-            "install",
-            "--force-reinstall",
-        ] + self.meta.spec
+    def _reqs(self) -> List[str]:
+        reqs = [*self.meta.spec]
+        # templates already include setuptools
+        if (
+            not Env().viv_no_setuptools
+            and "setuptools" not in self.meta.spec
+            and not self.templated
+        ):
+            reqs.append("setuptools")
+        return reqs
 
-        if not Env().viv_no_setuptools and "setuptools" not in self.meta.spec:
-            cmd.append("setuptools")
+    @span
+    def install_pkgs(self) -> None:
+        reqs = self._reqs()
+        if Store.enabled() and Store().install(self, reqs):
+            return
 
         subprocess_run(
-            cmd,
+            [*self.pip, "install", *reqs],
             spinmsg="installing packages in vivenv",
             clean_up_path=self.path,
             verbose=bool(Env().viv_verbose),
         )
 
+    def installed(self) -> Dict[str, str]:
+        """normalized name and version of each distribution in site-packages"""
+        return dict(
+            map(_dist_info, self.path.glob("lib/python*/site-packages/*.dist-info"))
+        )
+
+    def remove_stale(self, dists: List[Dist], unwanted: bool = True) -> Set[str]:
+        """uninstall the distributions whose version differs from dists
+
+        Args:
+            unwanted: also uninstall the distributions missing from dists
+
+        Returns:
+            names of the dists to install
+        """
+        installed = self.installed()
+        wanted = {name: version for name, version, _, _ in dists}
+        stale = sorted(
+            name
+            for name, version in installed.items()
+            if (name in wanted and not _same_version(version, wanted[name]))
+            or (unwanted and name not in wanted)
+        )
+        changed = {name for name in wanted if name not in installed or name in stale}
+        log.debug(
+            f"{self.name}: {len(changed)} to install, "
+            f"{len(stale)} to remove or upgrade"
+        )
+        if stale:
+            site_packages = next(self.path.glob("lib/python*/site-packages"))
+            subprocess_run(
+                [*self.pip, "uninstall", "--yes", *stale],
+                spinmsg="removing packages from vivenv",
+                verbose=bool(Env().viv_verbose),
+            )
+            # pip removes site-packages along with the last distribution in it
+            site_packages.mkdir(exist_ok=True)
+        return changed
+
+    @span
+    def update_pkgs(self) -> bool:
+        """install, upgrade or remove only the distributions that differ from the spec
+
+        Returns:
+            False if the spec couldn't be resolved and the vivenv must be rebuilt
+        """
+        if not next(self.path.glob("lib/python*/site-packages"), None):
+            return False
+        store = Store() if Store.enabled() else None
+        reqs = self._reqs()
+        if (dists := (store.resolve if store else _resolve)(self, reqs)) is None:
+            return False
+
+        changed = self.remove_stale(dists)
+        wanted = {name: version for name, version, _, _ in dists}
+        if store:
+            store.link(self, dists, only=changed)
+        elif changed:
+            subprocess_run(
+                [
+                    *self.pip,
+                    "install",
+                    "--no-deps",
+                    *(f"{name}=={wanted[name]}" for name in sorted(changed)),
+                ],
+                spinmsg="installing packages in vivenv",
+                verbose=bool(Env().viv_verbose),
+            )
+        return True
+
+    def built_here(self) -> bool:
+        """if this vivenv was built by the running interpreter and has site-packages"""
+        return (
+            self.meta.python_version == ".".join(map(str, sys.version_info[:3]))
+            and os.path.realpath(self.python) == os.path.realpath(sys.executable)
+            and next(self.path.glob("lib/python*/site-packages"), None) is not None
+        )
+
+    @span
+    def reuse(self) -> bool:
+        """become the smallest cached vivenv whose packages satisfy the spec
+
+        Returns:
+            False if there is no such vivenv
+        """
+        for vivenv in Cache().satisfying(self.spec, self.meta.exe):
+            if vivenv.built_here():
+                break
+        else:
+            return False
+
+        log.info(f"reusing vivenv {a.bold}{vivenv.name}{a.end} for {self.name}")
+        # lets the warm path of `use()` find the vivenv, see `_use_warm`
+        alias = _alias_path(vivenv.path.parent.parent, self.id)
+        alias.parent.mkdir(exist_ok=True)
+        alias.write_text(json.dumps(dict(name=vivenv.name, id=vivenv.meta.id)))
+        self.name, self.meta = vivenv.name, vivenv.meta
+        self.spec, self.id = vivenv.meta.spec, vivenv.meta.id
+        self.set_path(vivenv.path)
+        self.loaded = True
+        return True
+
+    @span
+    def derive(self) -> bool:
+        """create from the cached vivenv sharing the most requirements
+
+        Only vivenvs whose spec is a subset of this one, built by
+        this interpreter, are cloned so the missing packages can be added.
+
+        Returns:
+            False if there was no such vivenv or it couldn't be updated
+        """
+        if not Store.enabled():
+            return False
+        for base in Cache().subsets(self.spec, self.meta.exe):
+            # keep gc from evicting the base while it's cloned
+            _share_vivenv(base.path)
+            if base.built_here():
+                break
+        else:
+            return False
+
+        log.info(
+            f"new vivenv {a.bold}{self.name}{a.end} "
+            f"derived from {a.bold}{base.name}{a.end}"
+        )
+        try:
+            with Spinner("creating vivenv"):
+                Store().clone(base.path, self, base)
+        except OSError as e:
+            # i.e. the base was removed while cloning
+            log.debug(f"failed to derive from {base.name}: {e}")
+            updated = False
+        else:
+            self.meta.created = str(datetime.today())
+            self.meta.python_version = base.meta.python_version
+            updated = self.update_pkgs()
+        if not updated and self.path.exists():
+            _rmtree(self.path)
+        return updated
+
     def ensure(self) -> None:
         self.exists()
-        if not self.loaded or Env().viv_force:
+        force, update = Env().viv_force, Env().viv_update
+        # a named vivenv is used as is, even with a different spec
+        if self.loaded and not (force or update):
+            return
+
+        if self.loaded:
+            self.meta.spec, self.meta.id = self.spec, self.id
+        # VIV_FORCE always rebuilds from scratch, i.e. to repair a vivenv
+        if force:
+            updated = False
+        elif self.loaded:
+            log.info(f"updating vivenv: {a.bold}{self.name}{a.end}")
+            updated = self.update_pkgs()
+        else:
+            updated = self.derive()
+        if not updated:
             self.create()
             self.install_pkgs()
+        self.record_paths()
+        self.meta.installed = self.installed()
+        self.record_size()
+        _schedule_gc(self.path.parent.parent)
+
+    def touch(self) -> None:
+        self.meta.accessed = str(datetime.today())
+
+    def record_paths(self) -> None:
+        """record site-packages and the sys.path entries it provides"""
+        site_packages = str(*(self.path / "lib").glob("python*/site-packages"))
+        self.meta.site_packages = site_packages
+        self.meta.sys_path = _site_dir_paths(site_packages) if site_packages else []
+
+    def _check_paths(self) -> None:
+        # only rediscover if the vivenv has moved since paths were recorded
+        if not (
+            self.meta.sys_path
+            and self.meta.site_packages.startswith(str(self.path))
+            and os.path.isdir(self.meta.site_packages)
+        ):
+            log.debug(f"rediscovering site-packages for {self.name}")
+            self.record_paths()
+
+    @property
+    def site_packages(self) -> str:
+        self._check_paths()
+        return self.meta.site_packages
+
+    @property
+    def sys_path(self) -> List[str]:
+        self._check_paths()
+        return self.meta.sys_path
+
+    @span
+    def activate(self) -> None:
+        log.debug(f"activating {self.name}")
+        _activate_site_packages(self.site_packages, self.sys_path)
+
+    def write_record(self) -> None:
+        """write the activation record used by the warm path of `use()`"""
+        (self.path / ACTIVATION_RECORD).write_text(
+            json.dumps(
+                dict(
+                    id=self.meta.id,
+                    site_packages=self.site_packages,
+                    sys_path=self.sys_path,
+                    files=self.meta.files,
+                    accessed=time(),
+                )
+            )
+        )
+
+    def files_exist(self) -> bool:
+        return len([f for f in self.meta.files if Path(f).is_file()]) == 0
+
+    def remove(self) -> None:
+        """move the vivenv to the trash, see `_empty_trash`"""
+        _trash(self.path)
+        Index(self.path.parent.parent).remove(self.path.name)
+
+    def _site_packages_mtime(self) -> int:
+        try:
+            return os.stat(self.site_packages).st_mtime_ns
+        except OSError:
+            return 0
+
+    def size_stale(self) -> bool:
+        """if packages were added/removed since the size was recorded"""
+        return (
+            not self.meta.size or self.meta.size["mtime"] != self._site_packages_mtime()
+        )
+
+    def record_size(self, usage: Optional[DiskUsage] = None) -> None:
+        """record the apparent and unique bytes used by the vivenv
+
+        Args:
+            usage: existing scan which includes this vivenv
+        """
+        apparent, unique = (
+            usage if usage else DiskUsage([self.path]).scan(workers=1)
+        ).usage(self.path)
+        self.meta.size = dict(
+            apparent=apparent, unique=unique, mtime=self._site_packages_mtime()
+        )
+        if (self.path / "vivmeta.json").is_file():
+            self.meta.write(self.path / "vivmeta.json")
+
+    def get_size(self) -> None:
+        if self.size_stale():
+            self.record_size()
+
+        apparent, unique = self.meta.size["apparent"], self.meta.size["unique"]
+        self.size = _format_size(apparent) + (
+            f" ({_format_size(unique)} unique)" if unique != apparent else ""
+        )
+
+    @contextmanager
+    def use(self, keep: bool = True, tmpdir: str = "") -> Generator[None, None, None]:
+        run_mode = Env().viv_run_mode
+        _path = self.path
+        reused = False
+
+        if tmpdir and not keep:
+            _update_cache(run_mode=run_mode, tmpdir=tmpdir)
+
+        try:
+            self.set_path(Cfg().cache_venv / self.name)
+            # named vivenvs are never substituted
+            reused = (
+                Env().viv_reuse == "satisfying"
+                and self.name == self.id[:8]
+                and not self.path.exists()
+                and self.reuse()
+            )
+            _share_vivenv(self.path)
+            self.ensure()
+            self.touch()
+            yield
+
+        finally:
+            if not reused:
+                self.set_path(_path)
+
+    def show(self, size_pad: int) -> None:
+        _id = (
+            self.meta.id[:8]
+            if self.meta.id == self.name
+            else (self.name[:5] + "..." if len(self.name) > 8 else self.name)
+        )
+        size = getattr(self, "size", None)
+        line = []
+        if size:
+            line.append(f"""{a.yellow}{size:>{size_pad}}{a.end}""")
+
+        line.extend(
+            (
+                f"""{a.bold}{a.cyan}{_id}{a.end}""",
+                f"""{a.style(", ".join(self.meta.spec),'dim')}""",
+            )
+        )
+        sys.stdout.write(" ".join(line) + "\n")
+
+    def _tree_leaves(self, items: List[str], indent: str = "") -> str:
+        tree_chars = ["├"] * (len(items) - 1) + ["╰"]
+        return "\n".join(
+            (f"{indent}{a.yellow}{c}─{a.end} {i}" for c, i in zip(tree_chars, items))
+        )
+
+    def tree(self) -> None:
+        items = [
+            f"{a.magenta}{k}{a.end}: {v}"
+            for k, v in {
+                **{
+                    "id": self.meta.id,
+                    "spec": ", ".join(self.meta.spec),
+                    "created": self.meta.created,
+                    "accessed": self.meta.accessed,
+                },
+                **(
+                    {"size": getattr(self, "size", None)}
+                    if getattr(self, "size", None)
+                    else {}
+                ),
+                **({"exe": self.meta.exe} if self.meta.exe != "N/A" else {}),
+                **({"files": ""} if self.meta.files else {}),
+            }.items()
+        ]
+        rows = [f"\n{a.bold}{a.cyan}{self.name}{a.end}", self._tree_leaves(items)]
+        if self.meta.files:
+            rows += (self._tree_leaves(self.meta.files, indent="   "),)
+
+        sys.stdout.write("\n".join(rows) + "\n")
+
+
+def _format_size(size: float) -> str:
+    unit = ""
+    for unit in ("", "K", "M", "G", "T"):
+        if size < 1024:
+            break
+        size /= 1024
+
+    return f"{size:.1f}{unit}B"
+
+
+def _scan_dir(path: str) -> Tuple[List[Tuple[Any, int, int]], List[str]]:
+    """(inode, size, links) of the files in a directory and its subdirectories"""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    # DirEntry.stat doesn't provide inodes on windows
+                    key = (st.st_dev, st.st_ino) if st.st_ino else entry.path
+                    files.append((key, st.st_size, st.st_nlink))
+    except OSError:
+        pass
+    return files, dirs
+
+
+def _walk(root: str) -> List[Tuple[Any, int, int]]:
+    files, dirs = [], [root]
+    while dirs:
+        found, subdirs = _scan_dir(dirs.pop())
+        files.extend(found)
+        dirs.extend(subdirs)
+    return files
+
+
+class DiskUsage:
+    """apparent and unique bytes of the files under one or more roots
+
+    Unique bytes count each inode once and skip files which are also
+    hardlinked from outside of a root, i.e. the space freed by removing it.
+    Symlinks are not followed.
+    """
+
+    def __init__(self, roots: Sequence[Path]) -> None:
+        self.roots = [str(root) for root in roots]
+        self.apparent = dict.fromkeys(self.roots, 0)
+        # inode -> [size, links, links seen, root or None if seen in several]
+        self.inodes: Dict[Any, List[Any]] = {}
+
+    def _add(self, root: str, files: List[Tuple[Any, int, int]]) -> None:
+        for key, size, links in files:
+            self.apparent[root] += size
+            if (inode := self.inodes.get(key)) is None:
+                self.inodes[key] = [size, links, 1, root]
+            else:
+                inode[2] += 1
+                if inode[3] != root:
+                    inode[3] = None
+
+    def scan(self, workers: Optional[int] = None) -> "DiskUsage":
+        """walk the roots in parallel, with one work item per root
+
+        Args:
+            workers: number of threads, if 1 the walk is done serially
+        """
+        if workers == 1:
+            for root in self.roots:
+                self._add(root, _walk(root))
+            return self
+
+        from concurrent.futures import ThreadPoolExecutor  # noqa
+
+        with ThreadPoolExecutor(workers) as pool:
+            for root, files in zip(self.roots, pool.map(_walk, self.roots)):
+                self._add(root, files)
+        return self
+
+    def usage(self, root: Path) -> Tuple[int, int]:
+        """apparent and unique bytes under root"""
+        return self.apparent[str(root)], sum(
+            size
+            for size, links, seen, owner in self.inodes.values()
+            if owner == str(root) and seen >= links
+        )
+
+    def total(self) -> Tuple[int, int]:
+        """apparent and unique bytes under all roots"""
+        return sum(self.apparent.values()), sum(
+            size for size, links, seen, _ in self.inodes.values() if seen >= links
+        )
+
+
+def _site_dir_paths(site_packages: str) -> List[str]:
+    """sys.path entries provided by a site dir, see `site.addpackage`"""
+    paths = [site_packages]
+    for name in sorted(os.listdir(site_packages)):
+        if not name.endswith(".pth") or name.startswith("."):
+            continue
+        pth = Path(site_packages) / name
+        for line in pth.read_text(encoding="utf-8", errors="ignore").splitlines():
+            if not line.strip() or line.startswith(("#", "import ", "import\t")):
+                continue
+            path = os.path.abspath(os.path.join(site_packages, line.rstrip()))
+            if path not in paths and os.path.exists(path):
+                paths.append(path)
+    return paths
+
+
+def _activate_site_packages(site_packages: str, paths: List[str]) -> None:
+    # also add sys.path here so that it comes first
+    # approximate behavior of python -S
+    sys.path = [
+        *(paths if paths else [site_packages]),
+        *(p for p in sys.path if not p.endswith(("dist-packages", "site-packages"))),
+    ]
+    # entries are already known so this only runs .pth imports
+    site.addsitedir(site_packages)
+
+
+# placeholder for the vivenv's python in the shebang of stored scripts
+STORE_SHEBANG = b"#!viv-python\n"
+# prompt and record of the original location of vivenv templates, see `Store.clone`
+TEMPLATE_PROMPT = "viv-template"
+TEMPLATE_RECORD = "viv-template.json"
+# seconds a resolution is reused before new releases are looked for, see `Store.resolve`
+RESOLVED_TTL = 86400
+
+
+def _link_or_copy(src: str, dest: str) -> None:
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        os.unlink(dest)
+        os.link(src, dest)
+    except OSError:
+        # i.e. across filesystems
+        import shutil  # noqa
+
+        shutil.copy2(src, dest)
+
+
+def _resolve(vivenv: ViVenv, reqs: List[str]) -> Optional[List[Dist]]:
+    """name, version, store key and if it was requested for each distribution
+
+    Returns:
+        None if pip failed to resolve reqs or some are direct references
+    """
+    report = vivenv.path / "pip-report.json"
+    subprocess_run(
+        [
+            *vivenv.pip,
+            "install",
+            "--dry-run",
+            "--ignore-installed",
+            "--report",
+            str(report),
+            *reqs,
+        ],
+        spinmsg="resolving packages",
+        ignore_error=True,
+    )
+    try:
+        items = json.loads(report.read_text())["install"]
+    except (OSError, ValueError, KeyError):
+        log.debug("failed to resolve packages")
+        return None
+    finally:
+        if report.is_file():
+            report.unlink()
+
+    dists: List[Dist] = []
+    for item in items:
+        if (key := Store.key(item)) is None:
+            return None
+        dists.append(
+            (
+                _normalize_req(item["metadata"]["name"])[0],
+                item["metadata"]["version"],
+                key,
+                bool(item.get("requested")),
+            )
+        )
+    return dists
+
+
+class Store:
+    """installed distributions shared between vivenvs
+
+    Each distribution is kept once in `<store>/<name>-<version>-<tag>`,
+    with its files from site-packages under `site/` and the rest
+    (i.e. scripts) under `root/`. Vivenvs are populated by hardlinking
+    from the store, or copying across filesystems, and pip only installs
+    distributions which aren't stored yet.
+    """
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path if path else Cfg().store
+
+    @staticmethod
+    def enabled() -> bool:
+        return not system.is_win and not Env().viv_no_store
+
+    @staticmethod
+    def key(item: Dict[str, Any]) -> Optional[str]:
+        """key for an item of pip's installation report, None if it can't be stored"""
+        info = item.get("download_info", {})
+        if item.get("is_direct") or "archive_info" not in info:
+            return None
+        name = _normalize_req(item["metadata"]["name"])[0]
+        filename = info["url"].rsplit("/", 1)[-1]
+        if filename.endswith(".whl"):
+            tag = "-".join(filename[:-4].split("-")[-3:])
+        else:
+            import platform  # noqa
+
+            # built from source for this interpreter
+            tag = "-".join(
+                ("src", sys.implementation.cache_tag, sys.platform, platform.machine())
+            )
+        return f"{name}-{item['metadata']['version']}-{tag}"
+
+    def resolve(self, vivenv: ViVenv, reqs: List[str]) -> Optional[List[Dist]]:
+        """like `_resolve`, but reused for RESOLVED_TTL seconds
+        or until `VIV_FORCE` or `VIV_UPDATE` is set
+
+        A vivenv made only of stored distributions is then built without running pip.
+        """
+        import sysconfig  # noqa
+
+        # the store may be shared by hosts with different platforms
+        platform = re.sub(r"[^\w.]", "_", sysconfig.get_platform())
+        resolved = (
+            self.path
+            / ".resolved"
+            / f"{get_hash(reqs)}-{sys.implementation.cache_tag}-{platform}"
+        )
+        if not (Env().viv_force or Env().viv_update):
+            try:
+                if time() - resolved.stat().st_mtime < RESOLVED_TTL:
+                    return [tuple(dist) for dist in json.loads(resolved.read_text())]
+            except (OSError, ValueError):
+                pass
+
+        if (dists := _resolve(vivenv, reqs)) is None:
+            return None
+        resolved.parent.mkdir(parents=True, exist_ok=True)
+        resolved.write_text(json.dumps(dists))
+        return dists
+
+    @span
+    def install(self, vivenv: ViVenv, reqs: List[str]) -> bool:
+        """install reqs into vivenv, linking stored distributions
+
+        Returns:
+            False if nothing was installed, see `_resolve`
+        """
+        if (dists := self.resolve(vivenv, reqs)) is None:
+            return False
+        # i.e. the template's setuptools when the spec pins another version
+        vivenv.remove_stale(dists, unwanted=False)
+        self.link(vivenv, dists)
+        return True
+
+    def link(
+        self, vivenv: ViVenv, dists: List[Dist], only: Optional[Set[str]] = None
+    ) -> None:
+        """link dists into vivenv, installing and storing any not yet stored
+
+        Args:
+            only: names of the dists to link, the rest are already installed
+        """
+        site_packages = next((vivenv.path / "lib").glob("python*/site-packages"))
+        missing: Dict[str, Tuple[str, str]] = {}
+        interrupted = False
+        for name, version, key, _ in dists:
+            if only is not None and name not in only:
+                continue
+            if not (entry := self.path / key).is_dir():
+                missing[name] = (version, key)
+            elif not self._link(entry, vivenv, site_packages):
+                missing[name] = (version, key)
+                interrupted = True
+        log.debug(f"linked {len(dists) - len(missing)} distributions from the store")
+
+        if missing:
+            subprocess_run(
+                [
+                    *vivenv.pip,
+                    "install",
+                    "--no-deps",
+                    # overwrite what was partially linked
+                    *(["--force-reinstall"] if interrupted else []),
+                    *(f"{name}=={version}" for name, (version, _) in missing.items()),
+                ],
+                spinmsg="installing packages in vivenv",
+                clean_up_path=vivenv.path,
+                verbose=bool(Env().viv_verbose),
+            )
+            for dist_info in site_packages.glob("*.dist-info"):
+                if (found := missing.get(_dist_info(dist_info)[0])) is not None:
+                    self._add(found[1], dist_info, vivenv, site_packages)
+
+        # only distributions named in the spec are marked as requested
+        requested = {name for name, _, _, requested in dists if requested}
+        for dist_info in site_packages.glob("*.dist-info"):
+            marker = dist_info / "REQUESTED"
+            if _dist_info(dist_info)[0] in requested:
+                marker.touch()
+            elif marker.is_file():
+                marker.unlink()
+
+    def _link(self, entry: Path, vivenv: ViVenv, site_packages: Path) -> bool:
+        """populate vivenv from a store entry, False if it was pruned while linking"""
+        try:
+            for part, dest_root in (("site", site_packages), ("root", vivenv.path)):
+                src_root = str(entry / part)
+                for dirpath, _, filenames in os.walk(src_root):
+                    dest_dir = os.path.join(
+                        dest_root, os.path.relpath(dirpath, src_root)
+                    )
+                    os.makedirs(dest_dir, exist_ok=True)
+                    for f in filenames:
+                        src, dest = os.path.join(dirpath, f), os.path.join(dest_dir, f)
+                        if part == "root" and self._write_script(src, dest, vivenv):
+                            continue
+                        _link_or_copy(src, dest)
+        except FileNotFoundError:
+            # removed by `Store.prune` while linking
+            return False
+        return True
+
+    @staticmethod
+    def _write_script(src: str, dest: str, vivenv: ViVenv) -> bool:
+        """write a script with its shebang pointed at the vivenv's python"""
+        with open(src, "rb") as f:
+            if f.read(len(STORE_SHEBANG)) != STORE_SHEBANG:
+                return False
+            content = f.read()
+        if os.path.lexists(dest):
+            os.unlink(dest)
+        with open(dest, "wb") as f:
+            f.write(f"#!{vivenv.python}\n".encode() + content)
+        os.chmod(dest, 0o755)
+        return True
+
+    def _add(
+        self, key: str, dist_info: Path, vivenv: ViVenv, site_packages: Path
+    ) -> None:
+        """store a distribution just installed by pip, linking the vivenv's files"""
+        import csv  # noqa
+
+        tmp = self.path / f".{key}-{os.getpid()}"
+        parts = (("site", str(site_packages)), ("root", str(vivenv.path)))
+        try:
+            with (dist_info / "RECORD").open(newline="") as f:
+                rows = list(csv.reader(f))
+            for row in rows:
+                src = os.path.normpath(os.path.join(site_packages, row[0]))
+                part, base = next(
+                    (
+                        (part, base)
+                        for part, base in parts
+                        if src.startswith(base + os.sep)
+                    ),
+                    ("", ""),
+                )
+                if not part or not os.path.isfile(src) or src.endswith("REQUESTED"):
+                    continue
+                dest = tmp / part / os.path.relpath(src, base)
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                if (
+                    part == "root"
+                    and (body := self._read_script(src, vivenv)) is not None
+                ):
+                    dest.write_bytes(STORE_SHEBANG + body)
+                else:
+                    _link_or_copy(src, str(dest))
+            tmp.rename(self.path / key)
+        except OSError as e:
+            # i.e. stored concurrently by another build
+            log.debug(f"failed to store {key}: {e}")
+            _rmtree(tmp)
+
+    @staticmethod
+    def _read_script(src: str, vivenv: ViVenv) -> Optional[bytes]:
+        """body of a script whose shebang is the vivenv's python"""
+        with open(src, "rb") as f:
+            shebang = f.readline()
+            if shebang.startswith(b"#!") and str(vivenv.path).encode() in shebang:
+                return f.read()
+        return None
+
+    def template(self, setuptools: bool) -> Path:
+        """base venv for this interpreter, created on first use
+
+        Args:
+            setuptools: include setuptools in the template
+        """
+        key = hashlib.sha256(f"{sys.executable}{sys.version}".encode()).hexdigest()
+        template = (
+            self.path
+            / ".templates"
+            / "-".join(
+                (sys.implementation.cache_tag, key[:8], *(("setuptools",) * setuptools))
+            )
+        )
+        if template.is_dir():
+            return template
+
+        import venv  # noqa
+
+        log.debug(f"creating vivenv template at {template}")
+        tmp = template.parent / f".{template.name}-{os.getpid()}"
+        venv.create(tmp, prompt=TEMPLATE_PROMPT, clear=True, symlinks=True)
+        (tmp / TEMPLATE_RECORD).write_text(json.dumps(dict(path=str(tmp))))
+        if setuptools:
+            base = ViVenv(
+                ["setuptools"],
+                name=template.name,
+                path=tmp,
+                metadata=Meta(
+                    name=template.name, id="", spec=["setuptools"], files=[], exe=""
+                ),
+            )
+            if not self.install(base, base.meta.spec):
+                subprocess_run(
+                    [*base.pip, "install", "setuptools"],
+                    spinmsg="installing setuptools",
+                    clean_up_path=tmp,
+                )
+        try:
+            tmp.rename(template)
+        except OSError:
+            # i.e. created concurrently by another build
+            _rmtree(tmp)
+        return template
+
+    @span
+    def clone(
+        self, template: Path, vivenv: ViVenv, base: Optional[ViVenv] = None
+    ) -> None:
+        """materialize vivenv from a template or an existing vivenv
+
+        Symlinks (i.e. the interpreter) are recreated, activation scripts
+        and `pyvenv.cfg` are rewritten for the new location and prompt
+        and everything else is hardlinked or copied.
+
+        Args:
+            template: path to the template, or to base
+            base: vivenv to clone, without its metadata
+        """
+        if base:
+            old, prompt = str(base.path), f"viv-{base.name}"
+        else:
+            old = json.loads((template / TEMPLATE_RECORD).read_text())["path"]
+            prompt = TEMPLATE_PROMPT
+        replacements = (
+            (old.encode(), str(vivenv.path).encode()),
+            (prompt.encode(), f"viv-{vivenv.name}".encode()),
+        )
+        skip = (
+            {
+                os.path.join(template, meta)
+                for meta in ("vivmeta.json", ACTIVATION_RECORD)
+            }
+            if base
+            else {os.path.join(template, TEMPLATE_RECORD)}
+        )
+        if vivenv.path.exists():
+            _rmtree(vivenv.path)
+
+        root = str(template)
+        for dirpath, dirnames, filenames in os.walk(root):
+            dest_dir = os.path.join(vivenv.path, os.path.relpath(dirpath, root))
+            os.makedirs(dest_dir, exist_ok=True)
+            for name in (*dirnames, *filenames):
+                src, dest = os.path.join(dirpath, name), os.path.join(dest_dir, name)
+                if os.path.islink(src):
+                    target = os.readlink(src)
+                    os.symlink(target.replace(old, str(vivenv.path), 1), dest)
+                elif name in dirnames or src in skip:
+                    continue
+                elif name == "pyvenv.cfg" or os.path.basename(dirpath) == "bin":
+                    with open(src, "rb") as f:
+                        content = f.read()
+                    for before, after in replacements:
+                        content = content.replace(before, after)
+                    with open(dest, "wb") as f:
+                        f.write(content)
+                    os.chmod(dest, os.stat(src).st_mode)
+                else:
+                    _link_or_copy(src, dest)
+
+    def prune(self) -> int:
+        """remove stored distributions no vivenv links to and expired resolutions
+
+        Returns:
+            number of distributions removed
+        """
+        if not self.path.is_dir():
+            return 0
+        if (self.path / ".resolved").is_dir():
+            with os.scandir(self.path / ".resolved") as entries:
+                for entry in entries:
+                    try:
+                        if time() - entry.stat().st_mtime >= RESOLVED_TTL:
+                            os.unlink(entry.path)
+                    except FileNotFoundError:
+                        pass
+        removed = 0
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if entry.name.startswith("."):
+                    continue
+                metadata = next(
+                    Path(entry.path).glob("site/*.dist-info/METADATA"), None
+                )
+                # move out of the way first so a concurrent build never
+                # links from a partially removed distribution
+                pruned = self.path / f".pruned-{entry.name}-{time_ns()}"
+                try:
+                    if metadata and metadata.stat().st_nlink > 1:
+                        continue
+                    os.rename(entry.path, pruned)
+                except FileNotFoundError:
+                    # removed by a concurrent prune
+                    continue
+                _rmtree(pruned)
+                removed += 1
+        return removed
+
+
+# seconds between background eviction passes, see `_schedule_gc`
+GC_INTERVAL = 3600
+
+
+def _flock(lock: Path, flags: int) -> Optional[int]:
+    """open and flock a lock file, retrying if it's removed while waiting
+
+    Returns:
+        file descriptor or None if flags include LOCK_NB and it's held elsewhere
+    """
+    import fcntl  # noqa
+
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    while True:
+        fd = os.open(lock, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, flags)
+        except BlockingIOError:
+            os.close(fd)
+            return None
+        try:
+            if os.fstat(fd).st_ino == os.stat(lock).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+def _vivenv_lock(path: Path) -> Path:
+    return path.parent.parent / "locks" / f"{path.name}.lock"
+
+
+_held_locks: Dict[Path, int] = {}
+
+
+def _share_vivenv(path: Path) -> None:
+    """mark a vivenv as in use for the life of this process (posix only)"""
+    if system.is_win or path in _held_locks:
+        return
+    import fcntl  # noqa
+
+    try:
+        if (fd := _flock(_vivenv_lock(path), fcntl.LOCK_SH)) is not None:
+            _held_locks[path] = fd
+    except OSError as e:
+        log.debug(f"failed to lock vivenv {path.name}: {e}")
+
+
+@contextmanager
+def _exclusive(lock: Path) -> Generator[bool, None, None]:
+    """try to take an exclusive lock (posix only)
+
+    Yields:
+        False if the lock is held by another process
+    """
+    if system.is_win:
+        yield True
+        return
+    import fcntl  # noqa
+
+    if (fd := _flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)) is None:
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _claim_vivenv(path: Path) -> Generator[bool, None, None]:
+    """exclusively lock a vivenv for removal
+
+    Yields:
+        False if another process is using the vivenv
+    """
+    lock = _vivenv_lock(path)
+    with _exclusive(lock) as claimed:
+        yield claimed
+        if claimed and not path.exists():
+            lock.unlink(missing_ok=True)
+
+
+def _spawn_gc(cache_base: Path, *args: str) -> bool:
+    """start `viv env gc` for cache_base in a detached process
+
+    Returns:
+        False if the running copy of viv can't be re-executed,
+        i.e. it was piped to python
+    """
+    if not Path(__file__).is_file():
+        return False
+
+    import subprocess  # noqa
+
+    try:
+        subprocess.Popen(
+            [sys.executable, __file__, "env", "gc", *args],
+            env=dict(os.environ, VIV_CACHE=str(cache_base)),
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            **(
+                dict(creationflags=0x00000008)  # DETACHED_PROCESS
+                if system.is_win
+                else dict(start_new_session=True)
+            ),
+        )
+    except OSError as e:
+        log.debug(f"failed to start background gc: {e}")
+        return False
+    return True
+
+
+def _schedule_gc(cache_base: Path) -> None:
+    """start `viv env gc` in the background if a cache budget is set
+
+    Runs at most once every GC_INTERVAL seconds per cache
+    and never for the temporary cache of `viv run`.
+    """
+    max_size, max_age = Env().viv_cache_max_size, Env().viv_cache_max_age
+    if not (max_size or max_age) or str(cache_base) == Env().viv_ephemeral_cache:
+        return
+
+    stamp = cache_base / "gc.stamp"
+    try:
+        if time() - stamp.stat().st_mtime < GC_INTERVAL:
+            return
+    except FileNotFoundError:
+        pass
+
+    try:
+        stamp.touch()
+    except OSError:
+        return
+    _spawn_gc(
+        cache_base,
+        *(("--max-size", max_size) if max_size else ()),
+        *(("--max-age", max_age) if max_age else ()),
+    )
+
+
+def _rmtree(path: Path) -> None:
+    """remove a directory tree, unlinking files from a thread pool"""
+    from concurrent.futures import ThreadPoolExecutor  # noqa
+
+    dirs: List[str] = [str(path)]
+    files: List[str] = []
+    for d in dirs:  # dirs grows while walking, parents come before children
+        try:
+            with os.scandir(d) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    else:
+                        files.append(entry.path)
+        except OSError:
+            pass
+
+    def unlink(batch: List[str]) -> None:
+        for f in batch:
+            try:
+                os.unlink(f)
+            except OSError:
+                pass
+
+    with ThreadPoolExecutor() as pool:
+        list(pool.map(unlink, (files[i : i + 256] for i in range(0, len(files), 256))))
+
+    for d in reversed(dirs):
+        try:
+            os.rmdir(d)
+        except OSError:
+            pass
 
-    def touch(self) -> None:
-        self.meta.accessed = str(datetime.today())
 
-    @property
-    def site_packages(self) -> str:
-        return str(*(self.path / "lib").glob("python*/site-packages"))
+def _trash(path: Path) -> None:
+    """atomically move a vivenv into the cache's trash to be deleted later"""
+    trash = path.parent.parent / "trash"
+    try:
+        trash.mkdir(exist_ok=True)
+        path.rename(trash / f"{path.name}-{time_ns()}")
+    except OSError as e:
+        log.debug(f"failed to move {path} to trash: {e}")
+        _rmtree(path)
+
+
+def _empty_trash(cache_base: Path) -> None:
+    trash = cache_base / "trash"
+    if not trash.is_dir():
+        return
+    with os.scandir(trash) as entries:
+        for entry in entries:
+            _rmtree(Path(entry.path))
+
+
+def _empty_trash_later(cache_base: Path) -> None:
+    """delete trashed vivenvs in the background, if not already in progress"""
+    trash = cache_base / "trash"
+    if not trash.is_dir() or not any(trash.iterdir()):
+        return
+    # a running gc will empty the trash itself
+    with _exclusive(cache_base / "gc.lock") as idle:
+        pass
+    if idle and not _spawn_gc(cache_base):
+        _empty_trash(cache_base)
 
-    def activate(self) -> None:
-        # also add sys.path here so that it comes first
-        log.debug(f"activating {self.name}")
-        path_to_add = self.site_packages
-
-        # approximate behavior of python -S
-        sys.path = [
-            path_to_add,
-            *(
-                p
-                for p in sys.path
-                if not p.endswith(("dist-packages", "site-packages"))
-            ),
-        ]
-        site.addsitedir(path_to_add)
 
-    def files_exist(self) -> bool:
-        return len([f for f in self.meta.files if Path(f).is_file()]) == 0
+_pending_access: Set[Tuple[Path, Path]] = set()
 
-    def get_size(self) -> None:
-        size = float(
-            sum(p.stat().st_size for p in Path(self.path).rglob("*") if p.is_file())
-        )
 
-        unit = ""
-        for unit in ("", "K", "M", "G", "T"):
-            if size < 1024:
-                break
-            size /= 1024
+def _record_access() -> None:
+    """deferred metadata bookkeeping for vivenvs activated by the warm path"""
+    for path, caller in sorted(_pending_access):
+        if not (path / "vivmeta.json").is_file():
+            continue
+        try:
+            vivenv = ViVenv.load(path.name)
+            vivenv.meta.addfile(caller)
+            vivenv.meta.write(path / "vivmeta.json")
+            vivenv.write_record()
+        except OSError as e:
+            log.debug(f"failed to update metadata for {path.name}: {e}")
+    _pending_access.clear()
 
-        self.size = f"{size:.1f}{unit}B"
 
-    @contextmanager
-    def use(self, keep: bool = True, tmpdir: str = "") -> Generator[None, None, None]:
-        run_mode = Env().viv_run_mode
-        _path = self.path
+def _alias_path(cache_base: Path, id: str) -> Path:
+    """name and id of the vivenv reused for a spec, see `ViVenv.reuse`"""
+    return cache_base / "aliases" / f"{id[:8]}.json"
 
-        if tmpdir and not keep:
-            _update_cache(run_mode=run_mode, tmpdir=tmpdir)
 
-        try:
-            self.set_path(Cfg().cache_venv / self.name)
-            self.ensure()
-            self.touch()
-            yield
+@span
+def _use_warm(
+    spec: List[str], track_exe: bool, name: str, caller: Path
+) -> Optional[Path]:
+    """activate an existing vivenv using only its activation record
 
-        finally:
-            self.set_path(_path)
+    Returns:
+        path to the vivenv or None if the full `ViVenv` path is required
+    """
+    if Env().viv_force or Env().viv_update or set(map(type, spec)) - {str}:
+        return None
 
-    def show(self, size_pad: int) -> None:
-        _id = (
-            self.meta.id[:8]
-            if self.meta.id == self.name
-            else (self.name[:5] + "..." if len(self.name) > 8 else self.name)
-        )
-        size = getattr(self, "size", None)
-        line = []
-        if size:
-            line.append(f"""{a.yellow}{size:>{size_pad}}{a.end}""")
+    id = get_hash(sorted(spec), track_exe)
+    # avoid Cfg().cache_venv which would create the directory
+    path = Env().viv_cache / "venvs" / (name if name else id[:8])
+    if not name and Env().viv_reuse == "satisfying" and not path.is_dir():
+        try:
+            alias = json.loads(_alias_path(Env().viv_cache, id).read_text())
+        except (OSError, ValueError):
+            return None
+        path, id = path.parent / alias["name"], alias["id"]
+    _share_vivenv(path)
+    try:
+        record = json.loads((path / ACTIVATION_RECORD).read_text())
+    except (OSError, ValueError):
+        return None
 
-        line.extend(
-            (
-                f"""{a.bold}{a.cyan}{_id}{a.end}""",
-                f"""{a.style(", ".join(self.meta.spec),'dim')}""",
-            )
-        )
-        sys.stdout.write(" ".join(line) + "\n")
+    site_packages = record.get("site_packages", "")
+    # like `ViVenv.ensure`, a named vivenv is used whatever its spec
+    if (not name and record.get("id") != id) or not site_packages.startswith(str(path)):
+        return None
 
-    def _tree_leaves(self, items: List[str], indent: str = "") -> str:
-        tree_chars = ["├"] * (len(items) - 1) + ["╰"]
-        return "\n".join(
-            (f"{indent}{a.yellow}{c}─{a.end} {i}" for c, i in zip(tree_chars, items))
-        )
+    _activate_site_packages(site_packages, record.get("sys_path", []))
 
-    def tree(self) -> None:
-        items = [
-            f"{a.magenta}{k}{a.end}: {v}"
-            for k, v in {
-                **{
-                    "id": self.meta.id,
-                    "spec": ", ".join(self.meta.spec),
-                    "created": self.meta.created,
-                    "accessed": self.meta.accessed,
-                },
-                **(
-                    {"size": getattr(self, "size", None)}
-                    if getattr(self, "size", None)
-                    else {}
-                ),
-                **({"exe": self.meta.exe} if self.meta.exe != "N/A" else {}),
-                **({"files": ""} if self.meta.files else {}),
-            }.items()
-        ]
-        rows = [f"\n{a.bold}{a.cyan}{self.name}{a.end}", self._tree_leaves(items)]
-        if self.meta.files:
-            rows += (self._tree_leaves(self.meta.files, indent="   "),)
+    if (
+        str(caller.resolve()) not in record.get("files", [])
+        or time() - record.get("accessed", 0) > ACCESS_RESOLUTION
+    ):
+        if not _pending_access:
+            atexit.register(_record_access)
+        _pending_access.add((path, caller))
 
-        sys.stdout.write("\n".join(rows) + "\n")
+    return path
 
 
 def get_caller_path() -> Path:
     """get callers callers file path"""
     # viv.py is fist in stack since function is used in `viv.use()`
-    import inspect  # noqa
-
-    frame_info = inspect.stack()[2]
-    filepath = frame_info.filename  # in python 3.5+, you can use frame_info.filename
-    del frame_info  # drop the reference to the stack frame to avoid reference cycles
+    # only the code object of that frame is inspected, never the source
+    frame = sys._getframe(2)
+    filepath = frame.f_code.co_filename
+    del frame  # drop the reference to the stack frame to avoid reference cycles
 
     return Path(filepath).absolute()
 
 
-def use(*packages: str, track_exe: bool = False, name: str = "") -> Path:
+def use(
+    *packages: str,
+    track_exe: bool = False,
+    name: str = "",
+    caller: str | Path | None = None,
+) -> Path:
     """create a vivenv and append to sys.path
 
     Args:
         packages: package specifications with optional version specifiers
         track_exe: if true make env python exe specific
         name: use as vivenv name, if not provided id is used
+        caller: file to associate with vivenv, if not provided the calling file is used
     """
 
-    vivenv = ViVenv([*list(packages), *Env().viv_spec], track_exe=track_exe, name=name)
+    spec = [*list(packages), *Env().viv_spec]
+    caller = Path(caller).absolute() if caller else get_caller_path()
+
+    if path := _use_warm(spec, track_exe, name, caller):
+        return path
+
+    vivenv = ViVenv(spec, track_exe=track_exe, name=name)
     with vivenv.use():
-        vivenv.meta.addfile(get_caller_path())
+        vivenv.meta.addfile(caller)
         vivenv.meta.write()
+        vivenv.write_record()
         vivenv.activate()
     return vivenv.path
 
 
-def run() -> Path:
-    """create a vivenv and append to sys.path using embedded metadata"""
-    source = get_caller_path().read_text()
-    metadata = _read_metadata_block(source)
+def run(caller: str | Path | None = None) -> Path:
+    """create a vivenv and append to sys.path using embedded metadata
+
+    Args:
+        caller: file with the metadata block, if not provided the calling file is used
+    """
+    caller = Path(caller).absolute() if caller else get_caller_path()
+    metadata = _read_metadata_block(caller.read_text())
     deps = metadata.get("dependencies", [])
     if requires := metadata.get("requires-python", ""):
         _check_python(requires)
-    return use(*deps)
+    return use(*deps, caller=caller)
 
 
 def combined_spec(reqs: List[str], requirements: Path) -> List[str]:
@@ -2776,6 +4096,7 @@ def combined_spec(reqs: List[str], requirements: Path) -> List[str]:
     return reqs
 
 
+@span
 def resolve_deps(reqs: List[str], requirements: Path) -> List[str]:
     spec = combined_spec(reqs, requirements)
 
@@ -2806,6 +4127,7 @@ def resolve_deps(reqs: List[str], requirements: Path) -> List[str]:
     return resolved_spec
 
 
+@span
 def fetch_script(url: str) -> str:
     from urllib.error import HTTPError  # noqa
     from urllib.request import urlopen  # noqa
@@ -2887,136 +4209,929 @@ def _uses_viv(txt: str) -> _Viv_Mode:
         err_quit(f"Unknown function {a.bold}{matches[0]}{a.end} associated with viv.")
 
 
-METADATA_BLOCK = (
-    r"(?m)^# /// (?P<type>[a-zA-Z0-9-]+)$\s(?P<content>(^#(| .*)$\s)+)^# ///$"
-)
+METADATA_BLOCK = (
+    r"(?m)^# /// (?P<type>[a-zA-Z0-9-]+)$\s(?P<content>(^#(| .*)$\s)+)^# ///$"
+)
+
+
+def _read_metadata_block(script: str) -> dict:
+    name = "script"
+    matches = list(
+        filter(lambda m: m.group("type") == name, re.finditer(METADATA_BLOCK, script))
+    )
+    if len(matches) > 1:
+        raise ValueError(f"Multiple {name} blocks found")
+    elif len(matches) == 1:
+        return toml_loads(
+            "\n".join((line[2:] for line in matches[0].group(0).splitlines()[1:-1]))
+        )
+    else:
+        return {}
+
+
+def _check_python(requires: str) -> None:
+    import platform  # noqa
+
+    Version, SpecifierSet = _vendored_packaging()
+    version = Version(platform.python_version())
+    if version not in SpecifierSet(requires):
+        err_quit(
+            f"Running python {a.yellow}{version}{a.end} does "
+            f"not satisfy 'requires-python: {requires}'"
+        )
+
+
+def _parse_date(txt: str) -> datetime:
+    """attempt to parse datetime string
+
+    acceptable formats `%Y-%m-%d` & `%Y-%m-%dT%H:%M`
+    """
+
+    try:
+        date = datetime.strptime(
+            txt,
+            "%Y-%m-%d",
+        )
+        return date
+    except ValueError:
+        pass
+
+    try:
+        date = datetime.strptime(txt, "%Y-%m-%dT%H:%M")
+        return date
+    except ValueError:
+        pass
+
+    err_quit(
+        f"failed to parse {a.yellow}{txt}{a.end} as datetime\n"
+        "acceptable formats `%Y-%m-%d` & `%Y-%m-%dT%H:%M`"
+    )
+
+
+def _parse_size(txt: str) -> int:
+    """parse a size in bytes with an optional unit, i.e. `500M` or `10G`"""
+    units = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3, "T": 1024**4}
+    if m := re.fullmatch(r"(\d+(?:\.\d+)?)\s*([KMGT]?)I?B?", txt.strip().upper()):
+        return int(float(m.group(1)) * units[m.group(2)])
+
+    err_quit(
+        f"failed to parse {a.yellow}{txt}{a.end} as a size\n"
+        "acceptable formats: bytes or a number with a unit (K/M/G/T), i.e. `10G`"
+    )
+
+
+def _parse_age(txt: str) -> timedelta:
+    """parse a duration with a unit, i.e. `12h`, `30d` or `2w`"""
+    units = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+    if m := re.fullmatch(r"(\d+(?:\.\d+)?)\s*([mhdw])", txt.strip().lower()):
+        return timedelta(**{units[m.group(2)]: float(m.group(1))})
+
+    err_quit(
+        f"failed to parse {a.yellow}{txt}{a.end} as a duration\n"
+        "acceptable formats: a number with a unit (m/h/d/w), i.e. `30d`"
+    )
+
+
+@lru_cache(maxsize=None)
+def _timestamp(txt: str) -> float:
+    """epoch seconds of a vivmeta timestamp, 0 if it's missing"""
+    try:
+        return datetime.fromisoformat(txt).timestamp()
+    except ValueError:
+        return 0
+
+
+@lru_cache(maxsize=None)
+def _normalize_req(req: str) -> Tuple[str, str]:
+    """normalized project name and requirement, i.e. `Rich >= 13` -> rich, rich>=13"""
+    req = "".join(req.split())
+    if not (m := re.match(r"[A-Za-z0-9][A-Za-z0-9._-]*", req)):
+        return req, req
+    name = re.sub(r"[-_.]+", "-", m.group(0)).lower()
+    return name, name + req[m.end() :]
+
+
+# a single PEP 440 version specifier, i.e. `>=1.0`
+SPECIFIER = r"(~=|===|==|!=|<=|>=|<|>)[A-Za-z0-9.*+!_-]+"
+
+
+def _dist_info(path: Path) -> Tuple[str, str]:
+    """normalized name and version of an installed distribution
+
+    i.e. `Foo_Bar-1.0.dist-info` -> foo-bar, 1.0
+    """
+    name, _, version = path.name[: -len(".dist-info")].rpartition("-")
+    return _normalize_req(name)[0], version
+
+
+def _same_version(left: str, right: str) -> bool:
+    if left == right:
+        return True
+    Version, _ = _vendored_packaging()
+    try:
+        return Version(left) == Version(right)
+    except ValueError:
+        return False
+
+
+def _update_cache(run_mode: str, tmpdir: str) -> None:
+    import tempfile  # noqa
+
+    new_cache = tmpdir
+
+    if run_mode == "semi-ephemeral":
+        new_cache = str(
+            Path(tempfile.gettempdir()) / ("viv-ephemeral-cache-" + _get_user())
+        )
+
+    # temporary vivenvs still share the persistent store
+    os.environ.setdefault("VIV_STORE", str(Cfg().store))
+    # by default ephemeral
+    os.environ["VIV_CACHE"] = new_cache
+    # removed after the run, so there is nothing to gc, see `_schedule_gc`
+    if new_cache == tmpdir:
+        os.environ["VIV_EPHEMERAL_CACHE"] = new_cache
+    else:
+        os.environ.pop("VIV_EPHEMERAL_CACHE", None)
+
+
+# sqlite3 index of vivenv metadata, stored in the cache base
+CACHE_INDEX = "index.db"
+
+
+class Index:
+    """sqlite3 index of the vivenv cache
+
+    Each vivmeta.json remains the source of truth. The index is updated
+    by `Meta.write` and `viv env remove`, reconciled with the listing of
+    the cache and each vivmeta.json's mtime on first use if the venvs
+    directory changed since the last time, and rebuilt with `viv env reindex`.
+    Every method returns None if the index is unavailable
+    (i.e. no sqlite3), in which case callers should scan the cache.
+    """
+
+    version = 7
+    tables = ("vivenvs", "files", "pkgs", "installed")
+    # timestamps are epoch seconds and packages are normalized requirements
+    schema = """
+        CREATE TABLE vivenvs (
+            name TEXT PRIMARY KEY,
+            id TEXT NOT NULL,
+            spec TEXT NOT NULL,
+            exe TEXT NOT NULL,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL,
+            size INTEGER,
+            unique_size INTEGER,
+            meta TEXT NOT NULL,
+            mtime REAL NOT NULL
+        );
+        CREATE INDEX vivenvs_id ON vivenvs (id);
+        CREATE INDEX vivenvs_accessed ON vivenvs (accessed);
+        CREATE TABLE files (
+            name TEXT NOT NULL,
+            file TEXT NOT NULL,
+            PRIMARY KEY (name, file)
+        );
+        CREATE INDEX files_file ON files (file);
+        CREATE TABLE pkgs (
+            name TEXT NOT NULL,
+            pkg TEXT NOT NULL,
+            req TEXT NOT NULL,
+            PRIMARY KEY (name, req)
+        );
+        CREATE INDEX pkgs_pkg ON pkgs (pkg);
+        CREATE TABLE installed (
+            name TEXT NOT NULL,
+            pkg TEXT NOT NULL,
+            version TEXT NOT NULL,
+            PRIMARY KEY (name, pkg)
+        );
+        CREATE INDEX installed_pkg ON installed (pkg);
+        CREATE TABLE state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, cache_base: Optional[Path] = None) -> None:
+        self.path = (cache_base if cache_base else Cfg().cache_base) / CACHE_INDEX
+        self.venvs = self.path.parent / "venvs"
+
+    def _create(self, con: Connection) -> None:
+        for table in (*self.tables, "state"):
+            con.execute(f"DROP TABLE IF EXISTS {table}")
+        con.executescript(self.schema)
+        con.execute(f"PRAGMA user_version = {self.version}")
+
+    def _connect(self) -> Optional[Connection]:
+        try:
+            import sqlite3  # noqa
+        except ImportError:
+            return None
+
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            con = sqlite3.connect(self.path, timeout=30)
+            try:
+                with con:
+                    if con.execute("PRAGMA user_version").fetchone()[0] != self.version:
+                        self._create(con)
+            except sqlite3.Error:
+                con.close()
+                raise
+            return con
+        except (OSError, sqlite3.Error) as e:
+            log.debug(f"vivenv index unavailable: {e}")
+            return None
+
+    def _run(self, func: Callable[[Connection], T]) -> Optional[T]:
+        if (con := self._connect()) is None:
+            return None
+
+        import sqlite3  # noqa
+
+        try:
+            with con:
+                return func(con)
+        except (OSError, sqlite3.Error) as e:
+            log.debug(f"vivenv index unavailable: {e}")
+            return None
+        finally:
+            con.close()
+
+    @staticmethod
+    def _select(
+        where: str, params: Sequence[Any], order: str, limit: Optional[int]
+    ) -> Tuple[str, Sequence[Any]]:
+        return (
+            "SELECT name, meta FROM vivenvs"
+            + (f" WHERE {where}" if where else "")
+            + (f" ORDER BY {order}" if order else "")
+            + (" LIMIT ?" if limit is not None else ""),
+            (*params, limit) if limit is not None else params,
+        )
+
+    @staticmethod
+    def _mtime(path: str) -> float:
+        try:
+            return os.stat(os.path.join(path, "vivmeta.json")).st_mtime
+        except OSError:
+            return 0
+
+    def _upsert(self, con: Connection, name: str, meta: Meta) -> None:
+        con.execute(
+            "INSERT OR REPLACE INTO vivenvs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                name,
+                meta.id,
+                ", ".join(meta.spec),
+                meta.exe,
+                _timestamp(meta.created),
+                _timestamp(meta.accessed),
+                meta.size.get("apparent"),
+                meta.size.get("unique"),
+                json.dumps(meta.__dict__),
+                # to notice a vivmeta.json written without `Meta.write`
+                self._mtime(str(self.venvs / name)),
+            ),
+        )
+        con.execute("DELETE FROM files WHERE name = ?", (name,))
+        con.executemany(
+            "INSERT OR IGNORE INTO files VALUES (?, ?)",
+            ((name, f) for f in meta.files),
+        )
+        con.execute("DELETE FROM pkgs WHERE name = ?", (name,))
+        con.executemany(
+            "INSERT OR IGNORE INTO pkgs VALUES (?, ?, ?)",
+            ((name, *_normalize_req(req)) for req in meta.spec if req),
+        )
+        con.execute("DELETE FROM installed WHERE name = ?", (name,))
+        con.executemany(
+            "INSERT OR IGNORE INTO installed VALUES (?, ?, ?)",
+            ((name, pkg, version) for pkg, version in meta.installed.items()),
+        )
+
+    @staticmethod
+    def _delete(con: Connection, names: List[str]) -> None:
+        for table in Index.tables:
+            con.executemany(
+                f"DELETE FROM {table} WHERE name = ?", ((name,) for name in names)
+            )
+
+    def _sync(self, con: Connection) -> int:
+        try:
+            mtime = os.stat(self.venvs).st_mtime_ns
+        except OSError:
+            mtime = 0
+        # vivenvs are added and removed by renaming, which changes the mtime
+        synced = con.execute("SELECT value FROM state WHERE key = 'venvs'").fetchone()
+        if mtime and synced and synced[0] == mtime:
+            return con.execute("SELECT COUNT(*) FROM vivenvs").fetchone()[0]
+
+        indexed = dict(con.execute("SELECT name, mtime FROM vivenvs"))
+        if mtime:
+            with os.scandir(self.venvs) as entries:
+                found = {
+                    entry.name: entry_mtime
+                    for entry in entries
+                    if entry.is_dir()
+                    # vivenvs still being built have no vivmeta.json
+                    and (entry_mtime := self._mtime(entry.path))
+                }
+        else:
+            found = {}
+        self._delete(con, sorted(indexed.keys() - found.keys()))
+        # new vivenvs and those whose vivmeta.json changed outside `Meta.write`,
+        # i.e. by the standalone `_viv_use` or an older viv
+        for name in sorted(found):
+            if indexed.get(name) != found[name]:
+                self._upsert(con, name, Meta.load(name, self.venvs / name))
+        # a change within the same tick as the listing leaves the mtime as is
+        if time_ns() - mtime < 10**9:
+            mtime = 0
+        con.execute("INSERT OR REPLACE INTO state VALUES ('venvs', ?)", (mtime,))
+        return len(found)
+
+    def upsert(self, name: str, meta: Meta) -> None:
+        self._run(lambda con: self._upsert(con, name, meta))
+
+    def remove(self, name: str) -> None:
+        self._run(lambda con: self._delete(con, [name]))
+
+    def sync(self) -> Optional[int]:
+        """reconcile the index with the vivenv directories in the cache
+
+        Returns:
+            number of vivenvs in the index
+        """
+        return self._run(self._sync)
+
+    def rebuild(self) -> Optional[int]:
+        """recreate the index from scratch"""
+
+        def rebuild(con: Connection) -> int:
+            self._create(con)
+            return self._sync(con)
+
+        return self._run(rebuild)
+
+    def files(self) -> Optional[List[Tuple[str, str]]]:
+        """names of indexed vivenvs and their associated files"""
+        return self._run(lambda con: list(con.execute("SELECT name, file FROM files")))
+
+    def installed(self, pkgs: List[str]) -> Optional[List[Tuple[str, str, str]]]:
+        """names of indexed vivenvs and the version they have of any of pkgs"""
+        return self._run(
+            lambda con: list(
+                con.execute(
+                    "SELECT name, pkg, version FROM installed "
+                    f"WHERE pkg IN ({', '.join('?' * len(pkgs))})",
+                    pkgs,
+                )
+            )
+        )
+
+    def keys(self) -> Optional[List[Tuple[str, str]]]:
+        """names and ids of all indexed vivenvs"""
+        return self._run(lambda con: list(con.execute("SELECT name, id FROM vivenvs")))
+
+    def query(
+        self,
+        where: str = "",
+        params: Sequence[Any] = (),
+        order: str = "",
+        limit: Optional[int] = None,
+    ) -> Optional[Dict[str, Meta]]:
+        """vivenv metadata matching an optional sql clause, keyed by name
+
+        Args:
+            where: sql condition on the vivenvs table
+            params: parameters for `where`
+            order: sql ordering, the results are kept in this order
+            limit: maximum number of results
+        """
+        return self._run(
+            lambda con: {
+                name: Meta(**json.loads(meta))
+                for name, meta in con.execute(
+                    *self._select(where, params, order, limit)
+                )
+            }
+        )
+
+    def stream(
+        self,
+        where: str = "",
+        params: Sequence[Any] = (),
+        order: str = "",
+        limit: Optional[int] = None,
+    ) -> Optional[Iterator[Tuple[str, Meta]]]:
+        """like `query` but rows are only read as they are consumed"""
+        if (con := self._connect()) is None:
+            return None
+
+        def rows() -> Iterator[Tuple[str, Meta]]:
+            try:
+                for name, meta in con.execute(
+                    *self._select(where, params, order, limit)
+                ):
+                    yield name, Meta(**json.loads(meta))
+            finally:
+                con.close()
+
+        return rows()
+
 
+class Filter:
+    """`viv list --filter` expressions compiled to sql conditions and predicates
 
-def _read_metadata_block(script: str) -> dict:
-    name = "script"
-    matches = list(
-        filter(lambda m: m.group("type") == name, re.finditer(METADATA_BLOCK, script))
+    Each expression is one or more `[!]key:value` terms separated by `|`
+    and matches if any of its terms do, `!` negates a term.
+    Vivenvs must match every expression.
+    """
+
+    keys = (
+        "created-before",
+        "created-after",
+        "accessed-before",
+        "accessed-after",
+        "files",
+        "spec",
     )
-    if len(matches) > 1:
-        raise ValueError(f"Multiple {name} blocks found")
-    elif len(matches) == 1:
-        return toml_loads(
-            "\n".join((line[2:] for line in matches[0].group(0).splitlines()[1:-1]))
+
+    def __init__(self, exprs: Sequence[str], cache: Cache) -> None:
+        self._cache = cache
+        self._referenced: Optional[Set[str]] = None
+        # expressions the index can answer and those that need python
+        self.indexed: List[List[FilterTerm]] = []
+        self.unindexed: List[List[FilterTerm]] = []
+        for expr in exprs:
+            terms = [self._compile(term) for term in expr.split("|")]
+            if all(sql for sql, _, _ in terms):
+                self.indexed.append(terms)
+            else:
+                self.unindexed.append(terms)
+
+    @property
+    def referenced(self) -> Set[str]:
+        if self._referenced is None:
+            self._referenced = self._cache.referenced()
+        return self._referenced
+
+    def _compile(self, term: str) -> FilterTerm:
+        negate = term.startswith("!")
+        # split once, times have colons (i.e. 2024-01-01T12:30)
+        key, sep, value = term[negate:].partition(":")
+        if not sep:
+            err_quit(f'failed to parse filter "{a.bold}{term}{a.end}" as key:value')
+        if key not in self.keys:
+            err_quit(
+                f"unexpected filter key: {a.yellow}{key}{a.end}, must be one of: "
+                + ", ".join(a.style(k, "bold") for k in self.keys)
+            )
+
+        sql, params, predicate = self._term(key, value)
+        if negate:
+            return (
+                f"NOT ({sql})" if sql else None,
+                params,
+                lambda vivenv: not predicate(vivenv),
+            )
+        return sql, params, predicate
+
+    def _term(self, key: str, value: str) -> FilterTerm:
+        if key == "files":
+            if value == "None":
+                return None, (), lambda vivenv: vivenv.name not in self.referenced
+            p = str(Path(value).absolute().resolve())
+            if not os.path.isfile(p):
+                err_quit(f"Unable to find local file: {value}")
+            return (
+                "name IN (SELECT name FROM files WHERE file = ?)",
+                (p,),
+                lambda vivenv: p in vivenv.meta.files,
+            )
+
+        if key == "spec":
+            # a bare name matches any requirement on that project
+            pkg, req = _normalize_req(value)
+            i, target = (0, pkg) if pkg == req else (1, req)
+            return (
+                f"name IN (SELECT name FROM pkgs WHERE {('pkg', 'req')[i]} = ?)",
+                (target,),
+                lambda vivenv: any(
+                    _normalize_req(r)[i] == target for r in vivenv.meta.spec
+                ),
+            )
+
+        # date-based filters all have a hyphen
+        date_name, when = key.split("-")
+        date = _parse_date(value).timestamp()
+        if when == "before":
+            return (
+                f"{date_name} < ?",
+                (date,),
+                lambda vivenv: _timestamp(getattr(vivenv.meta, date_name)) < date,
+            )
+        return (
+            f"{date_name} > ?",
+            (date,),
+            lambda vivenv: _timestamp(getattr(vivenv.meta, date_name)) > date,
         )
-    else:
-        return {}
 
+    def where(self) -> Tuple[str, List[Any]]:
+        """sql condition and params for the expressions the index can answer"""
+        clauses: List[str] = []
+        params: List[Any] = []
+        for terms in self.indexed:
+            clauses.append(" OR ".join(f"({sql})" for sql, _, _ in terms))
+            params.extend(param for _, term_params, _ in terms for param in term_params)
+        return " AND ".join(f"({clause})" for clause in clauses), params
 
-def _check_python(requires: str) -> None:
-    version = Version(platform.python_version())
-    if version not in SpecifierSet(requires):
-        err_quit(
-            f"Running python {a.yellow}{version}{a.end} does "
-            f"not satisfy 'requires-python: {requires}'"
+    def match(
+        self, vivenvs: Iterable[ViVenv], queried: bool = False
+    ) -> Iterator[ViVenv]:
+        """vivenvs matching every expression, checked as they are consumed
+
+        Args:
+            vivenvs: vivenvs to check
+            queried: vivenvs already satisfy `where()`
+        """
+        exprs = self.unindexed if queried else self.indexed + self.unindexed
+        return (
+            vivenv
+            for vivenv in vivenvs
+            if all(any(predicate(vivenv) for _, _, predicate in e) for e in exprs)
         )
 
 
-def _parse_date(txt: str) -> datetime:
-    """attempt to parse datetime string
+class Cache:
+    # sql ordering and python sort key for `viv list --sort`,
+    # everything but name sorts newest/largest first
+    sort_keys: Dict[str, Tuple[str, Optional[Callable[[ViVenv], float]]]] = {
+        "name": ("name", None),
+        "created": (
+            "created DESC, name",
+            lambda vivenv: _timestamp(vivenv.meta.created),
+        ),
+        "accessed": (
+            "accessed DESC, name",
+            lambda vivenv: _timestamp(vivenv.meta.accessed),
+        ),
+        "size": ("size DESC, name", lambda vivenv: vivenv.meta.size["apparent"]),
+    }
 
-    acceptable formats `%Y-%m-%d` & `%Y-%m-%dT%H:%M`
-    """
+    def __init__(self) -> None:
+        self._vivenvs: Optional[Set[ViVenv]] = None
+        self._synced: Optional[bool] = None
+        self._keys: Optional[Tuple[List[str], Dict[str, List[str]]]] = None
+        self.index = Index()
 
-    try:
-        date = datetime.strptime(
-            txt,
-            "%Y-%m-%d",
-        )
-        return date
-    except ValueError:
-        pass
+    @property
+    def vivenvs(self) -> Set[ViVenv]:
+        """all vivenvs in the cache, loaded on first access"""
+        if self._vivenvs is None:
+            vivenvs = self._query()
+            self._vivenvs = set(vivenvs) if vivenvs is not None else self._get_venvs()
+        return self._vivenvs
+
+    def _get_venvs(self, cache_dir: Optional[Path] = None) -> Set[ViVenv]:
+        cache_dir = cache_dir if cache_dir else Cfg().cache_venv
+        # a single listing of the cache, each vivenv is loaded by path
+        with os.scandir(cache_dir) as entries:
+            return {
+                ViVenv.load(entry.name, Path(entry.path))
+                for entry in entries
+                if entry.is_dir()
+            }
 
-    try:
-        date = datetime.strptime(txt, "%Y-%m-%dT%H:%M")
-        return date
-    except ValueError:
-        pass
+    def _query(
+        self,
+        where: str = "",
+        params: Sequence[Any] = (),
+        order: str = "",
+        limit: Optional[int] = None,
+    ) -> Optional[List[ViVenv]]:
+        """vivenvs from the index or None if it's unavailable"""
+        if (
+            not self._indexed()
+            or (metas := self.index.query(where, params, order, limit)) is None
+        ):
+            return None
+        return [
+            ViVenv.load(name, self.index.venvs / name, meta)
+            for name, meta in metas.items()
+        ]
 
-    err_quit(
-        f"failed to parse {a.yellow}{txt}{a.end} as datetime\n"
-        "acceptable formats `%Y-%m-%d` & `%Y-%m-%dT%H:%M`"
-    )
+    def _indexed(self) -> bool:
+        if self._synced is None:
+            self._synced = self.index.sync() is not None
+        return self._synced
+
+    def _get_keys(self) -> Tuple[List[str], Dict[str, List[str]]]:
+        """sorted vivenv names and a mapping of ids to names"""
+        if self._keys is None:
+            rows = self.index.keys() if self._indexed() else None
+            if rows is None:
+                rows = [(vivenv.name, vivenv.meta.id) for vivenv in self.vivenvs]
+            ids: Dict[str, List[str]] = {}
+            for name, id in rows:
+                ids.setdefault(id, []).append(name)
+            self._keys = sorted(name for name, _ in rows), ids
+        return self._keys
+
+    def _load(self, names: Set[str]) -> Dict[str, ViVenv]:
+        if self._vivenvs is None and self._indexed():
+            vivenvs: Set[ViVenv] = set()
+            chunks = sorted(names)
+            # stay below sqlite's limit on the number of parameters
+            for i in range(0, len(chunks), 500):
+                chunk = chunks[i : i + 500]
+                found = self._query(f"name IN ({', '.join('?' * len(chunk))})", chunk)
+                if found is None:
+                    break
+                vivenvs.update(found)
+            else:
+                return {vivenv.name: vivenv for vivenv in vivenvs}
 
+        return {vivenv.name: vivenv for vivenv in self.vivenvs if vivenv.name in names}
 
-def _update_cache(run_mode: str, tmpdir: str) -> None:
-    new_cache = tmpdir
+    def subsets(self, spec: List[str], exe: str, limit: int = 5) -> List[ViVenv]:
+        """vivenvs whose every requirement is in spec, most requirements first
 
-    if run_mode == "semi-ephemeral":
-        new_cache = str(
-            Path(tempfile.gettempdir()) / ("viv-ephemeral-cache-" + _get_user())
+        Args:
+            spec: requirements of the vivenv to be created
+            exe: only vivenvs tracking the same executable are considered
+            limit: maximum number of vivenvs
+        """
+        reqs = sorted({_normalize_req(req) for req in spec if req})
+        if not reqs:
+            return []
+        pkgs, normalized = [pkg for pkg, _ in reqs], [req for _, req in reqs]
+        marks = ", ".join("?" * len(reqs))
+        vivenvs = self._query(
+            f"""exe = ? AND name IN (
+                SELECT name FROM pkgs WHERE pkg IN ({marks}) AND req IN ({marks})
+                GROUP BY name
+                HAVING COUNT(*) = (SELECT COUNT(*) FROM pkgs q WHERE q.name = pkgs.name)
+            )""",
+            (exe, *pkgs, *normalized),
+            "(SELECT COUNT(*) FROM pkgs WHERE pkgs.name = vivenvs.name) DESC, "
+            "accessed DESC",
+            limit,
         )
+        if vivenvs is not None:
+            return vivenvs
 
-    # by default ephemeral
-    os.environ["VIV_CACHE"] = new_cache
+        found = []
+        for vivenv in self.vivenvs:
+            own = {_normalize_req(req)[1] for req in vivenv.meta.spec if req}
+            if vivenv.meta.exe == exe and own and own <= set(normalized):
+                found.append((len(own), _timestamp(vivenv.meta.accessed), vivenv))
+        found.sort(key=lambda x: x[:2], reverse=True)
+        return [vivenv for *_, vivenv in found[:limit]]
 
+    def satisfying(self, spec: List[str], exe: str) -> List[ViVenv]:
+        """vivenvs whose installed versions satisfy spec, fewest packages first
 
-class Cache:
-    def __init__(self) -> None:
-        self.vivenvs = self._get_venvs()
+        Args:
+            spec: requirements of the vivenv to be created
+            exe: only vivenvs tracking the same executable are considered
 
-    def _get_venvs(self, cache_dir: Path = Cfg().cache_venv) -> Set[ViVenv]:
-        return {ViVenv.load(p.name) for p in cache_dir.iterdir()}
+        Returns:
+            nothing if spec has more than names and version specifiers,
+            i.e. extras, markers or direct references
+        """
+        _, SpecifierSet = _vendored_packaging()
+        reqs: Dict[str, Any] = {}
+        for req in spec:
+            if not req:
+                continue
+            name, normalized = _normalize_req(req)
+            specifier = normalized[len(name) :]
+            if specifier and not re.fullmatch(
+                rf"{SPECIFIER}(,{SPECIFIER})*", specifier
+            ):
+                return []
+            try:
+                reqs[name] = SpecifierSet(specifier) & reqs.get(name, "")
+            except ValueError:
+                return []
+        if not reqs:
+            return []
+
+        rows = self.index.installed(list(reqs)) if self._indexed() else None
+        if rows is None:
+            rows = [
+                (vivenv.name, pkg, version)
+                for vivenv in self.vivenvs
+                for pkg, version in vivenv.meta.installed.items()
+                if pkg in reqs
+            ]
+        installed: Dict[str, Dict[str, str]] = {}
+        for name, pkg, version in rows:
+            installed.setdefault(name, {})[pkg] = version
+
+        def satisfies(versions: Dict[str, str]) -> bool:
+            try:
+                return len(versions) == len(reqs) and all(
+                    version in reqs[pkg] for pkg, version in versions.items()
+                )
+            except ValueError:
+                # not a valid version
+                return False
 
-    @staticmethod
-    def _compare_dates(
-        vivenv: ViVenv, date_name: str, when: str, date: datetime
-    ) -> bool:
-        vivenv_date = datetime.strptime(
-            getattr(vivenv.meta, date_name), "%Y-%m-%d %H:%M:%S.%f"
+        matched = {name for name, versions in installed.items() if satisfies(versions)}
+        return sorted(
+            (
+                vivenv
+                for vivenv in self._load(matched).values()
+                if vivenv.meta.exe == exe
+            ),
+            key=lambda vivenv: (
+                len(vivenv.meta.installed),
+                vivenv.meta.size.get("apparent", 0),
+                vivenv.name,
+            ),
         )
-        if when == "before":
-            return vivenv_date < date
-        else:
-            return vivenv_date > date
 
-    def _filter_date(self, date_name: str, when: str, date: datetime) -> Set[ViVenv]:
-        return {
-            vivenv
-            for vivenv in self.vivenvs
-            if self._compare_dates(
-                vivenv,
-                date_name,
-                when,
-                date,
-            )
-        }
+    def names(self) -> List[str]:
+        """sorted names of every vivenv in the cache"""
+        return self._get_keys()[0]
 
-    def _filter_file(self, file: str) -> Set[ViVenv]:
-        if file == "None":
-            return {vivenv for vivenv in self.vivenvs if vivenv.files_exist()}
-        else:
-            p = Path(file).absolute().resolve()
-            if not p.is_file():
-                err_quit(f"Unable to find local file: {file}")
-            return {vivenv for vivenv in self.vivenvs if str(p) in vivenv.meta.files}
+    def resolve(self, name_ids: Sequence[str]) -> Dict[str, List[ViVenv]]:
+        """vivenvs whose name or id match or whose name begins with each of name_ids
 
-    def _filter_spec(self, spec: str) -> Set[ViVenv]:
+        Names are kept sorted so each lookup is a bisection and
+        all matched vivenvs are loaded at once.
+        """
+        from bisect import bisect_left  # noqa
+
+        names, ids = self._get_keys()
+        matched: Dict[str, List[str]] = {}
+        for name_id in name_ids:
+            matches = set(ids.get(name_id, []))
+            i = bisect_left(names, name_id)
+            while i < len(names) and names[i].startswith(name_id):
+                matches.add(names[i])
+                i += 1
+            matched[name_id] = sorted(matches)
+
+        vivenvs = self._load({name for names in matched.values() for name in names})
         return {
-            vivenv for vivenv in self.vivenvs if spec in ", ".join(vivenv.meta.spec)
+            name_id: [vivenvs[name] for name in names if name in vivenvs]
+            for name_id, names in matched.items()
         }
 
-    def filter(self, filters: Dict[str, str]) -> Set[ViVenv]:
-        vivenv_sets = []
+    def measure(self, vivenvs: Set[ViVenv], recount: bool = False) -> DiskUsage:
+        """record sizes for vivenvs that changed, scanning them in parallel
+
+        Args:
+            vivenvs: vivenvs to get sizes for
+            recount: scan every vivenv even if its recorded size is current
+        """
+        stale = [vivenv for vivenv in vivenvs if recount or vivenv.size_stale()]
+        usage = DiskUsage([vivenv.path for vivenv in stale]).scan()
+        for vivenv in stale:
+            vivenv.record_size(usage)
+        for vivenv in vivenvs:
+            vivenv.get_size()
+        return usage
+
+    def evictable(
+        self,
+        max_size: Optional[int] = None,
+        max_age: Optional[timedelta] = None,
+        keep_referenced: bool = True,
+    ) -> List[ViVenv]:
+        """vivenvs to remove, least recently accessed first
+
+        Uses the recorded sizes and access times,
+        only vivenvs without a recorded size are scanned.
+
+        Args:
+            max_size: evict until the cache is at most this many bytes
+            max_age: evict vivenvs not accessed within this long
+            keep_referenced: never evict vivenvs whose scripts/shims still exist
+        """
+        vivenvs = sorted(self.vivenvs, key=lambda vivenv: vivenv.meta.accessed)
+        if max_size is not None and (
+            unsized := {vivenv for vivenv in vivenvs if not vivenv.meta.size}
+        ):
+            self.measure(unsized)
+
+        referenced = self.referenced() if keep_referenced else set()
+        candidates = [vivenv for vivenv in vivenvs if vivenv.name not in referenced]
+        evict: Dict[ViVenv, None] = {}
+
+        if max_age is not None:
+            cutoff = str(datetime.today() - max_age)
+            evict.update(
+                (vivenv, None) for vivenv in candidates if vivenv.meta.accessed < cutoff
+            )
+
+        if max_size is not None:
+            total = sum(
+                vivenv.meta.size["apparent"]
+                for vivenv in vivenvs
+                if vivenv not in evict
+            )
+            for vivenv in candidates:
+                if total <= max_size:
+                    break
+                if vivenv not in evict:
+                    evict[vivenv] = None
+                    total -= vivenv.meta.size["apparent"]
+
+        return list(evict)
+
+    def referenced(self) -> Set[str]:
+        """names of vivenvs with an associated script or shim that still exists
+
+        Each unique path is checked once, no matter how many vivenvs use it.
+        """
+        rows = self.index.files() if self._indexed() else None
+        if rows is None:
+            rows = [
+                (vivenv.name, f) for vivenv in self.vivenvs for f in vivenv.meta.files
+            ]
+        exists = {f for f in {f for _, f in rows} if os.path.isfile(f)}
+        return {name for name, f in rows if f in exists}
+
+    def match(self, name_id: str) -> List[ViVenv]:
+        """vivenvs whose name or id match or whose name begins with name_id"""
+        return self.resolve([name_id])[name_id]
+
+    def filter(
+        self,
+        filters: Sequence[str] = (),
+        sort: str = "name",
+        limit: Optional[int] = None,
+    ) -> List[ViVenv]:
+        """vivenvs matching every filter expression, sorted and limited
 
-        for k, v in filters.items():
-            if "-" in k:  # date-based filters all have hyphen
-                (date_name, when) = k.split("-")
-                vivenv_sets.append(self._filter_date(date_name, when, _parse_date(v)))
-            elif k == "files":
-                vivenv_sets.append(self._filter_file(v))
+        Expressions the index can answer are queried together with the
+        ordering and limit, anything else is checked in python.
 
-            elif k == "spec":
-                vivenv_sets.append(self._filter_spec(v))
+        Args:
+            filters: `viv list --filter` expressions
+            sort: one of `Cache.sort_keys`
+            limit: maximum number of vivenvs
+        """
+        compiled = Filter(filters, self)
+        order, key = self.sort_keys[sort]
+        # sizes may need to be measured before sorting
+        pushdown = not compiled.unindexed and sort != "size"
 
-        if vivenv_sets:
-            return {vivenv for vivenv in set.union(*vivenv_sets)}
+        vivenvs = self._query(
+            *compiled.where(), order if pushdown else "", limit if pushdown else None
+        )
+        if vivenvs is None:
+            vivenvs = list(compiled.match(self.vivenvs))
+        elif pushdown:
+            return vivenvs
         else:
-            return set()
+            vivenvs = list(compiled.match(vivenvs, queried=True))
+
+        if sort == "size" and (
+            unsized := {vivenv for vivenv in vivenvs if not vivenv.meta.size}
+        ):
+            self.measure(unsized)
+        vivenvs.sort(key=lambda vivenv: vivenv.name)
+        if key:
+            vivenvs.sort(key=key, reverse=True)
+        return vivenvs[:limit] if limit is not None else vivenvs
+
+    def stream(
+        self,
+        filters: Sequence[str] = (),
+        sort: str = "name",
+        limit: Optional[int] = None,
+    ) -> Iterator[ViVenv]:
+        """like `filter` but vivenvs are loaded from the index as they are consumed
+
+        Falls back to `filter` without an index or when sorting by size.
+        """
+        compiled = Filter(filters, self)
+        order, _ = self.sort_keys[sort]
+        if (
+            sort == "size"
+            or not self._indexed()
+            or (
+                rows := self.index.stream(
+                    *compiled.where(), order, None if compiled.unindexed else limit
+                )
+            )
+            is None
+        ):
+            return iter(self.filter(filters, sort, limit))
+
+        vivenvs = compiled.match(
+            (ViVenv.load(name, self.index.venvs / name, meta) for name, meta in rows),
+            queried=True,
+        )
+        return itertools.islice(vivenvs, limit) if compiled.unindexed else vivenvs
 
 
 class Script:
@@ -3033,6 +5148,8 @@ class Script:
         self.remote = Path(path).is_file()  # does this work for symlinks?
 
     def run(self) -> None:
+        import tempfile  # noqa
+
         with tempfile.TemporaryDirectory(prefix="viv-") as tmpdir:
             tmppath = Path(tmpdir)
 
@@ -3099,7 +5216,7 @@ class Script:
                         env=dict(
                             env,
                             PYTHONPATH=":".join(
-                                filter(None, (vivenv.site_packages, Env().pythonpath))
+                                filter(None, (*vivenv.sys_path, Env().pythonpath))
                             ),
                         ),
                     )
@@ -3136,31 +5253,25 @@ class Viv:
         else:
             self.git = False
 
-    def _match_vivenv(self, name_id: str) -> ViVenv:  # type: ignore[return]
-        matches: List[ViVenv] = []
-        vivenvs = self._cache.vivenvs
-
-        for vivenv in vivenvs:
-            if name_id == vivenv.meta.id:
-                matches.append(vivenv)
-            elif vivenv.name == name_id:
-                matches.append(vivenv)
-            elif vivenv.name.startswith(name_id) or (
-                vivenv.meta.id.startswith(name_id) and vivenv.meta.id == vivenv.name
-            ):
-                matches.append(vivenv)
-            elif vivenv.name.startswith(name_id):
-                matches.append(vivenv)
+    def _match_vivenv(self, name_id: str) -> ViVenv:
+        return self._match_vivenvs([name_id])[0]
+
+    def _match_vivenvs(self, name_ids: List[str]) -> List[ViVenv]:
+        vivenvs = []
+        resolved = self._cache.resolve(name_ids)
+        for name_id in name_ids:
+            matches = resolved[name_id]
+            if len(matches) == 1:
+                vivenvs.append(matches[0])
+            elif len(matches) > 1:
+                err_quit(
+                    "matches: " + ",".join((match.name for match in matches)),
+                    "too many matches maybe try a longer name?",
+                )
+            else:
+                err_quit(f"no matches found for {name_id}")
 
-        if len(matches) == 1:
-            return matches[0]
-        elif len(matches) > 1:
-            err_quit(
-                "matches: " + ",".join((match.name for match in matches)),
-                "too many matches maybe try a longer name?",
-            )
-        else:
-            err_quit(f"no matches found for {name_id}")
+        return vivenvs
 
     def cmd_env(self) -> None:
         """manage the viv vivenv cache"""
@@ -3173,17 +5284,89 @@ class Viv:
         `viv cache remove $(viv l -q)`
         """
 
-        for name in vivenvs:
-            vivenv = self._match_vivenv(name)
+        for name, vivenv in zip(vivenvs, self._match_vivenvs(vivenvs)):
             if vivenv.path.is_dir():
-                with Spinner(f"removing vivenv {a.bold}{vivenv.name}{a.end}"):
-                    shutil.rmtree(vivenv.path)
+                vivenv.remove()
                 log.info(f"{a.bold}{vivenv.name}{a.end} succesfully removed")
             else:
                 err_quit(
                     f"cowardly exiting because I didn't find vivenv: {name}",
                 )
 
+        _empty_trash_later(Cfg().cache_base)
+
+    def cmd_env_gc(
+        self,
+        max_size: Optional[str],
+        max_age: Optional[str],
+        include_referenced: bool,
+        dry_run: bool,
+    ) -> None:
+        """\
+        remove least recently used vivenvs
+
+        Vivenvs used by scripts or shims which still exist
+        are kept unless --include-referenced is given.
+        Stored packages no longer used by any vivenv are removed as well.
+        Without any limits only removed vivenvs left in the trash are deleted.
+
+        examples:
+          `viv env gc --max-size 5G`
+          `viv env gc --max-age 30d --dry-run`
+        """
+
+        with _exclusive(Cfg().cache_base / "gc.lock") as idle:
+            if not idle:
+                log.info("viv env gc is already running")
+                return
+            if max_size or max_age:
+                self._evict(max_size, max_age, include_referenced, dry_run)
+            if not dry_run:
+                _empty_trash(Cfg().cache_base)
+            if (max_size or max_age) and not dry_run and Store.enabled():
+                if removed := Store().prune():
+                    log.info(f"removed {removed} unused packages from the store")
+
+    def _evict(
+        self,
+        max_size: Optional[str],
+        max_age: Optional[str],
+        include_referenced: bool,
+        dry_run: bool,
+    ) -> None:
+        evict = self._cache.evictable(
+            max_size=_parse_size(max_size) if max_size else None,
+            max_age=_parse_age(max_age) if max_age else None,
+            keep_referenced=not include_referenced,
+        )
+        if not evict:
+            log.info("nothing to remove")
+            return
+
+        for vivenv in evict.copy():
+            if dry_run:
+                echo(f"would remove {a.bold}{vivenv.name}{a.end}")
+                continue
+            with _claim_vivenv(vivenv.path) as claimed:
+                if claimed:
+                    vivenv.remove()
+                    log.info(f"{a.bold}{vivenv.name}{a.end} succesfully removed")
+                else:
+                    log.info(f"{a.bold}{vivenv.name}{a.end} is in use, skipping")
+                    evict.remove(vivenv)
+
+        freed = _format_size(sum(v.meta.size.get("apparent", 0) for v in evict))
+        log.info(
+            f"{'would free' if dry_run else 'freed'} {a.bold}{freed}{a.end} "
+            f"from {len(evict)} vivenvs"
+        )
+
+    def cmd_env_reindex(self) -> None:
+        """rebuild the vivenv cache index"""
+        if (count := self._cache.index.rebuild()) is None:
+            err_quit("failed to build the vivenv index, is sqlite3 available?")
+        log.info(f"indexed {a.bold}{count}{a.end} vivenvs")
+
     def cmd_freeze(
         self,
         reqs: List[str],
@@ -3217,12 +5400,19 @@ class Viv:
         quiet: bool,
         verbose: bool,
         use_json: bool,
-        filter: Dict[str, str],
+        ndjson: bool,
+        fields: Optional[str],
+        filter: List[str],
+        sort: str,
+        limit: Optional[int],
         size: bool,
     ) -> None:
         """\
         list vivenvs
 
+        filters are `[!]key:value` terms, `|` matches any term
+        and repeated filters must all match
+
         examples:
           `viv list \\
               --filter "accessed-after:2023-08-01"`
@@ -3230,12 +5420,19 @@ class Viv:
             "created-before:$(date -d '2 weeks ago' +'%Y-%m-%d')"`
           `viv list --filter "files:./script.py"`
           `viv list --filter "files:None"`
+          `viv list --filter "spec:rich|spec:typer" --filter "!files:None"`
+          `viv list --sort size --limit 5`
+          `viv list --ndjson --fields name,spec,accessed`
         """
 
-        if filter:
-            vivenvs = self._cache.filter(filter)
-        else:
-            vivenvs = self._cache.vivenvs
+        if limit is not None and limit < 0:
+            err_quit("--limit must not be negative")
+        keys = self._meta_fields(fields)
+        if ndjson:
+            self._write_ndjson(self._cache.stream(filter, sort, limit), keys, size)
+            return
+
+        vivenvs = self._cache.filter(filter, sort, limit)
 
         if quiet:
             sys.stdout.write("\n".join((vivenv.meta.id for vivenv in vivenvs)) + "\n")
@@ -3244,25 +5441,69 @@ class Viv:
         # NOTE: this feels out of place
         size_pad = 0
         if size:
-            for vivenv in vivenvs:
-                vivenv.get_size()
-                size_pad = max(size_pad, len(vivenv.size))
+            usage = self._cache.measure(set(vivenvs), recount=verbose)
+            size_pad = max((len(vivenv.size) for vivenv in vivenvs), default=0)
 
-        if len(self._cache.vivenvs) == 0:
+        if not vivenvs and not self._cache.names():
             log.info("no vivenvs setup")
-        elif len(vivenvs) == 0 and filter:
+        elif not vivenvs:
             log.info("no vivenvs match filter")
         elif verbose:
             for vivenv in vivenvs:
                 vivenv.tree()
         elif use_json:
             sys.stdout.write(
-                json.dumps({vivenv.name: vivenv.meta.__dict__ for vivenv in vivenvs})
+                json.dumps(
+                    {
+                        vivenv.name: {k: vivenv.meta.__dict__[k] for k in keys}
+                        for vivenv in vivenvs
+                    }
+                )
             )
         else:
             for vivenv in vivenvs:
                 vivenv.show(size_pad)
 
+        if size and vivenvs and not use_json:
+            total = _format_size(
+                sum(vivenv.meta.size["apparent"] for vivenv in vivenvs)
+            )
+            if verbose:
+                # only a full scan accounts for files shared between vivenvs
+                total += f" ({_format_size(usage.total()[1])} unique)"
+            sys.stdout.write(
+                f"{a.yellow}{total:>{size_pad}}{a.end} {a.bold}total{a.end}\n"
+            )
+
+    @staticmethod
+    def _meta_fields(fields: Optional[str]) -> List[str]:
+        # every field of vivmeta.json
+        available = list(Meta(name="", id="", spec=[], files=[], exe="").__dict__)
+        if not fields:
+            return available
+        keys = [k.strip() for k in fields.split(",")]
+        if unknown := [k for k in keys if k not in available]:
+            err_quit(
+                f"unknown field(s): {a.yellow}{', '.join(unknown)}{a.end}, "
+                "must be one of: " + ", ".join(a.style(k, "bold") for k in available)
+            )
+        return keys
+
+    @staticmethod
+    def _write_ndjson(vivenvs: Iterator[ViVenv], keys: List[str], size: bool) -> None:
+        """write each vivenv's metadata as one json line as soon as it is loaded"""
+        try:
+            for vivenv in vivenvs:
+                if size and vivenv.size_stale():
+                    vivenv.record_size()
+                meta = vivenv.meta.__dict__
+                sys.stdout.write(json.dumps({k: meta[k] for k in keys}) + "\n")
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # the reader went away (i.e. `| head`), silence the flush at exit
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+
     def cmd_env_exe(self, vivenv_id: str, cmd: str, rest: List[str]) -> None:
         """\
         run binary/script in existing vivenv
@@ -3273,6 +5514,7 @@ class Viv:
         """
 
         vivenv = self._match_vivenv(vivenv_id)
+        _share_vivenv(vivenv.path)
         bin = vivenv.path / "bin" / cmd
         vivenv.bin_exists(bin.name)
         full_cmd = [str(bin), *rest]
@@ -3299,7 +5541,10 @@ class Viv:
             vivenv.tree()
 
     def _install_local_src(self, sha256: str, src: Path, cli: Path, yes: bool) -> None:
+        import shutil  # noqa
+
         log.info("updating local source copy of viv")
+        src.parent.mkdir(exist_ok=True, parents=True)
         shutil.copy(Cfg().cache_src / f"{sha256}.py", src)
         make_executable(src)
         log.info("symlinking cli")
@@ -3332,6 +5577,8 @@ class Viv:
         system: bool = False,
     ) -> None:
         """manage viv itself"""
+        import shutil  # noqa
+
         if pythonpath:
             if self.local and self.local_source:
                 sys.stdout.write(str(self.local_source.parent) + "\n")
@@ -3417,6 +5664,8 @@ class Viv:
         cli: Path,
         yes: bool,
     ) -> None:
+        import shutil  # noqa
+
         to_remove = []
         if Cfg().cache_base.is_dir():
             to_remove.append(Cfg().cache_base)
@@ -3565,17 +5814,31 @@ class Cli:
             ),
             Arg(
                 flag="filter",
-                help="filter vivenvs based on key:val",
+                help="filter vivenvs based on [!]key:val, or'ed with |",
                 metavar="<key:value>",
-                action=KVAppendAction,
-                keys=[
-                    "created-before",
-                    "created-after",
-                    "accessed-before",
-                    "accessed-after",
-                    "files",
-                    "spec",
-                ],
+                action="append",
+                default=[],
+            ),
+            Arg(
+                "--sort",
+                help="order vivenvs by",
+                choices=list(Cache.sort_keys),
+                default="name",
+            ),
+            Arg(
+                "--limit",
+                help="show at most this many vivenvs",
+                metavar="<n>",
+                type=int,
+            ),
+            BoolArg(
+                "--ndjson",
+                help="stream metadata as one json object per line",
+            ),
+            Arg(
+                "--fields",
+                help="comma-separated metadata fields for --json/--ndjson",
+                metavar="<field,...>",
             ),
         ],
         ("shim",): [
@@ -3600,7 +5863,10 @@ class Cli:
             Arg("vivenv_id", help="name/hash of vivenv", metavar="vivenv")
         ],
         ("list", "env_info"): [
-            BoolArg(flag="size", help="calculate size of vivenvs"),
+            BoolArg(
+                flag="size",
+                help="calculate size of vivenvs (recounted with --verbose)",
+            ),
             BoolArg(
                 "--json",
                 help="name:metadata json for vivenvs ",
@@ -3672,6 +5938,23 @@ class Cli:
         ("env_remove",): [
             Arg("vivenvs", help="name/hash of vivenv", nargs="*", metavar="vivenv")
         ],
+        ("env_gc",): [
+            Arg(
+                "--max-size",
+                help="remove vivenvs until the cache is at most <size>, i.e. 10G",
+                metavar="<size>",
+            ),
+            Arg(
+                "--max-age",
+                help="remove vivenvs not accessed within <age>, i.e. 30d",
+                metavar="<age>",
+            ),
+            BoolArg(
+                "--include-referenced",
+                help="also remove vivenvs used by existing scripts/shims",
+            ),
+            BoolArg(flag="dry-run", help="only show what would be removed"),
+        ],
     }
     (
         cmds := dict.fromkeys(
@@ -3687,8 +5970,12 @@ class Cli:
     ).update(
         {
             cmd: {
-                subcmd: dict(description=help, help=help, aliases=[subcmd[0]])
-                for subcmd, help in subcmd_help
+                subcmd: dict(
+                    description=help,
+                    help=help,
+                    aliases=aliases[0] if aliases else [subcmd[0]],
+                )
+                for subcmd, help, *aliases in subcmd_help
             }
             for cmd, subcmd_help in (
                 (
@@ -3697,6 +5984,8 @@ class Cli:
                         ("exe", "run binary/script in existing vivenv"),
                         ("info", "get metadata about a vivenv"),
                         ("remove", "remove a vivenv"),
+                        ("gc", "remove least recently used vivenvs"),
+                        ("reindex", "rebuild the vivenv cache index", []),
                     ),
                 ),
                 (
@@ -3714,15 +6003,20 @@ class Cli:
 
     def __init__(self, viv: Viv) -> None:
         self.viv = viv
-        self.parser = ArgumentParser(
+        self.parser = _argument_parser()(
             prog=viv.name, description=viv.t.description(viv.name)
         )
+        self.parser.add_argument(
+            "-V",
+            "--version",
+            action="version",
+            version=f"{a.bold}viv{a.end}, version {a.cyan}{__version__}{a.end}",
+        )
         self._cmd_arg_group_map()
-        self.parsers = self._make_parsers()
-        self._add_args()
+        self.parsers: Dict[Tuple[str, ...], StdArgParser] = {}
 
     def _cmd_arg_group_map(self) -> None:
-        self.cmd_arg_group_map: Dict[str, List[Sequence[str] | str]] = {}
+        self.cmd_arg_group_map: Dict[str, List[Tuple[str, ...]]] = {}
         for grp in self.args:
             if isinstance(grp, str):
                 self.cmd_arg_group_map.setdefault(grp, []).append(grp)
@@ -3730,13 +6024,30 @@ class Cli:
                 for cmd in grp:
                     self.cmd_arg_group_map.setdefault(cmd, []).append(grp)
 
-    def _make_parsers(self) -> Dict[Sequence[str] | str, ArgumentParser]:
-        return {**{grp: ArgumentParser(add_help=False) for grp in self.args}}
-
-    def _add_args(self) -> None:
-        for grp, args in self.args.items():
-            for arg in args:
-                self.parsers[grp].add_argument(*arg.args, **arg.kwargs)
+    def _get_parents(self, cmd: str) -> List[StdArgParser]:
+        """parent parsers for cmd, only built the first time they're needed"""
+        for grp in self.cmd_arg_group_map.get(cmd, []):
+            if grp not in self.parsers:
+                self.parsers[grp] = parser = _argument_parser()(add_help=False)
+                for arg in self.args[grp]:
+                    parser.add_argument(*arg.args, **arg.kwargs)
+        return [self.parsers[grp] for grp in self.cmd_arg_group_map.get(cmd, [])]
+
+    def _resolve_cmd(self, argv: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """find the (sub)command named in argv, if any, accounting for aliases"""
+        positionals = iter(arg for arg in argv if not arg.startswith("-"))
+        name = next(positionals, "")
+        for cmd, subcmds in self.cmds.items():
+            if name not in (cmd, cmd[0]):
+                continue
+            if not subcmds:
+                return cmd, None
+            name = next(positionals, "")
+            for subcmd, kwargs in subcmds.items():
+                if name == subcmd or name in kwargs["aliases"]:
+                    return cmd, subcmd
+            return cmd, None
+        return None, None
 
     def _validate_args(self, args: Namespace) -> None:
         name = args.func.__name__.replace("cmd_", "")
@@ -3789,16 +6100,16 @@ class Cli:
 
     def _get_subcmd_parser(
         self,
-        subparsers: _SubParsersAction[ArgumentParser],
+        subparsers: _SubParsersAction[StdArgParser],
         name: str,
         attr: Optional[str] = None,
         **kwargs: Any,
-    ) -> ArgumentParser:
+    ) -> StdArgParser:
         aliases = kwargs.pop("aliases", [name[0]])
 
         cmd = getattr(self.viv, attr if attr else f"cmd_{name}")
 
-        parser: ArgumentParser = subparsers.add_parser(
+        parser: StdArgParser = subparsers.add_parser(
             name,
             help=cmd.__doc__.splitlines()[0],
             description=dedent(cmd.__doc__),
@@ -3809,19 +6120,16 @@ class Cli:
 
         return parser
 
-    def run(self) -> None:
-        self.parser.add_argument(
-            "-V",
-            "--version",
-            action="version",
-            version=f"{a.bold}viv{a.end}, version {a.cyan}{__version__}{a.end}",
-        )
-
+    def _add_subparsers(
+        self, only_cmd: Optional[str] = None, only_subcmd: Optional[str] = None
+    ) -> None:
         cmd_p = self.parser.add_subparsers(
             metavar="<sub-cmd>", title="subcommands", required=True
         )
 
         for cmd, subcmds in self.cmds.items():
+            if only_cmd and cmd != only_cmd:
+                continue
             if subcmds:
                 subcmd_p = self._get_subcmd_parser(cmd_p, cmd)
                 subcmd_cmd_p = subcmd_p.add_subparsers(
@@ -3830,12 +6138,11 @@ class Cli:
                     required=True,
                 )
                 for subcmd, kwargs in subcmds.items():
+                    if only_subcmd and subcmd != only_subcmd:
+                        continue
                     subcmd_cmd_p.add_parser(
                         subcmd,
-                        parents=[
-                            self.parsers[k]
-                            for k in self.cmd_arg_group_map[f"{cmd}_{subcmd}"]
-                        ],
+                        parents=self._get_parents(f"{cmd}_{subcmd}"),
                         **kwargs,
                     ).set_defaults(func=getattr(self.viv, f"cmd_{cmd}_{subcmd}"))
 
@@ -3843,58 +6150,116 @@ class Cli:
                 self._get_subcmd_parser(
                     cmd_p,
                     cmd,
-                    parents=[self.parsers.get(k) for k in self.cmd_arg_group_map[cmd]],
+                    parents=self._get_parents(cmd),
                 )
-        if "--" in sys.argv:
-            i = sys.argv.index("--")
-            args = self.parser.parse_args(sys.argv[1:i])
-            args.rest = sys.argv[i + 1 :]
-        elif {"r", "run"} & set(sys.argv[1:2]) and (
-            flag := list({"-s", "--script"} & set(sys.argv))
+
+    def parse_args(self, argv: List[str]) -> Namespace:
+        # only build the parsers for the requested subcommand,
+        # the full tree is needed for top-level help or usage errors
+        self._add_subparsers(
+            *self._resolve_cmd(argv[: argv.index("--")] if "--" in argv else argv)
+        )
+
+        if "--" in argv:
+            i = argv.index("--")
+            args = self.parser.parse_args(argv[:i])
+            args.rest = argv[i + 1 :]
+        elif {"r", "run"} & set(argv[:1]) and (
+            flag := list({"-s", "--script"} & set(argv))
         ):
-            i = sys.argv.index(flag[0])
-            args = self.parser.parse_args(sys.argv[1 : i + 2])
-            args.rest = sys.argv[i + 2 :]
+            i = argv.index(flag[0])
+            args = self.parser.parse_args(argv[: i + 2])
+            args.rest = argv[i + 2 :]
         else:
-            args = self.parser.parse_args()
+            args = self.parser.parse_args(argv)
             if args.func.__name__ in ("cmd_run", "cmd_env_exe"):
                 args.rest = []
 
         self._validate_args(args)
+        return args
+
+    def run(self) -> None:
+        args = self.parse_args(sys.argv[1:])
         func = args.__dict__.pop("func")
-        _pip_check()
+        if func.__name__ != "cmd_env_gc":
+            # finish removals interrupted in a previous run
+            _empty_trash_later(Cfg().cache_base)
+        if func.__name__ not in PIP_FREE_CMDS:
+            _pip_check()
         func(
             **vars(args),
         )
 
 
-def _pip_check():
+# cached result of `_pip_check`, keyed by the pip executable
+PIP_CHECK = "pipcheck.json"
+# commands which never invoke pip
+PIP_FREE_CMDS = {
+    "cmd_list",
+    "cmd_env_gc",
+    "cmd_env_info",
+    "cmd_env_reindex",
+    "cmd_env_remove",
+    "cmd_manage_show",
+}
+
+
+@span
+def _pip_check() -> None:
+    import shutil  # noqa
+    import subprocess  # noqa
+
     pip_version_requirement = ">=22.2"
-    if not shutil.which("pip"):
+    if not (pip := shutil.which("pip")):
         err_quit("viv requires pip to be installed")
 
-    # importing viv may have side effects I'm not aware of...
+    pip_path = Path(pip).resolve()
+    # the version is imported from this interpreter's pip if it has one
+    key = dict(
+        path=str(pip_path),
+        mtime=pip_path.stat().st_mtime_ns,
+        executable=sys.executable,
+        python=sys.version,
+    )
+    cache = Cfg().cache_base / PIP_CHECK
     try:
-        pip_version = __import__("pip").__version__
-    except ModuleNotFoundError:
-        cmd = ["pip", "--version"]
-        p = subprocess.run(
-            cmd,
-            text=True,
-            stderr=subprocess.STDOUT,
-            stdout=subprocess.PIPE,
-        )
+        cached = json.loads(cache.read_text())
+    except (OSError, ValueError):
+        cached = {}
+
+    if all(cached.get(k) == v for k, v in key.items()):
+        pip_version, ok = cached.get("version"), cached.get("ok")
+    else:
+        # importing viv may have side effects I'm not aware of...
+        try:
+            pip_version = __import__("pip").__version__
+        except ModuleNotFoundError:
+            cmd = ["pip", "--version"]
+            p = subprocess.run(
+                cmd,
+                text=True,
+                stderr=subprocess.STDOUT,
+                stdout=subprocess.PIPE,
+            )
 
-        if p.returncode != 0:
-            a.subprocess(cmd, p.stdout)
-            err_quit("viv failed to get version from pip, see above")
-        if not p.stdout.startswith("pip"):
-            a.subprocess(cmd, p.stdout)
-            err_quit("unexpected output from pip, see above")
+            if p.returncode != 0:
+                a.subprocess(cmd, p.stdout)
+                err_quit("viv failed to get version from pip, see above")
+            if not p.stdout.startswith("pip"):
+                a.subprocess(cmd, p.stdout)
+                err_quit("unexpected output from pip, see above")
 
-        pip_version = p.stdout.split()[1]
+            pip_version = p.stdout.split()[1]
+
+        Version, SpecifierSet = _vendored_packaging()
+        ok = Version(pip_version) in SpecifierSet(pip_version_requirement)
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            cache.write_text(json.dumps(dict(key, version=pip_version, ok=ok)))
+        except OSError:
+            log.debug(f"failed to cache pip check at {cache}")
 
-    if Version(pip_version) not in SpecifierSet(pip_version_requirement):
+    if not ok:
         err_quit(
             f"viv requires pip version {pip_version_requirement} but got {pip_version}"
         )
@@ -3911,8 +6276,9 @@ def _no_traceback_excepthook(
 
 def main() -> None:
     try:
-        viv = Viv()
-        Cli(viv).run()
+        with profile.span("main"):
+            viv = Viv()
+            Cli(viv).run()
     except KeyboardInterrupt:
         echo(f"caught {a.bold}SIGINT")
         if sys.excepthook is sys.__excepthook__:
@@ -2,6 +2,8 @@ import os
 import shutil
 from pathlib import Path
 
+import pytest
+
 cache = (Path(__file__).parent / ".viv-cache").absolute()
 if cache.is_dir():
     shutil.rmtree(cache)
@@ -10,3 +12,9 @@ if cache.is_dir():
 os.environ = {k: v for k, v in os.environ.items() if not k.startswith("VIV_")}
 
 os.environ["VIV_CACHE"] = str(cache)
+
+
+@pytest.fixture(autouse=True)
+def environ(monkeypatch):
+    # an in-process `viv run` repoints VIV_CACHE/VIV_STORE, keep that to one test
+    monkeypatch.setattr(os, "environ", os.environ.copy())
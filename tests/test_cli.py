@@ -0,0 +1,710 @@
+import json
+import os
+import subprocess
+import sys
+import sysconfig
+from datetime import datetime
+
+import pytest
+import viv.viv as viv
+
+
+@pytest.fixture
+def cli():
+    return viv.Cli(viv.Viv())
+
+
+@pytest.mark.parametrize(
+    "argv,cmd,subcmd",
+    [
+        (["run", "pkg"], "run", None),
+        (["r", "-s", "script.py"], "run", None),
+        (["env", "i", "name"], "env", "info"),
+        (["-V"], None, None),
+        (["bogus"], None, None),
+    ],
+)
+def test_resolve_cmd(cli, argv, cmd, subcmd):
+    assert cli._resolve_cmd(argv) == (cmd, subcmd)
+
+
+def test_parse_args_only_builds_cmd(cli):
+    args = cli.parse_args(["r", "pkg", "--", "-m", "pkg"])
+    assert args.func == cli.viv.cmd_run
+    assert args.reqs == ["pkg"]
+    assert args.rest == ["-m", "pkg"]
+    assert set(cli.parsers) == set(cli.cmd_arg_group_map["run"])
+
+
+def test_pip_check_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    viv._pip_check()
+    cached = json.loads((tmp_path / viv.PIP_CHECK).read_text())
+    assert cached["ok"]
+
+    # a cache hit never needs to compare versions
+    vendored_packaging = viv._vendored_packaging
+    monkeypatch.setattr(viv, "_vendored_packaging", None)
+    viv._pip_check()
+
+    (tmp_path / viv.PIP_CHECK).write_text(json.dumps({**cached, "ok": False}))
+    with pytest.raises(SystemExit):
+        viv._pip_check()
+
+    # another interpreter sharing the cache checks again
+    monkeypatch.setattr(viv, "_vendored_packaging", vendored_packaging)
+    monkeypatch.setattr(sys, "executable", "/other/python")
+    viv._pip_check()
+    assert json.loads((tmp_path / viv.PIP_CHECK).read_text())["ok"]
+
+
+def test_profile(tmp_path, capsys):
+    profile = viv.Profile()
+    profile.path = tmp_path / "trace.json"
+    with profile.span("outer"), profile.span("inner"):
+        pass
+    profile.write()
+
+    events = json.loads(profile.path.read_text())["traceEvents"]
+    assert [e["name"] for e in events] == ["inner", "outer"]
+    assert all(e["ph"] == "X" for e in events)
+    assert "viv profile:" in capsys.readouterr().err
+
+    # only the parent writes the trace
+    code = "import os, viv.viv; print(os.getenv('VIV_PROFILE'))"
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.path.dirname(os.path.dirname(viv.__file__)),
+        VIV_PROFILE=str(profile.path),
+    )
+    p = subprocess.run(
+        [sys.executable, "-c", code], env=env, stdout=subprocess.PIPE, text=True
+    )
+    assert p.stdout.strip() == "None"
+
+
+def test_run_skips_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path / "cache"))
+    for i in range(3):
+        vivenv = viv.ViVenv([f"unrelated-{i}"])
+        vivenv.path.mkdir(parents=True)
+        vivenv.meta.write()
+
+    loads = []
+    load = viv.Meta.load
+    monkeypatch.setattr(
+        viv.Meta,
+        "load",
+        classmethod(lambda cls, name, *args: loads.append(name) or load(name, *args)),
+    )
+
+    script = tmp_path / "script.py"
+    script.write_text("pass")
+    cli = viv.Cli(viv.Viv())
+    args = cli.parse_args(["run", "-s", str(script)])
+    with pytest.raises(SystemExit):
+        args.__dict__.pop("func")(**vars(args))
+    assert not loads
+
+    # `viv run` points VIV_CACHE at a temporary directory
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path / "cache"))
+    # listing is served by the index
+    assert len(viv.Cache().vivenvs) == 3
+    assert not loads
+
+    (tmp_path / "cache" / viv.CACHE_INDEX).unlink()
+    assert len(viv.Cache().vivenvs) == 3
+    assert len(loads) == 3
+
+
+def test_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    monkeypatch.setattr(viv, "_spawn_gc", lambda *args: False)
+    names = []
+    for spec in (["pkg-a"], ["pkg-b"], ["pkg-a", "pkg-c"]):
+        vivenv = viv.ViVenv(spec)
+        vivenv.path.mkdir(parents=True)
+        vivenv.meta.addfile(tmp_path / f"{vivenv.name}.py")
+        vivenv.meta.created = vivenv.meta.accessed = "2024-01-01 00:00:00.000000"
+        vivenv.meta.write()
+        names.append(vivenv.name)
+
+    cache = viv.Cache()
+    assert {v.name for v in cache.filter(["spec:pkg-a"])} == {names[0], names[2]}
+    assert len(cache.filter(["accessed-before:2024-01-02"])) == 3
+    assert not cache.filter(["created-after:2024-01-02"])
+    assert [v.name for v in cache.match(names[1][:4])] == [names[1]]
+
+    (tmp_path / f"{names[1]}.py").touch()
+    assert [v.name for v in cache.filter([f"files:{tmp_path}/{names[1]}.py"])] == [
+        names[1]
+    ]
+
+    # vivenvs without a vivmeta.json are still being built
+    venvs = tmp_path / "venvs"
+    (venvs / "building").mkdir()
+    os.utime(venvs, (1, 1))
+    assert viv.Index(tmp_path).sync() == 3
+    # the cache is only listed again once the venvs directory changes
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", None)
+    assert viv.Index(tmp_path).sync() == 3
+    monkeypatch.setattr(os, "scandir", scandir)
+
+    # a vivmeta.json written without `Meta.write` is picked up,
+    # `_viv_use` touches the venvs directory after writing it
+    metafile = venvs / names[0] / "vivmeta.json"
+    meta = json.loads(metafile.read_text())
+    meta["accessed"] = "2024-02-01 00:00:00.000000"
+    metafile.write_text(json.dumps(meta))
+    os.utime(metafile, (1, 1))
+    os.utime(venvs)
+    assert [v.name for v in viv.Cache().filter(["accessed-after:2024-01-15"])] == [
+        names[0]
+    ]
+
+    viv.Cli(viv.Viv()).viv.cmd_env_remove([names[1]])
+    assert not viv.Index(tmp_path).query("name = ?", (names[1],))
+    assert viv.Index(tmp_path).rebuild() == 2
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_resolve(tmp_path, monkeypatch, indexed):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    if not indexed:
+        monkeypatch.setattr(viv.Index, "_run", lambda self, func: None)
+    for name in ("abc", "abd", "xyz"):
+        vivenv = viv.ViVenv([name], name=name)
+        vivenv.path.mkdir(parents=True)
+        vivenv.meta.write()
+
+    resolved = viv.Cache().resolve(["ab", "abc", "x", "q", vivenv.meta.id])
+    assert {k: [v.name for v in vivenvs] for k, vivenvs in resolved.items()} == {
+        "ab": ["abc", "abd"],
+        "abc": ["abc"],
+        "x": ["xyz"],
+        "q": [],
+        vivenv.meta.id: ["xyz"],
+    }
+
+    with pytest.raises(SystemExit):
+        viv.Viv()._match_vivenvs(["x", "ab"])
+
+
+def test_size(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    vivenv = viv.ViVenv(["pkg"])
+    site_packages = vivenv.path / "lib" / "python3" / "site-packages"
+    site_packages.mkdir(parents=True)
+    (site_packages / "a.py").write_bytes(b"a" * 100)
+    os.link(site_packages / "a.py", site_packages / "b.py")
+    (site_packages / "shared.py").write_bytes(b"s" * 1000)
+    os.link(site_packages / "shared.py", tmp_path / "shared.py")
+    (site_packages / "link.py").symlink_to(tmp_path / "shared.py")
+    vivenv.record_paths()
+
+    vivenv.get_size()
+    assert vivenv.meta.size["apparent"] == 1200
+    assert vivenv.meta.size["unique"] == 100
+    assert vivenv.size == "1.2KB (100.0B unique)"
+    vivenv.meta.write()
+    assert viv.Meta.load(vivenv.name).size == vivenv.meta.size
+
+    # recorded sizes are reused until packages change
+    (site_packages / "a.py").write_bytes(b"a" * 200)
+    vivenv.get_size()
+    assert vivenv.meta.size["apparent"] == 1200
+    (site_packages / "c.py").touch()
+    vivenv.get_size()
+    assert vivenv.meta.size["apparent"] > 1300
+
+
+@pytest.mark.parametrize("workers", [1, None])
+def test_disk_usage(tmp_path, workers):
+    a, b = tmp_path / "a", tmp_path / "b"
+    (a / "sub").mkdir(parents=True)
+    b.mkdir()
+    (a / "sub" / "own.py").write_bytes(b"a" * 10)
+    (a / "shared.py").write_bytes(b"s" * 100)
+    os.link(a / "shared.py", b / "shared.py")
+
+    usage = viv.DiskUsage([a, b]).scan(workers)
+    assert usage.usage(a) == (110, 10)
+    assert usage.usage(b) == (100, 0)
+    assert usage.total() == (210, 110)
+
+
+def test_gc(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path / "cache"))
+    script = tmp_path / "script.py"
+    script.touch()
+    for i, accessed in enumerate(
+        ("2024-01-01", "2024-02-01", "2024-03-01", "2024-04-01")
+    ):
+        vivenv = viv.ViVenv([f"pkg-{i}"], name=f"env-{i}")
+        vivenv.path.mkdir(parents=True)
+        vivenv.meta.size = dict(apparent=100, unique=100, mtime=0)
+        if i == 0:
+            vivenv.meta.addfile(script)
+        vivenv.meta.accessed = accessed + " 00:00:00.000000"
+        vivenv.meta.write()
+
+    def evict(**kwargs):
+        return [vivenv.name for vivenv in viv.Cache().evictable(**kwargs)]
+
+    # env-0 is the oldest but still used by script.py
+    assert evict(max_size=250) == ["env-1", "env-2"]
+    assert evict(max_size=250, keep_referenced=False) == ["env-0", "env-1"]
+    assert evict(max_age=datetime.today() - datetime(2024, 2, 15)) == ["env-1"]
+    assert evict(max_size=1000) == []
+
+    viv.Viv().cmd_env_gc("250", None, include_referenced=False, dry_run=True)
+    assert len(list((tmp_path / "cache" / "venvs").iterdir())) == 4
+    viv.Viv().cmd_env_gc("250", None, include_referenced=False, dry_run=False)
+    assert sorted(p.name for p in (tmp_path / "cache" / "venvs").iterdir()) == [
+        "env-0",
+        "env-3",
+    ]
+    assert len(viv.Cache().vivenvs) == 2
+
+
+@pytest.mark.parametrize(
+    "txt,size", [("100", 100), ("1.5K", 1536), ("10G", 10 * 1024**3), ("2MB", 2 << 20)]
+)
+def test_parse_size(txt, size):
+    assert viv._parse_size(txt) == size
+
+
+def test_gc_skips_in_use(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    vivenv = viv.ViVenv(["pkg"])
+    vivenv.path.mkdir(parents=True)
+    vivenv.meta.write()
+
+    viv._share_vivenv(vivenv.path)
+    viv.Viv().cmd_env_gc("0", None, include_referenced=True, dry_run=False)
+    assert vivenv.path.is_dir()
+
+    os.close(viv._held_locks.pop(vivenv.path))
+    viv.Viv().cmd_env_gc("0", None, include_referenced=True, dry_run=False)
+    assert not vivenv.path.exists()
+    assert not viv._vivenv_lock(vivenv.path).exists()
+
+    # as is a vivenv running a command through `viv env exe`
+    vivenv = viv.ViVenv(["other"])
+    (vivenv.path / "bin").mkdir(parents=True)
+    (vivenv.path / "bin" / "ok").write_text("#!/bin/sh\n")
+    (vivenv.path / "bin" / "ok").chmod(0o755)
+    vivenv.meta.write()
+    viv.Viv().cmd_env_exe(vivenv.name, "ok", [])
+    viv.Viv().cmd_env_gc("0", None, include_referenced=True, dry_run=False)
+    assert vivenv.path.is_dir()
+    os.close(viv._held_locks.pop(vivenv.path))
+
+
+def test_schedule_gc(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(subprocess, "Popen", lambda cmd, **kw: calls.append(cmd))
+
+    viv._schedule_gc(tmp_path)
+    assert not calls
+
+    monkeypatch.setenv("VIV_CACHE_MAX_SIZE", "10G")
+    viv._schedule_gc(tmp_path)
+    viv._schedule_gc(tmp_path)
+    assert calls == [[sys.executable, viv.__file__, "env", "gc", "--max-size", "10G"]]
+
+    # the temporary cache of `viv run` is never collected
+    (tmp_path / "run").mkdir()
+    monkeypatch.setenv("VIV_EPHEMERAL_CACHE", str(tmp_path / "run"))
+    viv._schedule_gc(tmp_path / "run")
+    assert len(calls) == 1
+
+
+def test_remove_to_trash(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    spawned = []
+    monkeypatch.setattr(viv, "_spawn_gc", lambda *args: spawned.append(args) or True)
+    vivenv = viv.ViVenv(["pkg"])
+    (vivenv.path / "lib" / "pkg").mkdir(parents=True)
+    (vivenv.path / "lib" / "pkg" / "__init__.py").touch()
+    vivenv.meta.write()
+
+    viv.Viv().cmd_env_remove([vivenv.name])
+    assert not vivenv.path.exists()
+    assert len(list((tmp_path / "trash").iterdir())) == 1
+    assert spawned == [(tmp_path,)]
+
+    # a gc that never ran is picked up by the next run
+    monkeypatch.setattr(viv, "_spawn_gc", lambda *args: False)
+    monkeypatch.setattr(sys, "argv", ["viv", "list"])
+    viv.Cli(viv.Viv()).run()
+    assert not list((tmp_path / "trash").iterdir())
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_filter_files(tmp_path, monkeypatch, indexed):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path / "cache"))
+    if not indexed:
+        monkeypatch.setattr(viv.Index, "_run", lambda self, func: None)
+    shared, gone = tmp_path / "shared.py", tmp_path / "gone.py"
+    shared.touch()
+    files = {"a": [shared], "b": [shared, gone], "c": [gone], "d": []}
+    for name, paths in files.items():
+        vivenv = viv.ViVenv([name], name=name)
+        vivenv.path.mkdir(parents=True)
+        for path in paths:
+            vivenv.meta.addfile(path)
+        vivenv.meta.write()
+
+    cache = viv.Cache()
+    assert cache.referenced() == {"a", "b"}
+    assert {v.name for v in cache.filter(["files:None"])} == {"c", "d"}
+    assert {v.name for v in cache.filter([f"files:{shared}"])} == {"a", "b"}
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_filter_compose(tmp_path, monkeypatch, indexed):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path / "cache"))
+    if not indexed:
+        monkeypatch.setattr(viv.Index, "_run", lambda self, func: None)
+    script = tmp_path / "script.py"
+    script.touch()
+    specs = {
+        "a": ["Rich>=13", "typer"],
+        "b": ["rich==13.7.0"],
+        "c": ["Typer_CLI"],
+        "d": ["requests"],
+    }
+    for i, (name, spec) in enumerate(specs.items()):
+        vivenv = viv.ViVenv(spec, name=name)
+        vivenv.path.mkdir(parents=True)
+        if name in "ab":
+            vivenv.meta.addfile(script)
+        vivenv.meta.created = f"2024-01-0{i + 1} 12:00:00.000000"
+        vivenv.meta.accessed = f"2024-02-0{4 - i} 12:00:00.000000"
+        vivenv.meta.size = {"apparent": (i * 7) % 4, "unique": 0, "mtime": 0}
+        vivenv.meta.write()
+
+    def names(*filters, **kwargs):
+        return [v.name for v in viv.Cache().filter(filters, **kwargs)]
+
+    assert names("spec:rich") == ["a", "b"]
+    assert names("spec:RICH >= 13") == ["a"]
+    assert names("spec:typer-cli|spec:requests") == ["c", "d"]
+    assert names("spec:rich", "!spec:typer") == ["b"]
+    assert names("!files:None", "created-after:2024-01-01T13:00") == ["b"]
+    assert names("files:None|accessed-after:2024-02-04") == ["a", "c", "d"]
+    assert names(sort="accessed") == ["a", "b", "c", "d"]
+    assert names(sort="created", limit=2) == ["d", "c"]
+    assert names("!spec:rich", sort="size") == ["c", "d"]
+    assert names("files:None", sort="accessed", limit=1) == ["c"]
+
+    with pytest.raises(SystemExit):
+        names("spec=rich")
+    with pytest.raises(SystemExit):
+        names("color:red")
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_list_ndjson(tmp_path, monkeypatch, capsys, indexed):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    if not indexed:
+        monkeypatch.setattr(viv.Index, "_run", lambda self, func: None)
+        monkeypatch.setattr(viv.Index, "_connect", lambda self: None)
+    for name in ("a", "b", "c"):
+        vivenv = viv.ViVenv([f"pkg-{name}"], name=name)
+        vivenv.path.mkdir(parents=True)
+        vivenv.meta.write()
+
+    def list_(*argv):
+        args = viv.Cli(viv.Viv()).parse_args(["list", *argv])
+        args.__dict__.pop("func")(**vars(args))
+
+    list_("--ndjson", "--fields", "name,spec", "--limit", "2")
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"name": "a", "spec": ["pkg-a"]},
+        {"name": "b", "spec": ["pkg-b"]},
+    ]
+
+    list_("--ndjson", "-f", "!spec:pkg-b", "-f", "files:None")
+    names = [json.loads(line)["name"] for line in capsys.readouterr().out.splitlines()]
+    assert names == ["a", "c"]
+
+    with pytest.raises(SystemExit):
+        list_("--json", "--fields", "nope")
+
+
+def test_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    monkeypatch.setenv("VIV_NO_SETUPTOOLS", "1")
+    monkeypatch.setattr(viv, "_spawn_gc", lambda *args: False)
+    first = viv.ViVenv(["pyjokes"])
+    first.ensure()
+    (entry,) = (tmp_path / "store").glob("pyjokes-*")
+
+    # a new vivenv is linked from the store without running pip
+    monkeypatch.setattr(viv, "subprocess_run", None)
+    second = viv.ViVenv(["pyjokes"], name="second")
+    second.ensure()
+    module = "site-packages/pyjokes/__init__.py"
+    (stored,) = entry.glob(f"site/{module.split('/', 1)[1]}")
+    (linked,) = second.path.glob(f"lib/python*/{module}")
+    assert os.path.samefile(stored, linked)
+    assert (
+        (second.path / "bin" / "pyjoke").read_text().startswith(f"#!{second.python}\n")
+    )
+    assert list(second.path.glob("lib/python*/site-packages/*.dist-info/REQUESTED"))
+    subprocess.run([second.path / "bin" / "pyjoke"], check=True)
+
+    # resolutions are per platform and expire
+    (resolved,) = (tmp_path / "store" / ".resolved").iterdir()
+    assert sysconfig.get_platform().replace("-", "_") in resolved.name
+    viv.Store().prune()
+    assert resolved.exists()
+    os.utime(resolved, (0, 0))
+
+    # distributions are kept while any vivenv links to them
+    assert viv.Store().prune() == 0
+    assert not resolved.exists()
+    for vivenv in (first, second):
+        viv._rmtree(vivenv.path)
+
+    # a distribution pruned concurrently is skipped
+    def pruned(src, dst):
+        raise FileNotFoundError(src)
+
+    rename = os.rename
+    monkeypatch.setattr(os, "rename", pruned)
+    assert viv.Store().prune() == 0
+    assert entry.exists()
+    monkeypatch.setattr(os, "rename", rename)
+    assert viv.Store().prune() == 1
+    assert not entry.exists()
+
+
+def test_template(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    monkeypatch.setenv("VIV_NO_SETUPTOOLS", "1")
+    vivenvs = [viv.ViVenv([""], name=name) for name in ("first", "second")]
+    for vivenv in vivenvs:
+        vivenv.create()
+    (template,) = (tmp_path / "store" / ".templates").iterdir()
+
+    vivenv = vivenvs[1]
+    assert vivenv.templated
+    assert not (vivenv.path / viv.TEMPLATE_RECORD).exists()
+    assert os.path.samefile(vivenv.path / "bin" / "python", template / "bin" / "python")
+    for f in ("pyvenv.cfg", "bin/activate"):
+        content = (vivenv.path / f).read_text()
+        assert "viv-second" in content
+        assert viv.TEMPLATE_PROMPT not in content and ".templates" not in content
+    assert str(vivenv.path) in (vivenv.path / "bin" / "activate").read_text()
+    p = subprocess.run(
+        [vivenv.python, "-c", "import sys; print(sys.prefix)"],
+        stdout=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    assert p.stdout.strip() == str(vivenv.path)
+
+    # the template's setuptools is replaced when the spec pins another version
+    monkeypatch.delenv("VIV_NO_SETUPTOOLS")
+    monkeypatch.setattr(viv, "_spawn_gc", lambda *args: False)
+    spec = ["setuptools==69.5.1", "six"]
+    viv.ViVenv(spec, name="stored").ensure()
+    viv._rmtree(tmp_path / "venvs" / "stored")
+    # then linked from the store over the template's
+    vivenv = viv.ViVenv(spec)
+    vivenv.ensure()
+    assert vivenv.templated
+    names = [
+        viv._dist_info(dist_info)[0]
+        for dist_info in vivenv.path.glob("lib/python*/site-packages/*.dist-info")
+    ]
+    assert sorted(names) == ["setuptools", "six"]
+    assert vivenv.installed()["setuptools"] == "69.5.1"
+
+
+@pytest.mark.parametrize("no_store", ["", "1"])
+def test_incremental(tmp_path, monkeypatch, no_store):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    monkeypatch.setenv("VIV_NO_SETUPTOOLS", "1")
+    monkeypatch.setenv("VIV_NO_STORE", no_store)
+    monkeypatch.setattr(viv, "_spawn_gc", lambda *args: False)
+
+    def ensure(*spec):
+        vivenv = viv.ViVenv(list(spec), name="incremental")
+        vivenv.ensure()
+        vivenv.meta.write()
+        return vivenv
+
+    vivenv = ensure("pyjokes")
+    (pyjokes,) = vivenv.path.glob("lib/python*/site-packages/pyjokes/__init__.py")
+    inode = pyjokes.stat().st_ino
+
+    commands = []
+    subprocess_run = viv.subprocess_run
+
+    def record(command, **kwargs):
+        if "--dry-run" not in command:
+            commands.append(command[3:])
+        return subprocess_run(command, **kwargs)
+
+    monkeypatch.setattr(viv, "subprocess_run", record)
+
+    # a named vivenv is used as is
+    vivenv = ensure("pyjokes", "six")
+    assert not commands
+    assert vivenv.meta.spec == ["pyjokes"]
+
+    # unless VIV_UPDATE is set, then only the added requirement is installed
+    monkeypatch.setenv("VIV_UPDATE", "1")
+    vivenv = ensure("pyjokes", "six")
+    assert [c[:-1] for c in commands] == [["install", "--no-deps"]]
+    assert commands[0][-1].startswith("six==")
+    assert set(vivenv.meta.installed) == {"pyjokes", "six"}
+    assert vivenv.meta.spec == ["pyjokes", "six"]
+    assert vivenv.meta.id == viv.get_hash(["pyjokes", "six"])
+    assert pyjokes.stat().st_ino == inode
+
+    # and removed again
+    vivenv = ensure("pyjokes")
+    assert commands[1] == ["uninstall", "--yes", "six"]
+    assert set(vivenv.meta.installed) == {"pyjokes"} == set(vivenv.installed())
+    assert pyjokes.stat().st_ino == inode
+
+    # and resolves again with nothing to do
+    ensure("pyjokes")
+    assert len(commands) == 2
+
+    # while VIV_FORCE still recreates the vivenv
+    monkeypatch.setenv("VIV_FORCE", "1")
+    created = []
+    monkeypatch.setattr(viv.ViVenv, "create", lambda self: created.append(self))
+    monkeypatch.setattr(viv.ViVenv, "install_pkgs", lambda self: None)
+    ensure("pyjokes")
+    assert len(created) == 1
+
+
+def test_derive(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    monkeypatch.setenv("VIV_NO_SETUPTOOLS", "1")
+    monkeypatch.setattr(viv, "_spawn_gc", lambda *args: False)
+    base = viv.ViVenv(["pyjokes"])
+    base.ensure()
+    base.meta.write()
+    unrelated = viv.ViVenv(["six"])
+    unrelated.ensure()
+    unrelated.meta.write()
+
+    commands = []
+    subprocess_run = viv.subprocess_run
+
+    def record(command, **kwargs):
+        if "--dry-run" not in command:
+            commands.append(command[3:])
+        return subprocess_run(command, **kwargs)
+
+    monkeypatch.setattr(viv, "subprocess_run", record)
+    monkeypatch.setattr(viv.ViVenv, "create", None)
+    vivenv = viv.ViVenv(["pyjokes", "rich==13.7.1"])
+    vivenv.ensure()
+
+    # cloned from the closest subset, only the new requirement is installed
+    assert vivenv.name == viv.get_hash(["pyjokes", "rich==13.7.1"])[:8]
+    assert vivenv.meta.spec == ["pyjokes", "rich==13.7.1"]
+    assert {"pyjokes", "rich"} <= set(vivenv.meta.installed)
+    assert "six" not in vivenv.meta.installed
+    assert all(not c[-1].startswith("pyjokes") for c in commands)
+    assert not (vivenv.path / viv.ACTIVATION_RECORD).exists()
+    assert base.name not in (vivenv.path / "pyvenv.cfg").read_text()
+    (module,) = vivenv.path.glob("lib/python*/site-packages/pyjokes/__init__.py")
+    (original,) = base.path.glob("lib/python*/site-packages/pyjokes/__init__.py")
+    assert os.path.samefile(module, original)
+    assert "rich" not in base.installed()
+    subprocess.run([vivenv.path / "bin" / "pyjoke"], check=True)
+    # the base is locked against gc while it's cloned
+    assert base.path in viv._held_locks
+
+    # a base removed while cloning falls back to a new vivenv
+    def removed(*args):
+        raise FileNotFoundError("removed")
+
+    monkeypatch.setattr(viv.Store, "clone", removed)
+    vivenv = viv.ViVenv(["pyjokes", "six"])
+    assert not vivenv.derive()
+    assert not vivenv.path.exists()
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_satisfying(tmp_path, monkeypatch, indexed):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    if not indexed:
+        monkeypatch.setattr(viv.Index, "_run", lambda self, func: None)
+    installed = {
+        "a": {"rich": "13.7.1", "pygments": "2.17.2"},
+        "b": {"rich": "13.7.1", "pygments": "2.17.2", "typer": "0.9.0"},
+        "c": {"rich": "12.0.0"},
+    }
+    for name, versions in installed.items():
+        vivenv = viv.ViVenv(list(versions), name=name)
+        vivenv.path.mkdir(parents=True)
+        vivenv.meta.installed = versions
+        vivenv.meta.write()
+
+    def names(*spec, exe="N/A"):
+        return [v.name for v in viv.Cache().satisfying(list(spec), exe)]
+
+    assert names("Rich") == ["c", "a", "b"]
+    assert names("rich>=13", "rich!=13.7.0") == ["a", "b"]
+    assert names("rich~=13.0", "Typer") == ["b"]
+    assert names("rich<12") == []
+    assert names("rich>=13", exe=sys.executable) == []
+    # not only names and versions
+    assert names("rich[jupyter]>=13") == []
+    assert names("rich; python_version>'3'") == []
+
+
+def test_reuse(tmp_path, monkeypatch):
+    monkeypatch.setenv("VIV_CACHE", str(tmp_path))
+    monkeypatch.setenv("VIV_NO_SETUPTOOLS", "1")
+    monkeypatch.setattr(viv, "_spawn_gc", lambda *args: False)
+    base = viv.ViVenv(["pyjokes"])
+    base.ensure()
+    base.meta.write()
+
+    created = []
+    create = viv.ViVenv.create
+    monkeypatch.setattr(
+        viv.ViVenv,
+        "create",
+        lambda self, *args: created.append(self.name) or create(self, *args),
+    )
+    monkeypatch.setenv("VIV_REUSE", "satisfying")
+    vivenv = viv.ViVenv(["pyjokes>=0.5"])
+    with vivenv.use():
+        pass
+    assert not created
+    assert vivenv.path == base.path
+    assert vivenv.meta.spec == ["pyjokes"]
+    assert not (tmp_path / "venvs" / viv.get_hash(["pyjokes>=0.5"])[:8]).exists()
+
+    # a reused vivenv is activated from its record alone
+    monkeypatch.setattr(sys, "path", sys.path.copy())
+    script = tmp_path / "script.py"
+    assert viv.use("pyjokes>=0.5", caller=script) == base.path
+    ViVenv = viv.ViVenv
+    monkeypatch.setattr(viv, "ViVenv", None)
+    assert viv.use("pyjokes>=0.5", caller=script) == base.path
+    monkeypatch.setattr(viv, "ViVenv", ViVenv)
+
+    # only when asked for
+    monkeypatch.setenv("VIV_REUSE", "exact")
+    monkeypatch.setattr(viv.ViVenv, "derive", lambda self: False)
+    vivenv = viv.ViVenv(["pyjokes>=0.5"])
+    with vivenv.use():
+        pass
+    assert created == [vivenv.name]
+    assert vivenv.path != base.path
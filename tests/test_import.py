@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import viv
+
+# only needed by the cli or when building vivenvs
+LAZY_MODULES = {
+    "argparse",
+    "logging.handlers",
+    "platform",
+    "shutil",
+    "subprocess",
+    "tempfile",
+    "tomllib",
+    "venv",
+}
+
+
+def importtime(code: str, env: dict) -> set:
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        env=env,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return {
+        line.split("|")[-1].strip()
+        for line in p.stderr.splitlines()
+        if line.startswith("import time:")
+    }
+
+
+def test_import_is_lazy(tmp_path):
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(Path(viv.__file__).parent.parent),
+        VIV_CACHE=str(tmp_path / "cache"),
+        XDG_CACHE_HOME=str(tmp_path / "cache"),
+        XDG_DATA_HOME=str(tmp_path / "data"),
+    )
+    imported = importtime("import viv", env) - importtime("pass", env)
+
+    assert "viv.viv" in imported
+    assert not imported & LAZY_MODULES
+    # no log file or cache directories until they are needed
+    assert not list(tmp_path.iterdir())
+
+
+def test_log_queue(tmp_path):
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(Path(viv.__file__).parent.parent),
+        VIV_LOG_QUEUE="1",
+        XDG_DATA_HOME=str(tmp_path),
+    )
+    code = "\n".join(
+        (
+            "import atexit",
+            # runs after logging shuts down and the queue is drained
+            "atexit.register(lambda: log.debug('late'))",
+            "from viv.viv import log",
+            "for i in range(1000): log.debug(f'\\033[1m{i}')",
+        )
+    )
+    subprocess.run([sys.executable, "-c", code], env=env, check=True)
+
+    lines = (tmp_path / "viv" / "viv.log").read_text().splitlines()
+    assert len(lines) == 1001
+    assert lines[-2].endswith("| 999")
+    assert lines[-1].endswith("| late")
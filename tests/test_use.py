@@ -1,6 +1,9 @@
+import json
 import sys
+from pathlib import Path
 
 import pytest
+import viv.viv as viv
 from viv import use
 
 
@@ -16,3 +19,34 @@ def test_use():
         from sample.simple import add_one  # noqa
 
     assert len([p for p in sys.path if "site-packages" in p]) == 1
+
+
+def test_use_warm(monkeypatch):
+    path = use("pyjokes")
+
+    # an existing vivenv is activated from its record alone
+    monkeypatch.setattr(viv, "ViVenv", None)
+    assert use("pyjokes") == path
+    assert (
+        sys.path[0]
+        == json.loads((path / viv.ACTIVATION_RECORD).read_text())["site_packages"]
+    )
+
+
+def test_use_caller(tmp_path):
+    script = tmp_path / "script.py"
+    path = use("pyjokes", caller=script)
+    viv._record_access()
+
+    assert (
+        str(script.resolve())
+        in json.loads((path / "vivmeta.json").read_text())["files"]
+    )
+
+
+def test_use_records_paths():
+    meta = json.loads((use("pyjokes") / "vivmeta.json").read_text())
+
+    assert meta["python_version"] == ".".join(map(str, sys.version_info[:3]))
+    assert meta["sys_path"][0] == meta["site_packages"]
+    assert Path(meta["site_packages"]).is_dir()